@@ -1,30 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
+import asyncio
 
-from app.models.schemas import Deployment, DeploymentCreate, DeploymentUpdate, DeploymentStatus
+from app.models.schemas import (
+    Deployment, DeploymentCreate, DeploymentUpdate, DeploymentStatus, PredictionRequest, PredictionResponse,
+)
 from app.services.database import get_db
-from app.services.airflow_client import trigger_dag, get_dag_run_status
+from app.services.pagination import paginate, set_next_cursor
+from app.services.serialization import OutputSchema, list_response
+from app.services.stats import record_created, record_deleted, record_transition
+from app.services.airflow_client import trigger_dag
+from app.services.event_bus import publish_deployment_status
+from app.services import model_server
+from app.services.etag import (
+    collection_etag, document_etag, is_not_modified, not_modified_response, set_etag, touch_collection,
+)
 
 router = APIRouter()
 
+# Forme de sortie des listes (projection MongoDB et sérialisation sans validation)
+DEPLOYMENT_OUTPUT = OutputSchema(Deployment)
+
 # Fonction utilitaire pour convertir ObjectId en str
 def serialize_object_id(obj_id):
     return str(obj_id)
 
 @router.get("/", response_model=List[Deployment])
 async def get_deployments(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     model_id: Optional[str] = None,
     status: Optional[DeploymentStatus] = None,
     db = Depends(get_db)
 ):
     """
     Récupère la liste des déploiements avec filtrage optionnel.
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor.
+    Répond 304 si la collection n'a pas changé depuis l'ETag fourni.
     """
+    # Aucune requête sur les déploiements si la liste n'a pas changé
+    etag = await collection_etag(db, "deployments", request)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
     # Construire le filtre
     filter_query = {}
     if model_id:
@@ -33,30 +57,51 @@ async def get_deployments(
         filter_query["status"] = status
     
     # Exécuter la requête
-    cursor = db.deployments.find(filter_query).skip(skip).limit(limit)
-    deployments = await cursor.to_list(length=limit)
-    
-    # Convertir les ObjectId en str
-    for deployment in deployments:
-        deployment["_id"] = serialize_object_id(deployment["_id"])
-    
-    return deployments
+    deployments, next_cursor = await paginate(
+        db.deployments, filter_query, limit, cursor=cursor, skip=skip, projection=DEPLOYMENT_OUTPUT.projection
+    )
+    response = list_response(deployments, DEPLOYMENT_OUTPUT)
+    set_next_cursor(response, next_cursor)
+    set_etag(response, etag)
+    return response
 
 @router.get("/{deployment_id}", response_model=Deployment)
-async def get_deployment(deployment_id: str, db = Depends(get_db)):
+async def get_deployment(deployment_id: str, request: Request, response: Response, db = Depends(get_db)):
     """
     Récupère un déploiement spécifique par son ID.
+    Répond 304 si le déploiement n'a pas changé depuis l'ETag fourni.
     """
     try:
+        # Requête conditionnelle : ne lire que la date de modification
+        if request.headers.get("if-none-match"):
+            stamp = await db.deployments.find_one({"_id": ObjectId(deployment_id)}, {"updated_at": 1})
+            if stamp is None:
+                raise HTTPException(status_code=404, detail="Déploiement non trouvé")
+            etag = document_etag(deployment_id, stamp.get("updated_at"))
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+        
         deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
         if deployment is None:
             raise HTTPException(status_code=404, detail="Déploiement non trouvé")
         
         deployment["_id"] = serialize_object_id(deployment["_id"])
+        set_etag(response, document_etag(deployment_id, deployment.get("updated_at")))
         return deployment
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du déploiement: {str(e)}")
 
+async def _set_created_status(db, deployment, update_data):
+    """Applique le statut issu du déclenchement du DAG à un déploiement tout juste inséré."""
+    # updated_at sert d'ETag : une lecture faite pendant le déclenchement ne reste pas en PENDING
+    update_data["updated_at"] = datetime.now()
+    await db.deployments.update_one({"_id": deployment["_id"]}, {"$set": update_data})
+    await touch_collection(db, "deployments")
+    await record_transition(db, "deployments", deployment, DeploymentStatus.PENDING, update_data["status"])
+    publish_deployment_status(serialize_object_id(deployment["_id"]), update_data["status"])
+
 @router.post("/", response_model=Deployment, status_code=status.HTTP_201_CREATED)
 async def create_deployment(deployment_data: DeploymentCreate, db = Depends(get_db)):
     """
@@ -64,23 +109,27 @@ async def create_deployment(deployment_data: DeploymentCreate, db = Depends(get_
     """
     try:
         # Vérifier si le modèle existe
-        model = await db.models.find_one({"_id": ObjectId(deployment_data.model_id)})
+        model = await db.models.find_one({"_id": ObjectId(deployment_data.model_id)}, {"_id": 1})
         if model is None:
             raise HTTPException(status_code=404, detail="Modèle non trouvé")
         
-        # Préparer les données du déploiement
+        # Préparer les données du déploiement (identifiant généré localement pour la configuration du DAG)
         deployment_dict = deployment_data.dict()
+        deployment_dict["_id"] = ObjectId()
         deployment_dict["created_at"] = datetime.now()
         deployment_dict["updated_at"] = datetime.now()
         deployment_dict["status"] = DeploymentStatus.PENDING
+        deployment_id = serialize_object_id(deployment_dict["_id"])
         
         # Générer un ID de DAG unique
         dag_id = f"model_{deployment_data.model_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
         deployment_dict["dag_id"] = dag_id
         
-        # Insérer le déploiement dans la base de données
-        result = await db.deployments.insert_one(deployment_dict)
-        deployment_id = serialize_object_id(result.inserted_id)
+        # Insérer le déploiement avant de déclencher le DAG : le run Airflow ne
+        # peut référencer qu'un déploiement existant
+        await db.deployments.insert_one(deployment_dict)
+        await touch_collection(db, "deployments")
+        await record_created(db, "deployments", deployment_dict)
         
         # Créer et déclencher le DAG Airflow
         # Note: Dans un environnement réel, il faudrait générer dynamiquement le DAG
@@ -94,26 +143,26 @@ async def create_deployment(deployment_data: DeploymentCreate, db = Depends(get_
             }
             
             # Déclencher le DAG (simulation)
-            await trigger_dag(dag_id, dag_conf)
-            
-            # Mettre à jour le statut du déploiement
-            await db.deployments.update_one(
-                {"_id": ObjectId(deployment_id)},
-                {"$set": {"status": DeploymentStatus.RUNNING}}
-            )
+            dag_run = await trigger_dag(dag_id, dag_conf)
+            update_data = {
+                "status": DeploymentStatus.RUNNING,
+                "dag_run_id": dag_run.get("dag_run_id"),
+                "run_started_at": datetime.now(),
+            }
         except Exception as e:
-            # En cas d'erreur, mettre à jour le statut du déploiement
-            await db.deployments.update_one(
-                {"_id": ObjectId(deployment_id)},
-                {"$set": {"status": DeploymentStatus.FAILED}}
-            )
+            # En cas d'erreur, enregistrer le déploiement en échec
+            await _set_created_status(db, deployment_dict, {"status": DeploymentStatus.FAILED})
             raise HTTPException(status_code=500, detail=f"Erreur lors du déclenchement du DAG: {str(e)}")
         
-        # Récupérer le déploiement créé
-        created_deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
-        created_deployment["_id"] = deployment_id
+        # Une seule mise à jour pour le statut et l'identifiant réel du run ; la
+        # réponse est construite localement
+        await _set_created_status(db, deployment_dict, update_data)
+        deployment_dict.update(update_data)
+        deployment_dict["_id"] = deployment_id
         
-        return created_deployment
+        return deployment_dict
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création du déploiement: {str(e)}")
 
@@ -127,26 +176,31 @@ async def update_deployment(
     Met à jour un déploiement existant.
     """
     try:
-        # Vérifier si le déploiement existe
-        deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
-        if deployment is None:
-            raise HTTPException(status_code=404, detail="Déploiement non trouvé")
-        
         # Préparer les données de mise à jour
         update_data = {k: v for k, v in deployment_update.dict(exclude_unset=True).items() if v is not None}
         update_data["updated_at"] = datetime.now()
         
-        # Mettre à jour le déploiement
-        await db.deployments.update_one(
+        # Mettre à jour le déploiement en un seul appel : la version précédente sert
+        # aux statistiques et la version modifiée est reconstruite localement
+        previous_deployment = await db.deployments.find_one_and_update(
             {"_id": ObjectId(deployment_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
         )
-        
-        # Récupérer le déploiement mis à jour
-        updated_deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
+        if previous_deployment is None:
+            raise HTTPException(status_code=404, detail="Déploiement non trouvé")
+        await touch_collection(db, "deployments")
+        if "status" in update_data:
+            await record_transition(
+                db, "deployments", previous_deployment, previous_deployment.get("status"), update_data["status"]
+            )
+            publish_deployment_status(deployment_id, update_data["status"])
+        updated_deployment = dict(previous_deployment, **update_data)
         updated_deployment["_id"] = deployment_id
         
         return updated_deployment
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du déploiement: {str(e)}")
 
@@ -156,15 +210,17 @@ async def delete_deployment(deployment_id: str, db = Depends(get_db)):
     Supprime un déploiement existant.
     """
     try:
-        # Vérifier si le déploiement existe
-        deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
+        # Supprimer le déploiement en récupérant le document : deux suppressions
+        # concurrentes ne décomptent pas deux fois le même déploiement
+        deployment = await db.deployments.find_one_and_delete({"_id": ObjectId(deployment_id)})
         if deployment is None:
             raise HTTPException(status_code=404, detail="Déploiement non trouvé")
-        
-        # Supprimer le déploiement
-        await db.deployments.delete_one({"_id": ObjectId(deployment_id)})
+        await touch_collection(db, "deployments")
+        await record_deleted(db, "deployments", deployment)
         
         return JSONResponse(status_code=204, content={})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression du déploiement: {str(e)}")
 
@@ -191,13 +247,21 @@ async def start_deployment(deployment_id: str, db = Depends(get_db)):
         }
         
         # Déclencher le DAG
-        await trigger_dag(deployment["dag_id"], dag_conf)
+        dag_run = await trigger_dag(deployment["dag_id"], dag_conf)
         
-        # Mettre à jour le statut du déploiement
+        # Mettre à jour le statut du déploiement et conserver l'identifiant réel du run
         await db.deployments.update_one(
             {"_id": ObjectId(deployment_id)},
-            {"$set": {"status": DeploymentStatus.RUNNING, "updated_at": datetime.now()}}
+            {"$set": {
+                "status": DeploymentStatus.RUNNING,
+                "dag_run_id": dag_run.get("dag_run_id"),
+                "run_started_at": datetime.now(),
+                "updated_at": datetime.now()
+            }}
         )
+        await touch_collection(db, "deployments")
+        await record_transition(db, "deployments", deployment, deployment["status"], DeploymentStatus.RUNNING)
+        publish_deployment_status(deployment_id, DeploymentStatus.RUNNING)
         
         # Récupérer le déploiement mis à jour
         updated_deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
@@ -211,36 +275,17 @@ async def start_deployment(deployment_id: str, db = Depends(get_db)):
 async def get_deployment_status(deployment_id: str, db = Depends(get_db)):
     """
     Récupère le statut actuel d'un déploiement.
+    Le statut est tenu à jour en arrière-plan par le réconciliateur Airflow.
     """
     try:
         # Vérifier si le déploiement existe
-        deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)})
+        deployment = await db.deployments.find_one(
+            {"_id": ObjectId(deployment_id)},
+            {"status": 1, "updated_at": 1}
+        )
         if deployment is None:
             raise HTTPException(status_code=404, detail="Déploiement non trouvé")
         
-        # Si le déploiement est en cours d'exécution, vérifier le statut dans Airflow
-        if deployment["status"] == DeploymentStatus.RUNNING and "dag_id" in deployment:
-            try:
-                # Récupérer le statut du DAG
-                dag_runs = await get_dag_run_status(deployment["dag_id"], "latest")
-                
-                # Mettre à jour le statut du déploiement si nécessaire
-                if dag_runs["state"] == "success":
-                    await db.deployments.update_one(
-                        {"_id": ObjectId(deployment_id)},
-                        {"$set": {"status": DeploymentStatus.COMPLETED, "updated_at": datetime.now()}}
-                    )
-                    deployment["status"] = DeploymentStatus.COMPLETED
-                elif dag_runs["state"] == "failed":
-                    await db.deployments.update_one(
-                        {"_id": ObjectId(deployment_id)},
-                        {"$set": {"status": DeploymentStatus.FAILED, "updated_at": datetime.now()}}
-                    )
-                    deployment["status"] = DeploymentStatus.FAILED
-            except Exception as e:
-                # En cas d'erreur, ne pas modifier le statut
-                pass
-        
         return {
             "deployment_id": deployment_id,
             "status": deployment["status"],
@@ -248,3 +293,51 @@ async def get_deployment_status(deployment_id: str, db = Depends(get_db)):
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du statut du déploiement: {str(e)}")
+
+
+@router.post("/{deployment_id}/predict", response_model=PredictionResponse)
+async def predict(deployment_id: str, prediction: PredictionRequest, db = Depends(get_db)):
+    """
+    Calcule des prédictions de façon synchrone avec le modèle d'un déploiement.
+
+    Les modèles scikit-learn et XGBoost sont chargés une fois dans le processus
+    puis conservés en mémoire ; les requêtes simultanées sont regroupées en lots.
+    """
+    try:
+        resolved = model_server.deployment_cache.get(deployment_id)
+        if resolved is None:
+            deployment = await db.deployments.find_one({"_id": ObjectId(deployment_id)}, {"model_id": 1, "status": 1})
+            if deployment is None:
+                raise HTTPException(status_code=404, detail="Déploiement non trouvé")
+            if deployment["status"] == DeploymentStatus.FAILED:
+                raise HTTPException(status_code=409, detail="Le déploiement est en échec")
+            model = await db.models.find_one(
+                {"_id": ObjectId(deployment["model_id"])},
+                {"framework": 1, "file_path": 1, "file_name": 1, "file_sha256": 1},
+            )
+            if model is None:
+                raise HTTPException(status_code=404, detail="Modèle non trouvé")
+            if model.get("framework") not in model_server.SERVABLE_FRAMEWORKS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Prédiction synchrone non disponible pour le framework {model.get('framework')}",
+                )
+            if not model.get("file_path"):
+                raise HTTPException(status_code=409, detail="Aucun fichier n'est associé au modèle")
+            resolved = model
+            model_server.deployment_cache.set(deployment_id, resolved)
+
+        predictions = await model_server.predict(resolved, prediction.instances, prediction.probabilities)
+        return {
+            "deployment_id": deployment_id,
+            "model_id": str(resolved["_id"]),
+            "predictions": predictions,
+        }
+    except HTTPException:
+        raise
+    except model_server.PredictionInputError as e:
+        raise HTTPException(status_code=400, detail=f"Données de prédiction invalides: {str(e)}")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Délai de prédiction dépassé")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la prédiction: {str(e)}")
@@ -0,0 +1,136 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+import os
+
+from app.services.database import get_db
+from app.services.event_bus import Subscription, TOPICS, current_status
+
+router = APIRouter()
+
+# Nombre maximal d'abonnements portés par une connexion
+EVENT_MAX_SUBSCRIPTIONS = int(os.getenv("EVENT_MAX_SUBSCRIPTIONS", "500"))
+# Intervalle des commentaires de maintien de connexion du flux SSE
+EVENT_KEEPALIVE_INTERVAL = float(os.getenv("EVENT_KEEPALIVE_INTERVAL", "15"))
+
+def _encode(event):
+    return json.dumps(event, default=str)
+
+async def _subscribe(db, subscription, kind, object_id):
+    """
+    Abonne une connexion à un objet puis lui livre son statut actuel.
+
+    L'abonnement précède la lecture : aucune transition ne peut être perdue entre
+    les deux, et un statut déjà livré n'est pas répété.
+    """
+    if kind not in TOPICS:
+        return f"Type d'abonnement inconnu: {kind}"
+    if (kind, object_id) not in subscription.topics and len(subscription.topics) >= EVENT_MAX_SUBSCRIPTIONS:
+        return f"Nombre maximal d'abonnements atteint ({EVENT_MAX_SUBSCRIPTIONS})"
+    subscription.subscribe(kind, object_id)
+    snapshot = await current_status(db, kind, object_id)
+    if snapshot is None:
+        subscription.unsubscribe(kind, object_id)
+        return f"Objet non trouvé: {kind} {object_id}"
+    subscription.deliver(snapshot)
+    return None
+
+@router.websocket("/ws")
+async def status_events_websocket(websocket: WebSocket, db = Depends(get_db)):
+    """
+    Pousse les transitions de statut des exécutions et des déploiements.
+
+    Le client gère ses abonnements sur une seule connexion avec des messages
+    {"action": "subscribe" | "unsubscribe", "type": "execution" | "deployment", "id": "..."}.
+    Le statut actuel est envoyé à chaque abonnement, puis chaque transition.
+    """
+    await websocket.accept()
+    subscription = Subscription()
+
+    async def send_events():
+        while True:
+            event = await subscription.get()
+            await websocket.send_text(_encode(event))
+
+    sender = asyncio.create_task(send_events())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                # JSON valide mais pas un objet (tableau, chaîne, nombre)
+                await websocket.send_text(_encode({"error": "Le message doit être un objet JSON"}))
+                continue
+            action = message.get("action")
+            kind = message.get("type")
+            object_id = str(message.get("id", ""))
+            if action == "subscribe":
+                error = await _subscribe(db, subscription, kind, object_id)
+            elif action == "unsubscribe":
+                subscription.unsubscribe(kind, object_id)
+                error = None
+            else:
+                error = f"Action inconnue: {action}"
+            if error:
+                await websocket.send_text(_encode({"error": error, "type": kind, "id": object_id}))
+    except WebSocketDisconnect:
+        pass
+    except ValueError:
+        # Message non JSON : fermer la connexion
+        await websocket.close(code=1003)
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        subscription.close()
+
+def _parse_ids(value):
+    return [v for v in (value or "").split(",") if v]
+
+@router.get("/stream")
+async def status_events_stream(
+    request: Request,
+    executions: Optional[str] = Query(None, description="Identifiants d'exécutions séparés par des virgules"),
+    deployments: Optional[str] = Query(None, description="Identifiants de déploiements séparés par des virgules"),
+    db = Depends(get_db)
+):
+    """
+    Pousse les transitions de statut en Server-Sent Events.
+    Une seule connexion suit toutes les exécutions et déploiements demandés.
+    """
+    topics = [("execution", i) for i in _parse_ids(executions)] + \
+        [("deployment", i) for i in _parse_ids(deployments)]
+    if not topics:
+        raise HTTPException(status_code=400, detail="Aucun abonnement demandé")
+    if len(topics) > EVENT_MAX_SUBSCRIPTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Nombre maximal d'abonnements dépassé ({EVENT_MAX_SUBSCRIPTIONS})"
+        )
+
+    subscription = Subscription()
+    errors = []
+    for kind, object_id in topics:
+        error = await _subscribe(db, subscription, kind, object_id)
+        if error:
+            errors.append(error)
+
+    async def event_stream():
+        try:
+            for error in errors:
+                yield f"event: error\ndata: {_encode({'error': error})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=EVENT_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: status\ndata: {_encode(event)}\n\n"
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
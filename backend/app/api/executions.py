@@ -1,16 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+import asyncio
+import os
 
-from app.models.schemas import Execution, ExecutionCreate, ExecutionStatus
+from app.models.schemas import (
+    Execution, ExecutionCreate, ExecutionStatus, ExecutionEngine, ExecutionBatchCreate, ExecutionBatchResult,
+)
 from app.services.database import get_db
-from app.services.airflow_client import trigger_dag, get_dag_run_status
-from app.services.minio_client import get_presigned_url
+from app.services.pagination import paginate, set_next_cursor
+from app.services.serialization import OutputSchema, list_response
+from app.services.airflow_client import trigger_dag
+from app.services.minio_async import get_presigned_url
+from app.services.event_bus import publish_execution_status
+from app.services.stats import record_created, record_transition
+from app.services.batch_scoring import (
+    ScoringInputError, validate_parameters, runner_fields, start_scoring_job, cancel_scoring_job,
+)
+from app.services.model_server import SERVABLE_FRAMEWORKS
+from app.services.result_preview import PREVIEW_MAX_LIMIT, PreviewInputError, preview
+from app.services.execution_logs import (
+    append_logs, migrate_legacy_logs, read_lines, read_tail, read_bytes, LOG_MAX_READ_LINES,
+)
 
 router = APIRouter()
 
+# Intervalle de scrutation des nouvelles lignes pour le suivi en direct des logs
+LOG_STREAM_POLL_INTERVAL = float(os.getenv("LOG_STREAM_POLL_INTERVAL", "1.0"))
+
+# Soumission en lot : taille maximale d'un lot et nombre de DAGs déclenchés en parallèle
+EXECUTION_BATCH_MAX_SIZE = int(os.getenv("EXECUTION_BATCH_MAX_SIZE", "500"))
+EXECUTION_BATCH_CONCURRENCY = int(os.getenv("EXECUTION_BATCH_CONCURRENCY", "10"))
+
+# Les logs sont stockés à part (collection execution_logs) et ne sont jamais chargés
+# avec le document de l'exécution
+EXECUTION_PROJECTION = {"logs": 0}
+
+# Forme de sortie des listes : seuls les champs exposés sont lus et sérialisés
+EXECUTION_OUTPUT = OutputSchema(Execution)
+
 # Fonction utilitaire pour convertir ObjectId en str
 def serialize_object_id(obj_id):
     return str(obj_id)
@@ -19,6 +50,7 @@ def serialize_object_id(obj_id):
 async def get_executions(
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     deployment_id: Optional[str] = None,
     model_id: Optional[str] = None,
     status: Optional[ExecutionStatus] = None,
@@ -26,6 +58,7 @@ async def get_executions(
 ):
     """
     Récupère la liste des exécutions avec filtrage optionnel.
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor.
     """
     # Construire le filtre
     filter_query = {}
@@ -37,14 +70,12 @@ async def get_executions(
         filter_query["status"] = status
     
     # Exécuter la requête
-    cursor = db.executions.find(filter_query).skip(skip).limit(limit).sort("created_at", -1)
-    executions = await cursor.to_list(length=limit)
-    
-    # Convertir les ObjectId en str
-    for execution in executions:
-        execution["_id"] = serialize_object_id(execution["_id"])
-    
-    return executions
+    executions, next_cursor = await paginate(
+        db.executions, filter_query, limit, cursor=cursor, skip=skip, projection=EXECUTION_OUTPUT.projection
+    )
+    response = list_response(executions, EXECUTION_OUTPUT)
+    set_next_cursor(response, next_cursor)
+    return response
 
 @router.get("/{execution_id}", response_model=Execution)
 async def get_execution(execution_id: str, db = Depends(get_db)):
@@ -52,7 +83,7 @@ async def get_execution(execution_id: str, db = Depends(get_db)):
     Récupère une exécution spécifique par son ID.
     """
     try:
-        execution = await db.executions.find_one({"_id": ObjectId(execution_id)})
+        execution = await db.executions.find_one({"_id": ObjectId(execution_id)}, EXECUTION_PROJECTION)
         if execution is None:
             raise HTTPException(status_code=404, detail="Exécution non trouvée")
         
@@ -61,6 +92,41 @@ async def get_execution(execution_id: str, db = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération de l'exécution: {str(e)}")
 
+async def _create_local_execution(db, execution_data, deployment, model):
+    """Enregistre une exécution locale comme en cours et démarre son scoring en arrière-plan."""
+    if model.get("framework") not in SERVABLE_FRAMEWORKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Scoring local non disponible pour le framework {model.get('framework')}",
+        )
+    if not model.get("file_path"):
+        raise HTTPException(status_code=409, detail="Aucun fichier n'est associé au modèle")
+    try:
+        validate_parameters(execution_data.parameters)
+    except ScoringInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    execution_dict = execution_data.dict()
+    execution_dict["model_id"] = deployment["model_id"]
+    execution_dict["dag_id"] = deployment.get("dag_id")
+    execution_dict["created_at"] = datetime.now()
+    execution_dict["start_time"] = execution_dict["created_at"]
+    execution_dict["status"] = ExecutionStatus.RUNNING
+    execution_dict["log_lines"] = 0
+    execution_dict["log_bytes"] = 0
+    # Processus propriétaire et battement : une exécution abandonnée est détectée par le réconciliateur
+    execution_dict.update(runner_fields())
+    
+    # Le document est complet dès l'insertion : aucune relecture n'est nécessaire
+    result = await db.executions.insert_one(execution_dict)
+    execution_id = serialize_object_id(result.inserted_id)
+    await record_created(db, "executions", execution_dict)
+    publish_execution_status(execution_id, ExecutionStatus.RUNNING)
+    start_scoring_job(db, execution_id, model, execution_data.parameters)
+    
+    execution_dict["_id"] = execution_id
+    return execution_dict
+
 @router.post("/", response_model=Execution, status_code=status.HTTP_201_CREATED)
 async def create_execution(execution_data: ExecutionCreate, db = Depends(get_db)):
     """
@@ -77,12 +143,18 @@ async def create_execution(execution_data: ExecutionCreate, db = Depends(get_db)
         if model is None:
             raise HTTPException(status_code=404, detail="Modèle non trouvé")
         
+        # Scoring local : pas de DAG Airflow
+        if execution_data.engine == ExecutionEngine.LOCAL:
+            return await _create_local_execution(db, execution_data, deployment, model)
+        
         # Préparer les données de l'exécution
         execution_dict = execution_data.dict()
         execution_dict["model_id"] = deployment["model_id"]
+        execution_dict["dag_id"] = deployment["dag_id"]
         execution_dict["created_at"] = datetime.now()
         execution_dict["status"] = ExecutionStatus.QUEUED
-        execution_dict["logs"] = []
+        execution_dict["log_lines"] = 0
+        execution_dict["log_bytes"] = 0
         
         # Insérer l'exécution dans la base de données
         result = await db.executions.insert_one(execution_dict)
@@ -99,90 +171,186 @@ async def create_execution(execution_data: ExecutionCreate, db = Depends(get_db)
             }
             
             # Déclencher le DAG
-            await trigger_dag(deployment["dag_id"], dag_conf)
+            dag_run = await trigger_dag(deployment["dag_id"], dag_conf)
             
-            # Mettre à jour le statut de l'exécution
+            # Mettre à jour le statut de l'exécution et conserver l'identifiant réel du run
             await db.executions.update_one(
                 {"_id": ObjectId(execution_id)},
                 {
                     "$set": {
                         "status": ExecutionStatus.RUNNING,
-                        "start_time": datetime.now()
+                        "start_time": datetime.now(),
+                        "dag_run_id": dag_run.get("dag_run_id")
                     }
                 }
             )
+            await record_created(db, "executions", dict(execution_dict, status=ExecutionStatus.RUNNING))
+            publish_execution_status(execution_id, ExecutionStatus.RUNNING)
         except Exception as e:
             # En cas d'erreur, mettre à jour le statut de l'exécution
             await db.executions.update_one(
                 {"_id": ObjectId(execution_id)},
-                {
-                    "$set": {
-                        "status": ExecutionStatus.FAILED,
-                        "logs": ["Erreur lors du déclenchement de l'exécution: " + str(e)]
-                    }
-                }
+                {"$set": {"status": ExecutionStatus.FAILED}}
             )
+            await record_created(db, "executions", dict(execution_dict, status=ExecutionStatus.FAILED))
+            publish_execution_status(execution_id, ExecutionStatus.FAILED)
+            await append_logs(db, execution_id, "Erreur lors du déclenchement de l'exécution: " + str(e))
             raise HTTPException(status_code=500, detail=f"Erreur lors du déclenchement de l'exécution: {str(e)}")
         
         # Récupérer l'exécution créée
-        created_execution = await db.executions.find_one({"_id": ObjectId(execution_id)})
+        created_execution = await db.executions.find_one({"_id": ObjectId(execution_id)}, EXECUTION_PROJECTION)
         created_execution["_id"] = execution_id
         
         return created_execution
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de l'exécution: {str(e)}")
 
+@router.post("/batch", response_model=ExecutionBatchResult)
+async def create_executions_batch(batch: ExecutionBatchCreate, db = Depends(get_db)):
+    """
+    Crée et déclenche un lot d'exécutions.
+    Les déploiements et modèles sont validés en une requête chacun, les exécutions
+    insérées avec insert_many et les DAGs déclenchés en parallèle. Le résultat est
+    rapporté pour chaque élément du lot.
+    """
+    if not batch.executions:
+        raise HTTPException(status_code=400, detail="Le lot d'exécutions est vide")
+    if len(batch.executions) > EXECUTION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Le lot dépasse la taille maximale de {EXECUTION_BATCH_MAX_SIZE} exécutions"
+        )
+    
+    try:
+        results = [{"index": i} for i in range(len(batch.executions))]
+        
+        # Valider les identifiants de déploiement
+        deployment_ids = {}
+        for i, execution_data in enumerate(batch.executions):
+            if ObjectId.is_valid(execution_data.deployment_id):
+                deployment_ids[i] = ObjectId(execution_data.deployment_id)
+            else:
+                results[i]["error"] = "Identifiant de déploiement invalide"
+        
+        # Récupérer tous les déploiements et modèles concernés en une requête chacun
+        deployments = {
+            serialize_object_id(d["_id"]): d
+            async for d in db.deployments.find(
+                {"_id": {"$in": list(set(deployment_ids.values()))}},
+                {"model_id": 1, "dag_id": 1}
+            )
+        }
+        model_ids = {d["model_id"] for d in deployments.values() if ObjectId.is_valid(d.get("model_id", ""))}
+        existing_models = {
+            serialize_object_id(m["_id"])
+            async for m in db.models.find({"_id": {"$in": [ObjectId(m) for m in model_ids]}}, {"_id": 1})
+        }
+        
+        # Préparer les exécutions valides
+        now = datetime.now()
+        pending = []
+        for i in deployment_ids:
+            execution_data = batch.executions[i]
+            deployment = deployments.get(execution_data.deployment_id)
+            if deployment is None:
+                results[i]["error"] = "Déploiement non trouvé"
+                continue
+            if deployment["model_id"] not in existing_models:
+                results[i]["error"] = "Modèle non trouvé"
+                continue
+            if execution_data.engine == ExecutionEngine.LOCAL:
+                results[i]["error"] = "Le scoring local n'est pas disponible pour les lots d'exécutions"
+                continue
+            
+            execution_dict = execution_data.dict()
+            execution_dict["model_id"] = deployment["model_id"]
+            execution_dict["dag_id"] = deployment["dag_id"]
+            execution_dict["created_at"] = now
+            execution_dict["status"] = ExecutionStatus.QUEUED
+            execution_dict["log_lines"] = 0
+            execution_dict["log_bytes"] = 0
+            pending.append((i, execution_dict))
+        
+        if pending:
+            # Insérer toutes les exécutions valides en une seule opération
+            inserted = await db.executions.insert_many([d for _, d in pending], ordered=True)
+            for (i, execution_dict), inserted_id in zip(pending, inserted.inserted_ids):
+                execution_dict["_id"] = inserted_id
+                results[i]["execution_id"] = serialize_object_id(inserted_id)
+                results[i]["status"] = ExecutionStatus.QUEUED
+            
+            # Déclencher les DAGs en parallèle, dans la limite configurée
+            semaphore = asyncio.Semaphore(EXECUTION_BATCH_CONCURRENCY)
+            
+            async def trigger(execution_dict):
+                dag_conf = {
+                    "model_id": execution_dict["model_id"],
+                    "deployment_id": execution_dict["deployment_id"],
+                    "execution_id": serialize_object_id(execution_dict["_id"]),
+                    "parameters": execution_dict["parameters"]
+                }
+                async with semaphore:
+                    return await trigger_dag(execution_dict["dag_id"], dag_conf)
+            
+            outcomes = await asyncio.gather(
+                *[trigger(execution_dict) for _, execution_dict in pending],
+                return_exceptions=True
+            )
+            
+            # Enregistrer tous les statuts en une seule écriture
+            operations = []
+            failures = []
+            for (i, execution_dict), outcome in zip(pending, outcomes):
+                if isinstance(outcome, Exception):
+                    operations.append(UpdateOne(
+                        {"_id": execution_dict["_id"]},
+                        {"$set": {"status": ExecutionStatus.FAILED}}
+                    ))
+                    failures.append((execution_dict["_id"], outcome))
+                    results[i]["status"] = ExecutionStatus.FAILED
+                    results[i]["error"] = f"Erreur lors du déclenchement de l'exécution: {str(outcome)}"
+                else:
+                    operations.append(UpdateOne(
+                        {"_id": execution_dict["_id"]},
+                        {"$set": {
+                            "status": ExecutionStatus.RUNNING,
+                            "start_time": datetime.now(),
+                            "dag_run_id": outcome.get("dag_run_id")
+                        }}
+                    ))
+                    results[i]["status"] = ExecutionStatus.RUNNING
+            await db.executions.bulk_write(operations, ordered=False)
+            await record_created(
+                db, "executions", [dict(execution_dict, status=results[i]["status"]) for i, execution_dict in pending]
+            )
+            for (i, execution_dict) in pending:
+                publish_execution_status(execution_dict["_id"], results[i]["status"])
+            
+            for execution_id, error in failures:
+                await append_logs(db, execution_id, "Erreur lors du déclenchement de l'exécution: " + str(error))
+        
+        failed = sum(1 for r in results if r.get("error"))
+        return {"submitted": len(results) - failed, "failed": failed, "results": results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la création du lot d'exécutions: {str(e)}")
+
 @router.get("/{execution_id}/status", response_model=dict)
 async def get_execution_status(execution_id: str, db = Depends(get_db)):
     """
     Récupère le statut actuel d'une exécution.
+    Le statut est tenu à jour en arrière-plan par le réconciliateur Airflow.
     """
     try:
         # Vérifier si l'exécution existe
-        execution = await db.executions.find_one({"_id": ObjectId(execution_id)})
+        execution = await db.executions.find_one(
+            {"_id": ObjectId(execution_id)},
+            {"status": 1, "start_time": 1, "end_time": 1}
+        )
         if execution is None:
             raise HTTPException(status_code=404, detail="Exécution non trouvée")
         
-        # Récupérer le déploiement associé
-        deployment = await db.deployments.find_one({"_id": ObjectId(execution["deployment_id"])})
-        if deployment is None:
-            raise HTTPException(status_code=404, detail="Déploiement non trouvé")
-        
-        # Si l'exécution est en cours, vérifier le statut dans Airflow
-        if execution["status"] == ExecutionStatus.RUNNING and "dag_id" in deployment:
-            try:
-                # Récupérer le statut du DAG
-                dag_runs = await get_dag_run_status(deployment["dag_id"], "latest")
-                
-                # Mettre à jour le statut de l'exécution si nécessaire
-                if dag_runs["state"] == "success":
-                    await db.executions.update_one(
-                        {"_id": ObjectId(execution_id)},
-                        {
-                            "$set": {
-                                "status": ExecutionStatus.SUCCESS,
-                                "end_time": datetime.now()
-                            }
-                        }
-                    )
-                    execution["status"] = ExecutionStatus.SUCCESS
-                    execution["end_time"] = datetime.now()
-                elif dag_runs["state"] == "failed":
-                    await db.executions.update_one(
-                        {"_id": ObjectId(execution_id)},
-                        {
-                            "$set": {
-                                "status": ExecutionStatus.FAILED,
-                                "end_time": datetime.now()
-                            }
-                        }
-                    )
-                    execution["status"] = ExecutionStatus.FAILED
-                    execution["end_time"] = datetime.now()
-            except Exception as e:
-                # En cas d'erreur, ne pas modifier le statut
-                pass
-        
         return {
             "execution_id": execution_id,
             "status": execution["status"],
@@ -192,24 +360,120 @@ async def get_execution_status(execution_id: str, db = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du statut de l'exécution: {str(e)}")
 
+async def _get_execution_for_logs(db, execution_id):
+    """Vérifie l'existence de l'exécution et migre ses éventuels logs embarqués."""
+    execution = await db.executions.find_one({"_id": ObjectId(execution_id)}, {"status": 1, "log_lines": 1})
+    if execution is None:
+        raise HTTPException(status_code=404, detail="Exécution non trouvée")
+    await migrate_legacy_logs(db, execution_id)
+    return execution
+
 @router.get("/{execution_id}/logs", response_model=List[str])
-async def get_execution_logs(execution_id: str, db = Depends(get_db)):
+async def get_execution_logs(
+    execution_id: str,
+    start: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=LOG_MAX_READ_LINES),
+    db = Depends(get_db)
+):
     """
-    Récupère les logs d'une exécution.
+    Récupère une plage de lignes [start, start + limit) des logs d'une exécution.
     """
     try:
-        # Vérifier si l'exécution existe
-        execution = await db.executions.find_one({"_id": ObjectId(execution_id)})
-        if execution is None:
-            raise HTTPException(status_code=404, detail="Exécution non trouvée")
-        
-        # Récupérer les logs
-        logs = execution.get("logs", [])
-        
-        return logs
+        await _get_execution_for_logs(db, execution_id)
+        return await read_lines(db, execution_id, start, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des logs de l'exécution: {str(e)}")
 
+@router.get("/{execution_id}/logs/tail", response_model=dict)
+async def get_execution_logs_tail(
+    execution_id: str,
+    lines: int = Query(100, ge=1, le=LOG_MAX_READ_LINES),
+    db = Depends(get_db)
+):
+    """
+    Récupère les dernières lignes des logs d'une exécution.
+    """
+    try:
+        await _get_execution_for_logs(db, execution_id)
+        return await read_tail(db, execution_id, lines)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des logs de l'exécution: {str(e)}")
+
+@router.get("/{execution_id}/logs/bytes", response_model=dict)
+async def get_execution_logs_bytes(
+    execution_id: str,
+    offset: int = Query(0, ge=0),
+    max_bytes: int = Query(64 * 1024, ge=1, le=1024 * 1024),
+    db = Depends(get_db)
+):
+    """
+    Récupère les logs d'une exécution à partir d'un offset en octets.
+    La réponse contient `next_offset` pour reprendre la lecture.
+    """
+    try:
+        await _get_execution_for_logs(db, execution_id)
+        return await read_bytes(db, execution_id, offset, max_bytes)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des logs de l'exécution: {str(e)}")
+
+@router.get("/{execution_id}/logs/stream")
+async def stream_execution_logs(
+    execution_id: str,
+    request: Request,
+    start: Optional[int] = Query(None, ge=0),
+    db = Depends(get_db)
+):
+    """
+    Suit en direct les logs d'une exécution (Server-Sent Events).
+    Chaque événement porte le numéro de ligne en identifiant, ce qui permet de
+    reprendre le flux via l'en-tête Last-Event-ID.
+    """
+    try:
+        await _get_execution_for_logs(db, execution_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des logs de l'exécution: {str(e)}")
+    
+    # Position de départ : paramètre explicite, sinon reprise après le dernier événement reçu
+    position = start
+    if position is None:
+        last_event_id = request.headers.get("last-event-id")
+        position = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    
+    async def event_stream():
+        next_line = position
+        while not await request.is_disconnected():
+            lines = await read_lines(db, execution_id, next_line, LOG_MAX_READ_LINES)
+            for line in lines:
+                data = line.replace("\n", "\ndata: ")
+                yield f"id: {next_line}\ndata: {data}\n\n"
+                next_line += 1
+            if lines:
+                continue
+            
+            # Arrêter le flux une fois l'exécution terminée et toutes les lignes envoyées
+            execution = await db.executions.find_one({"_id": ObjectId(execution_id)}, {"status": 1, "log_lines": 1})
+            if execution is None:
+                break
+            finished = execution["status"] not in (ExecutionStatus.QUEUED, ExecutionStatus.RUNNING)
+            if finished and next_line >= execution.get("log_lines", 0):
+                yield "event: end\ndata: \n\n"
+                break
+            await asyncio.sleep(LOG_STREAM_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/{execution_id}/results")
 async def get_execution_results(execution_id: str, db = Depends(get_db)):
     """
@@ -217,7 +481,10 @@ async def get_execution_results(execution_id: str, db = Depends(get_db)):
     """
     try:
         # Vérifier si l'exécution existe
-        execution = await db.executions.find_one({"_id": ObjectId(execution_id)})
+        execution = await db.executions.find_one(
+            {"_id": ObjectId(execution_id)},
+            {"status": 1, "result_path": 1}
+        )
         if execution is None:
             raise HTTPException(status_code=404, detail="Exécution non trouvée")
         
@@ -230,43 +497,90 @@ async def get_execution_results(execution_id: str, db = Depends(get_db)):
             raise HTTPException(status_code=400, detail="L'exécution n'est pas terminée avec succès")
         
         # Générer l'URL présignée
-        presigned_url = get_presigned_url("results", execution["result_path"], expires=3600)
+        presigned_url = await get_presigned_url("results", execution["result_path"], expires=3600)
         
         return {"download_url": presigned_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération de l'URL de téléchargement des résultats: {str(e)}")
 
-@router.post("/{execution_id}/cancel", response_model=dict)
-async def cancel_execution(execution_id: str, db = Depends(get_db)):
+@router.get("/{execution_id}/results/preview", response_model=dict)
+async def preview_execution_results(
+    execution_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=PREVIEW_MAX_LIMIT),
+    columns: Optional[str] = None,
+    filters: List[str] = Query([], alias="filter"),
+    db = Depends(get_db)
+):
     """
-    Annule une exécution en cours.
+    Récupère une page des résultats d'une exécution sans télécharger le fichier.
+    
+    `columns` restreint les colonnes (séparées par des virgules) et chaque
+    `filter` est de la forme `colonne<op>valeur` (==, !=, >, >=, <, <=).
+    `offset` est un numéro de ligne du fichier ; la lecture reprend à
+    `next_offset` pour la page suivante.
     """
     try:
-        # Vérifier si l'exécution existe
-        execution = await db.executions.find_one({"_id": ObjectId(execution_id)})
+        execution = await db.executions.find_one(
+            {"_id": ObjectId(execution_id)},
+            {"status": 1, "result_path": 1}
+        )
         if execution is None:
             raise HTTPException(status_code=404, detail="Exécution non trouvée")
+        if not execution.get("result_path"):
+            raise HTTPException(status_code=404, detail="Aucun résultat disponible pour cette exécution")
+        if execution["status"] != ExecutionStatus.SUCCESS:
+            raise HTTPException(status_code=400, detail="L'exécution n'est pas terminée avec succès")
         
-        # Vérifier si l'exécution peut être annulée
-        if execution["status"] != ExecutionStatus.RUNNING and execution["status"] != ExecutionStatus.QUEUED:
-            raise HTTPException(status_code=400, detail="L'exécution ne peut pas être annulée car elle n'est pas en cours ou en attente")
-        
-        # Mettre à jour le statut de l'exécution
-        await db.executions.update_one(
-            {"_id": ObjectId(execution_id)},
+        selected = [name.strip() for name in columns.split(",") if name.strip()] if columns else None
+        page = await preview(db, execution_id, execution["result_path"], offset, limit, selected, filters)
+        return dict(page, execution_id=execution_id, offset=offset)
+    except HTTPException:
+        raise
+    except PreviewInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'aperçu des résultats de l'exécution: {str(e)}")
+
+@router.post("/{execution_id}/cancel", response_model=dict)
+async def cancel_execution(execution_id: str, db = Depends(get_db)):
+    """
+    Annule une exécution en cours.
+    """
+    try:
+        # Annuler en un seul appel, seulement si l'exécution est encore en cours ou
+        # en attente : une fin concurrente (SUCCESS) n'est jamais écrasée
+        execution = await db.executions.find_one_and_update(
+            {"_id": ObjectId(execution_id), "status": {"$in": [ExecutionStatus.RUNNING, ExecutionStatus.QUEUED]}},
             {
                 "$set": {
                     "status": ExecutionStatus.FAILED,
-                    "end_time": datetime.now(),
-                    "logs": execution.get("logs", []) + ["Exécution annulée par l'utilisateur"]
+                    "end_time": datetime.now()
                 }
-            }
+            },
+            projection={"status": 1, "created_at": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if execution is None:
+            # Vérifier si l'exécution existe
+            if await db.executions.find_one({"_id": ObjectId(execution_id)}, {"_id": 1}) is None:
+                raise HTTPException(status_code=404, detail="Exécution non trouvée")
+            raise HTTPException(status_code=400, detail="L'exécution ne peut pas être annulée car elle n'est pas en cours ou en attente")
+        await record_transition(db, "executions", execution, execution["status"], ExecutionStatus.FAILED)
+        publish_execution_status(execution_id, ExecutionStatus.FAILED)
+        # Interrompre le scoring local s'il s'exécute dans ce processus ; sinon le
+        # processus propriétaire l'interrompt à son prochain battement
+        await cancel_scoring_job(execution_id)
+        # Les logs embarqués doivent précéder la ligne ajoutée
+        await migrate_legacy_logs(db, execution_id)
+        await append_logs(db, execution_id, "Exécution annulée par l'utilisateur")
         
         return {
             "execution_id": execution_id,
             "status": "cancelled",
             "message": "L'exécution a été annulée avec succès"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de l'annulation de l'exécution: {str(e)}")
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.health import readiness
+
+router = APIRouter()
+
+@router.get("")
+async def health_check():
+    """Rapport détaillé de l'état des dépendances (sondes mises en cache)."""
+    ready, report = await readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+@router.get("/live")
+async def liveness():
+    """
+    Sonde de vivacité : le processus répond.
+    Aucune dépendance n'est interrogée, une panne externe ne doit pas provoquer de redémarrage.
+    """
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness_check():
+    """Sonde de disponibilité : 503 tant que le démarrage n'est pas terminé ou qu'une dépendance requise est injoignable."""
+    ready, report = await readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
@@ -1,25 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
-import os
-import tempfile
+from pymongo import ReturnDocument
+import logging
 
 from app.models.schemas import Model, ModelCreate, ModelUpdate, ModelStatus
 from app.services.database import get_db
-from app.services.minio_client import upload_file, get_presigned_url
+from app.services.pagination import paginate, set_next_cursor
+from app.services.serialization import OutputSchema, list_response
+from app.services.stats import record_created, record_deleted, record_transition
+from app.services.minio_async import get_presigned_url, invalidate_presigned_url, remove_object
+from app.services.artifacts import store_artifact, release_artifact, is_artifact
+from app.services.etag import (
+    collection_etag, document_etag, is_not_modified, not_modified_response, set_etag, touch_collection,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Forme de sortie des listes (projection MongoDB et sérialisation sans validation)
+MODEL_OUTPUT = OutputSchema(Model)
+
 # Fonction utilitaire pour convertir ObjectId en str
 def serialize_object_id(obj_id):
     return str(obj_id)
 
 @router.get("/", response_model=List[Model])
 async def get_models(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     department: Optional[str] = None,
     region: Optional[str] = None,
     status: Optional[ModelStatus] = None,
@@ -27,7 +41,14 @@ async def get_models(
 ):
     """
     Récupère la liste des modèles avec filtrage optionnel.
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor.
+    Répond 304 si la collection n'a pas changé depuis l'ETag fourni.
     """
+    # Aucune requête sur les modèles si la liste n'a pas changé
+    etag = await collection_etag(db, "models", request)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
     # Construire le filtre
     filter_query = {}
     if department:
@@ -38,27 +59,39 @@ async def get_models(
         filter_query["status"] = status
     
     # Exécuter la requête
-    cursor = db.models.find(filter_query).skip(skip).limit(limit)
-    models = await cursor.to_list(length=limit)
-    
-    # Convertir les ObjectId en str
-    for model in models:
-        model["_id"] = serialize_object_id(model["_id"])
-    
-    return models
+    models, next_cursor = await paginate(
+        db.models, filter_query, limit, cursor=cursor, skip=skip, projection=MODEL_OUTPUT.projection
+    )
+    response = list_response(models, MODEL_OUTPUT)
+    set_next_cursor(response, next_cursor)
+    set_etag(response, etag)
+    return response
 
 @router.get("/{model_id}", response_model=Model)
-async def get_model(model_id: str, db = Depends(get_db)):
+async def get_model(model_id: str, request: Request, response: Response, db = Depends(get_db)):
     """
     Récupère un modèle spécifique par son ID.
+    Répond 304 si le modèle n'a pas changé depuis l'ETag fourni.
     """
     try:
+        # Requête conditionnelle : ne lire que la date de modification
+        if request.headers.get("if-none-match"):
+            stamp = await db.models.find_one({"_id": ObjectId(model_id)}, {"updated_at": 1})
+            if stamp is None:
+                raise HTTPException(status_code=404, detail="Modèle non trouvé")
+            etag = document_etag(model_id, stamp.get("updated_at"))
+            if is_not_modified(request, etag):
+                return not_modified_response(etag)
+        
         model = await db.models.find_one({"_id": ObjectId(model_id)})
         if model is None:
             raise HTTPException(status_code=404, detail="Modèle non trouvé")
         
         model["_id"] = serialize_object_id(model["_id"])
+        set_etag(response, document_etag(model_id, model.get("updated_at")))
         return model
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération du modèle: {str(e)}")
 
@@ -72,43 +105,40 @@ async def create_model(
     Crée un nouveau modèle et télécharge optionnellement le fichier du modèle.
     """
     try:
-        # Préparer les données du modèle
+        # Préparer les données du modèle (identifiant généré localement)
         model_dict = model_data.dict()
+        model_dict["_id"] = ObjectId()
         model_dict["created_at"] = datetime.now()
         model_dict["updated_at"] = datetime.now()
         model_dict["status"] = ModelStatus.DRAFT
+        model_id = serialize_object_id(model_dict["_id"])
         
-        # Insérer le modèle dans la base de données
-        result = await db.models.insert_one(model_dict)
-        model_id = serialize_object_id(result.inserted_id)
-        
-        # Si un fichier de modèle est fourni, le télécharger vers MinIO
+        # Si un fichier de modèle est fourni, le stocker sous son SHA-256 : un
+        # contenu déjà connu n'est pas transféré à nouveau
+        artifact = None
         if model_file:
-            # Créer un fichier temporaire
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                # Écrire le contenu du fichier téléchargé dans le fichier temporaire
-                temp_file.write(await model_file.read())
-                temp_file_path = temp_file.name
+            artifact = await store_artifact(
+                db, model_file, content_type=model_file.content_type or "application/octet-stream"
+            )
             
-            try:
-                # Télécharger le fichier vers MinIO
-                object_name = f"{model_id}/{model_file.filename}"
-                upload_file("models", object_name, temp_file_path)
-                
-                # Mettre à jour le chemin du fichier dans la base de données
-                await db.models.update_one(
-                    {"_id": ObjectId(model_id)},
-                    {"$set": {"file_path": object_name}}
-                )
-            finally:
-                # Supprimer le fichier temporaire
-                os.unlink(temp_file_path)
+            # Conserver le chemin, le nom d'origine, la taille et le checksum du fichier
+            model_dict["file_path"] = artifact["object_name"]
+            model_dict["file_name"] = model_file.filename
+            model_dict["file_size"] = artifact["size"]
+            model_dict["file_sha256"] = artifact["sha256"]
         
-        # Récupérer le modèle créé
-        created_model = await db.models.find_one({"_id": ObjectId(model_id)})
-        created_model["_id"] = model_id
+        # Insérer le modèle dans la base de données ; la réponse est construite localement
+        try:
+            await db.models.insert_one(model_dict)
+        except Exception:
+            if artifact is not None:
+                await release_artifact(db, artifact["sha256"])
+            raise
+        await touch_collection(db, "models")
+        await record_created(db, "models", model_dict)
+        model_dict["_id"] = model_id
         
-        return created_model
+        return model_dict
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création du modèle: {str(e)}")
 
@@ -122,26 +152,28 @@ async def update_model(
     Met à jour un modèle existant.
     """
     try:
-        # Vérifier si le modèle existe
-        model = await db.models.find_one({"_id": ObjectId(model_id)})
-        if model is None:
-            raise HTTPException(status_code=404, detail="Modèle non trouvé")
-        
         # Préparer les données de mise à jour
         update_data = {k: v for k, v in model_update.dict(exclude_unset=True).items() if v is not None}
         update_data["updated_at"] = datetime.now()
         
-        # Mettre à jour le modèle
-        await db.models.update_one(
+        # Mettre à jour le modèle en un seul appel : la version précédente sert aux
+        # statistiques et la version modifiée est reconstruite localement
+        previous_model = await db.models.find_one_and_update(
             {"_id": ObjectId(model_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.BEFORE
         )
-        
-        # Récupérer le modèle mis à jour
-        updated_model = await db.models.find_one({"_id": ObjectId(model_id)})
+        if previous_model is None:
+            raise HTTPException(status_code=404, detail="Modèle non trouvé")
+        await touch_collection(db, "models")
+        if "status" in update_data:
+            await record_transition(db, "models", previous_model, previous_model.get("status"), update_data["status"])
+        updated_model = dict(previous_model, **update_data)
         updated_model["_id"] = model_id
         
         return updated_model
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la mise à jour du modèle: {str(e)}")
 
@@ -151,15 +183,29 @@ async def delete_model(model_id: str, db = Depends(get_db)):
     Supprime un modèle existant.
     """
     try:
-        # Vérifier si le modèle existe
-        model = await db.models.find_one({"_id": ObjectId(model_id)})
+        # Supprimer le modèle en récupérant le document : deux suppressions
+        # concurrentes ne libèrent pas deux fois le même fichier
+        model = await db.models.find_one_and_delete({"_id": ObjectId(model_id)})
         if model is None:
             raise HTTPException(status_code=404, detail="Modèle non trouvé")
+        await touch_collection(db, "models")
+        await record_deleted(db, "models", model)
         
-        # Supprimer le modèle
-        await db.models.delete_one({"_id": ObjectId(model_id)})
+        # Libérer le fichier : un artefact partagé n'est supprimé qu'avec sa dernière référence
+        file_path = model.get("file_path")
+        if is_artifact(file_path):
+            await release_artifact(db, model["file_sha256"])
+        elif file_path:
+            # Fichier antérieur au stockage par contenu, propre à ce modèle
+            invalidate_presigned_url("models", file_path)
+            try:
+                await remove_object("models", file_path)
+            except Exception as e:
+                logger.error(f"Erreur lors de la suppression du fichier du modèle {model_id}: {e}")
         
         return JSONResponse(status_code=204, content={})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression du modèle: {str(e)}")
 
@@ -179,7 +225,7 @@ async def download_model(model_id: str, db = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Aucun fichier associé à ce modèle")
         
         # Générer l'URL présignée
-        presigned_url = get_presigned_url("models", model["file_path"], expires=3600)
+        presigned_url = await get_presigned_url("models", model["file_path"], expires=3600)
         
         return {"download_url": presigned_url}
     except Exception as e:
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.services.database import get_db
+from app.services.stats import get_stats, STATS_RETENTION_DAYS
+
+router = APIRouter()
+
+@router.get("/", response_model=dict)
+async def get_dashboard_stats(
+    days: int = Query(30, ge=1, le=STATS_RETENTION_DAYS),
+    db = Depends(get_db)
+):
+    """
+    Récupère les statistiques du tableau de bord : modèles par statut et par
+    département, déploiements par statut, exécutions par statut et par jour.
+    Les compteurs sont maintenus à chaque écriture et lus en une seule requête.
+    """
+    try:
+        return await get_stats(db, days=days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des statistiques: {str(e)}")
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from jose import JWTError, jwt
 import os
 
 from app.models.schemas import User, UserCreate, UserUpdate, UserRole, Token, TokenData
 from app.services.database import get_db
+from app.services.pagination import paginate, set_next_cursor
+from app.services.serialization import OutputSchema, list_response
+from app.services.password_hashing import hash_password, verify_password, HashingOverloaded
+from app.services.user_cache import get_cached_token, cache_token, get_cached_user, invalidate_user, USERS_VERSION_ID
+from app.services.etag import collection_etag, document_etag, is_not_modified, not_modified_response, set_etag
 
 router = APIRouter()
 
@@ -18,21 +24,24 @@ SECRET_KEY = os.getenv("SECRET_KEY", "mlplatformsecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Utilitaires pour la gestion des mots de passe et des tokens
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Utilitaires pour la gestion des tokens (le hachage des mots de passe est délégué
+# au pool de processus de services/password_hashing)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
 
+# Forme de sortie des listes : le hash du mot de passe n'est jamais lu
+USER_OUTPUT = OutputSchema(User)
+
 # Fonction utilitaire pour convertir ObjectId en str
 def serialize_object_id(obj_id):
     return str(obj_id)
 
-def verify_password(plain_password, hashed_password):
-    """Vérifie si le mot de passe en clair correspond au mot de passe haché."""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    """Génère un hash du mot de passe."""
-    return pwd_context.hash(password)
+def hashing_overloaded_exception():
+    """Erreur renvoyée lorsque le pool de hachage est saturé."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Service d'authentification surchargé, veuillez réessayer",
+        headers={"Retry-After": "1"},
+    )
 
 async def get_user(db, username: str):
     """Récupère un utilisateur par son nom d'utilisateur."""
@@ -46,8 +55,12 @@ async def authenticate_user(db, username: str, password: str):
     user = await get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    valid, new_hash = await verify_password(password, user["hashed_password"])
+    if not valid:
         return False
+    # Mettre à niveau de manière transparente un hash de coût insuffisant
+    if new_hash:
+        await db.users.update_one({"_id": ObjectId(user["_id"])}, {"$set": {"hashed_password": new_hash}})
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -69,14 +82,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db = Depends(get
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # Réutiliser le contenu des tokens déjà décodés
+        payload = get_cached_token(token)
+        if payload is None:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            cache_token(token, payload)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username, role=payload.get("role"))
     except JWTError:
         raise credentials_exception
-    user = await get_user(db, username=token_data.username)
+    # L'utilisateur est servi depuis le cache, invalidé par update_user/delete_user
+    user = await get_cached_user(db, token_data.username, get_user)
     if user is None:
         raise credentials_exception
     return user
@@ -90,7 +108,10 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db = Depends(get_db)):
     """Endpoint pour obtenir un token d'accès."""
-    user = await authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HashingOverloaded:
+        raise hashing_overloaded_exception()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -104,20 +125,32 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=User)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+async def read_users_me(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(get_current_active_user)
+):
     """Récupère les informations de l'utilisateur actuel."""
+    etag = document_etag(current_user["_id"], current_user.get("updated_at"))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_etag(response, etag)
     return current_user
 
 @router.get("/", response_model=List[User])
 async def get_users(
+    request: Request,
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
     """
     Récupère la liste des utilisateurs.
     Nécessite des privilèges d'administrateur.
+    Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor.
+    Répond 304 si la collection n'a pas changé depuis l'ETag fourni.
     """
     # Vérifier si l'utilisateur a les droits d'administrateur
     if current_user["role"] != UserRole.ADMIN:
@@ -126,17 +159,19 @@ async def get_users(
             detail="Opération non autorisée"
         )
     
-    # Exécuter la requête
-    cursor = db.users.find().skip(skip).limit(limit)
-    users = await cursor.to_list(length=limit)
-    
-    # Convertir les ObjectId en str et supprimer les mots de passe hachés
-    for user in users:
-        user["_id"] = serialize_object_id(user["_id"])
-        if "hashed_password" in user:
-            del user["hashed_password"]
+    # Aucune requête sur les utilisateurs si la liste n'a pas changé
+    etag = await collection_etag(db, USERS_VERSION_ID, request)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
     
-    return users
+    # Exécuter la requête
+    users, next_cursor = await paginate(
+        db.users, {}, limit, cursor=cursor, skip=skip, projection=USER_OUTPUT.projection
+    )
+    response = list_response(users, USER_OUTPUT)
+    set_next_cursor(response, next_cursor)
+    set_etag(response, etag)
+    return response
 
 @router.post("/", response_model=User, status_code=status.HTTP_201_CREATED)
 async def create_user(
@@ -155,31 +190,29 @@ async def create_user(
             detail="Opération non autorisée"
         )
     
-    # Vérifier si le nom d'utilisateur existe déjà
-    existing_user = await db.users.find_one({"username": user_data.username})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Ce nom d'utilisateur existe déjà"
-        )
-    
     # Préparer les données de l'utilisateur
     user_dict = user_data.dict(exclude={"password"})
-    user_dict["hashed_password"] = get_password_hash(user_data.password)
+    try:
+        user_dict["hashed_password"] = await hash_password(user_data.password)
+    except HashingOverloaded:
+        raise hashing_overloaded_exception()
     user_dict["created_at"] = datetime.now()
     user_dict["updated_at"] = datetime.now()
     
-    # Insérer l'utilisateur dans la base de données
-    result = await db.users.insert_one(user_dict)
-    user_id = serialize_object_id(result.inserted_id)
-    
-    # Récupérer l'utilisateur créé
-    created_user = await db.users.find_one({"_id": ObjectId(user_id)})
-    created_user["_id"] = user_id
+    # Insérer l'utilisateur ; l'unicité du nom est garantie par l'index users_username_unique
+    try:
+        result = await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ce nom d'utilisateur existe déjà"
+        )
+    # Faire évoluer la version de la collection (ETags des listes)
+    await invalidate_user(db, user_dict["username"])
     
-    # Supprimer le mot de passe haché de la réponse
-    if "hashed_password" in created_user:
-        del created_user["hashed_password"]
+    # Construire la réponse localement, sans le mot de passe haché
+    created_user = {k: v for k, v in user_dict.items() if k != "hashed_password"}
+    created_user["_id"] = serialize_object_id(result.inserted_id)
     
     return created_user
 
@@ -194,11 +227,6 @@ async def update_user(
     Met à jour un utilisateur existant.
     Un utilisateur peut mettre à jour ses propres informations, mais seul un administrateur peut modifier le rôle.
     """
-    # Vérifier si l'utilisateur existe
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if user is None:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-    
     # Vérifier les permissions
     is_admin = current_user["role"] == UserRole.ADMIN
     is_self = str(current_user["_id"]) == user_id
@@ -220,20 +248,18 @@ async def update_user(
     update_data = {k: v for k, v in user_update.dict(exclude_unset=True).items() if v is not None}
     update_data["updated_at"] = datetime.now()
     
-    # Mettre à jour l'utilisateur
-    await db.users.update_one(
+    # Mettre à jour l'utilisateur et récupérer la version modifiée en un seul appel
+    updated_user = await db.users.find_one_and_update(
         {"_id": ObjectId(user_id)},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"hashed_password": 0},
+        return_document=ReturnDocument.AFTER
     )
-    
-    # Récupérer l'utilisateur mis à jour
-    updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
+    if updated_user is None:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    await invalidate_user(db, updated_user["username"])
     updated_user["_id"] = user_id
     
-    # Supprimer le mot de passe haché de la réponse
-    if "hashed_password" in updated_user:
-        del updated_user["hashed_password"]
-    
     return updated_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -267,5 +293,6 @@ async def delete_user(
     
     # Supprimer l'utilisateur
     await db.users.delete_one({"_id": ObjectId(user_id)})
+    await invalidate_user(db, user["username"])
     
     return JSONResponse(status_code=204, content={})
@@ -1,12 +1,24 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer
 
-from app.api import models, deployments, executions, users
-from app.services.database import init_db
+from app.api import models, deployments, executions, users, events, stats, health
+from app.services.database import init_db, get_db
 from app.services.minio_client import init_minio
-from app.services.airflow_client import init_airflow
+from app.services.minio_async import create_buckets, shutdown_minio_pool
+from app.services.password_hashing import shutdown_hashing_pool
+from app.services.model_server import shutdown_model_server
+from app.services.batch_scoring import stop_scoring_jobs
+from app.services.airflow_client import init_airflow, close_airflow
+from app.services.status_reconciler import start_reconciler, stop_reconciler
+from app.services.event_bus import start_change_streams, stop_change_streams
+from app.services.stats import start_stats_repair, stop_stats_repair
+from app.services.metrics import MetricsMiddleware, render_metrics
+from app.services import health as health_service
+from app.services.serialization import FastJSONResponse
 
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
@@ -26,6 +38,8 @@ app = FastAPI(
     title="ML Platform API",
     description="API pour la plateforme centralisée de modèles ML",
     version="0.1.0",
+    # Encodage orjson pour toutes les réponses JSON
+    default_response_class=FastJSONResponse,
 )
 
 # Configuration CORS
@@ -35,25 +49,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Mesure de la durée des requêtes par gabarit de route
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+async def ensure_buckets():
+    """Crée les buckets manquants ; un échec n'empêche pas le démarrage (signalé par /health/ready)."""
+    try:
+        await create_buckets()
+    except Exception as e:
+        logger.error(f"Erreur lors de la vérification des buckets MinIO: {e}")
+
 # Événement de démarrage
 @app.on_event("startup")
 async def startup_event():
     logger.info("Initialisation de l'API ML Platform")
-    # Initialiser la connexion à la base de données
-    await init_db()
-    # Initialiser la connexion à MinIO
-    init_minio()
-    # Initialiser la connexion à Airflow
+    # Créer les clients MinIO et Airflow (aucun appel réseau)
+    init_minio(check_buckets=False)
     init_airflow()
+    # Initialiser MongoDB et vérifier les buckets MinIO en parallèle
+    await asyncio.gather(init_db(), ensure_buckets())
+    # Démarrer la réconciliation des statuts Airflow en arrière-plan
+    start_reconciler(get_db())
+    # Alimenter le bus d'événements par les change streams MongoDB si activé
+    start_change_streams(get_db())
+    # Recalculer périodiquement les statistiques du tableau de bord
+    start_stats_repair(get_db())
+    health_service.startup_complete = True
     logger.info("API ML Platform initialisée avec succès")
 
+# Événement d'arrêt
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Retirer l'instance du trafic avant de libérer les ressources
+    health_service.startup_complete = False
+    # Arrêter la réconciliation des statuts Airflow
+    await stop_reconciler()
+    await stop_change_streams()
+    await stop_stats_repair()
+    # Interrompre les scorings locaux en cours (marqués en échec)
+    await stop_scoring_jobs(get_db())
+    # Libérer les pools de threads MinIO, de processus de hachage et de prédiction
+    shutdown_minio_pool()
+    shutdown_hashing_pool()
+    shutdown_model_server()
+    # Fermer les connexions au serveur Airflow
+    await close_airflow()
+
 # Inclure les routeurs
 app.include_router(models.router, prefix="/api/models", tags=["models"])
 app.include_router(deployments.router, prefix="/api/deployments", tags=["deployments"])
 app.include_router(executions.router, prefix="/api/executions", tags=["executions"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
+app.include_router(events.router, prefix="/api/events", tags=["events"])
+app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(health.router, prefix="/health", tags=["health"])
 
 # Route de base
 @app.get("/", tags=["root"])
@@ -64,14 +116,7 @@ async def root():
         "status": "online",
     }
 
-# Route de vérification de santé
-@app.get("/health", tags=["health"])
-async def health_check():
-    return {
-        "status": "healthy",
-        "services": {
-            "database": "connected",
-            "minio": "connected",
-            "airflow": "connected",
-        }
-    }
+# Métriques au format Prometheus (propres au processus : chaque worker est collecté séparément)
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 from enum import Enum
 
@@ -58,6 +58,9 @@ class ModelInDB(ModelBase):
     brand: Optional[str] = None
     status: ModelStatus = ModelStatus.DRAFT
     file_path: Optional[str] = None
+    file_name: Optional[str] = None
+    file_size: Optional[int] = None
+    file_sha256: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -95,6 +98,7 @@ class DeploymentInDB(DeploymentBase):
     owner_id: str
     status: DeploymentStatus = DeploymentStatus.PENDING
     dag_id: Optional[str] = None
+    dag_run_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
@@ -104,15 +108,31 @@ class DeploymentInDB(DeploymentBase):
 class Deployment(DeploymentInDB):
     pass
 
+class PredictionRequest(BaseModel):
+    # Lignes nommées (variable -> valeur) ou vecteurs dans l'ordre des variables du modèle
+    instances: List[Union[Dict[str, Any], List[Any]]] = Field(..., min_items=1)
+    probabilities: bool = False
+
+class PredictionResponse(BaseModel):
+    deployment_id: str
+    model_id: str
+    predictions: List[Any]
+
 class ExecutionStatus(str, Enum):
     QUEUED = "queued"
     RUNNING = "running"
     SUCCESS = "success"
     FAILED = "failed"
 
+class ExecutionEngine(str, Enum):
+    AIRFLOW = "airflow"
+    LOCAL = "local"
+
 class ExecutionBase(BaseModel):
     deployment_id: str
     parameters: Dict[str, Any] = {}
+    # local : scoring en flux par l'API (parameters.input_path dans le bucket datasets)
+    engine: ExecutionEngine = ExecutionEngine.AIRFLOW
 
 class ExecutionCreate(ExecutionBase):
     owner_id: str
@@ -122,10 +142,14 @@ class ExecutionInDB(ExecutionBase):
     owner_id: str
     model_id: str
     status: ExecutionStatus = ExecutionStatus.QUEUED
+    dag_id: Optional[str] = None
+    dag_run_id: Optional[str] = None
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     result_path: Optional[str] = None
-    logs: List[str] = []
+    result_rows: Optional[int] = None
+    log_lines: int = 0
+    log_bytes: int = 0
     created_at: datetime
 
     class Config:
@@ -134,6 +158,20 @@ class ExecutionInDB(ExecutionBase):
 class Execution(ExecutionInDB):
     pass
 
+class ExecutionBatchCreate(BaseModel):
+    executions: List[ExecutionCreate]
+
+class ExecutionBatchItemResult(BaseModel):
+    index: int
+    execution_id: Optional[str] = None
+    status: Optional[ExecutionStatus] = None
+    error: Optional[str] = None
+
+class ExecutionBatchResult(BaseModel):
+    submitted: int
+    failed: int
+    results: List[ExecutionBatchItemResult]
+
 class UserRole(str, Enum):
     ADMIN = "admin"
     DATA_SCIENTIST = "data_scientist"
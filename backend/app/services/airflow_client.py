@@ -1,10 +1,13 @@
 import httpx
+import asyncio
 import logging
 import os
-from urllib.parse import urljoin
-import json
+import random
+import time
 import base64
 
+from app.services.metrics import observe_airflow
+
 logger = logging.getLogger(__name__)
 
 # Variables d'environnement
@@ -12,10 +15,110 @@ AIRFLOW_ENDPOINT = os.getenv("AIRFLOW_ENDPOINT", "http://airflow-webserver:8080"
 AIRFLOW_USERNAME = os.getenv("AIRFLOW_USERNAME", "airflow")
 AIRFLOW_PASSWORD = os.getenv("AIRFLOW_PASSWORD", "airflow")
 
+# Pool de connexions et délais
+AIRFLOW_MAX_CONNECTIONS = int(os.getenv("AIRFLOW_MAX_CONNECTIONS", "20"))
+AIRFLOW_MAX_KEEPALIVE = int(os.getenv("AIRFLOW_MAX_KEEPALIVE", "10"))
+AIRFLOW_CONNECT_TIMEOUT = float(os.getenv("AIRFLOW_CONNECT_TIMEOUT", "2"))
+AIRFLOW_READ_TIMEOUT = float(os.getenv("AIRFLOW_READ_TIMEOUT", "10"))
+AIRFLOW_POOL_TIMEOUT = float(os.getenv("AIRFLOW_POOL_TIMEOUT", "2"))
+
+# Nouvelles tentatives (requêtes idempotentes uniquement)
+AIRFLOW_MAX_RETRIES = int(os.getenv("AIRFLOW_MAX_RETRIES", "3"))
+AIRFLOW_RETRY_BASE_DELAY = float(os.getenv("AIRFLOW_RETRY_BASE_DELAY", "0.2"))
+AIRFLOW_RETRY_MAX_DELAY = float(os.getenv("AIRFLOW_RETRY_MAX_DELAY", "2"))
+
+# Disjoncteur
+AIRFLOW_BREAKER_THRESHOLD = int(os.getenv("AIRFLOW_BREAKER_THRESHOLD", "5"))
+AIRFLOW_BREAKER_RESET_TIMEOUT = float(os.getenv("AIRFLOW_BREAKER_RESET_TIMEOUT", "30"))
+
+# Codes HTTP considérés comme des pannes transitoires d'Airflow
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
 # Client Airflow
 airflow_client = None
 airflow_auth_header = None
 
+class AirflowUnavailable(Exception):
+    """Levée sans appel réseau lorsque le disjoncteur Airflow est ouvert."""
+
+class CircuitBreaker:
+    """
+    Disjoncteur : après `threshold` échecs consécutifs, les appels échouent
+    immédiatement pendant `reset_timeout` secondes, puis un seul appel d'essai
+    est autorisé pour décider de la refermeture.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open":
+            raise AirflowUnavailable("Airflow indisponible (disjoncteur ouvert)")
+        if state == "half-open":
+            # Un seul appel d'essai à la fois (un essai abandonné expire après reset_timeout)
+            now = time.monotonic()
+            if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+                raise AirflowUnavailable("Airflow indisponible (disjoncteur ouvert)")
+            self.probe_started_at = now
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started_at = None
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logger.warning("Disjoncteur Airflow ouvert après des échecs consécutifs")
+            self.opened_at = time.monotonic()
+
+circuit_breaker = CircuitBreaker(AIRFLOW_BREAKER_THRESHOLD, AIRFLOW_BREAKER_RESET_TIMEOUT)
+
+# Requêtes identiques en cours, partagées entre les appelants concurrents
+inflight_requests = {}
+
+# Métriques par endpoint (gabarit de chemin, sans identifiants)
+endpoint_metrics = {}
+
+def _record_metrics(endpoint, duration, error):
+    metrics = endpoint_metrics.setdefault(
+        endpoint, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+    )
+    metrics["count"] += 1
+    metrics["total_seconds"] += duration
+    metrics["max_seconds"] = max(metrics["max_seconds"], duration)
+    if error:
+        metrics["errors"] += 1
+    observe_airflow(endpoint, duration, error)
+
+def get_airflow_metrics():
+    """Retourne les métriques de latence et d'erreurs par endpoint Airflow."""
+    return {
+        "circuit_breaker": circuit_breaker.state,
+        "endpoints": {
+            endpoint: dict(
+                metrics,
+                avg_seconds=metrics["total_seconds"] / metrics["count"] if metrics["count"] else 0.0,
+            )
+            for endpoint, metrics in endpoint_metrics.items()
+        },
+    }
+
 def init_airflow():
     """Initialise la connexion au service Airflow."""
     global airflow_client, airflow_auth_header
@@ -29,11 +132,19 @@ def init_airflow():
         
         airflow_auth_header = {"Authorization": f"Basic {base64_auth}"}
         
-        # Initialiser le client HTTP
+        # Initialiser le client HTTP avec un pool de connexions borné
         airflow_client = httpx.AsyncClient(
             base_url=AIRFLOW_ENDPOINT,
             headers=airflow_auth_header,
-            timeout=30.0
+            timeout=httpx.Timeout(
+                AIRFLOW_READ_TIMEOUT,
+                connect=AIRFLOW_CONNECT_TIMEOUT,
+                pool=AIRFLOW_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=AIRFLOW_MAX_CONNECTIONS,
+                max_keepalive_connections=AIRFLOW_MAX_KEEPALIVE,
+            ),
         )
         
         logger.info("Client Airflow initialisé avec succès")
@@ -42,19 +153,93 @@ def init_airflow():
         logger.error(f"Erreur lors de l'initialisation du client Airflow: {e}")
         raise
 
+async def close_airflow():
+    """Ferme le client Airflow et ses connexions."""
+    global airflow_client
+    if airflow_client is not None:
+        await airflow_client.aclose()
+        airflow_client = None
+
 async def get_airflow_client():
     """Retourne l'instance du client Airflow."""
     if airflow_client is None:
         raise Exception("Le client Airflow n'a pas été initialisé")
     return airflow_client
 
+def _retry_delay(attempt):
+    """Délai avant une nouvelle tentative : backoff exponentiel avec jitter complet."""
+    return random.uniform(0, min(AIRFLOW_RETRY_MAX_DELAY, AIRFLOW_RETRY_BASE_DELAY * 2 ** attempt))
+
+async def _send(method, path, endpoint, idempotent, json=None):
+    """Envoie une requête à Airflow via le disjoncteur, avec nouvelles tentatives si idempotente."""
+    client = await get_airflow_client()
+    attempts = AIRFLOW_MAX_RETRIES + 1 if idempotent else 1
+    
+    for attempt in range(attempts):
+        circuit_breaker.before_call()
+        start = time.perf_counter()
+        failure = None
+        response = None
+        try:
+            response = await client.request(method, path, json=json)
+            if response.status_code >= 500 or response.status_code in RETRYABLE_STATUS_CODES:
+                failure = httpx.HTTPStatusError(
+                    f"Erreur Airflow {response.status_code}", request=response.request, response=response
+                )
+        except httpx.TransportError as e:
+            failure = e
+        _record_metrics(
+            endpoint, time.perf_counter() - start, response is None or response.status_code >= 400
+        )
+        
+        if failure is None:
+            circuit_breaker.record_success()
+            response.raise_for_status()
+            return response.json()
+        
+        circuit_breaker.record_failure()
+        retryable = isinstance(failure, httpx.TransportError) or (
+            failure.response.status_code in RETRYABLE_STATUS_CODES
+        )
+        if not retryable or attempt == attempts - 1:
+            raise failure
+        await asyncio.sleep(_retry_delay(attempt))
+
+async def _request(method, path, endpoint, idempotent=False, json=None, coalesce=False):
+    """
+    Point d'entrée unique des appels à Airflow.
+
+    Avec `coalesce=True`, les appels concurrents identiques partagent une seule
+    requête HTTP.
+    """
+    if not coalesce:
+        return await _send(method, path, endpoint, idempotent, json)
+    
+    key = (method, path)
+    task = inflight_requests.get(key)
+    if task is None:
+        # La requête partagée est une tâche indépendante : l'annulation d'un
+        # appelant, même le premier, n'interrompt pas les autres
+        task = asyncio.ensure_future(_send(method, path, endpoint, idempotent, json))
+        inflight_requests[key] = task
+
+        def release(done):
+            inflight_requests.pop(key, None)
+            # Éviter l'avertissement « exception jamais récupérée » si plus personne n'attendait
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(release)
+    return await asyncio.shield(task)
+
+async def get_health():
+    """Interroge l'endpoint de santé d'Airflow (sans nouvelle tentative)."""
+    return await _request("GET", "/api/v1/health", "GET /api/v1/health")
+
 async def get_dags():
     """Récupère la liste des DAGs disponibles."""
     try:
-        client = await get_airflow_client()
-        response = await client.get("/api/v1/dags")
-        response.raise_for_status()
-        return response.json()
+        return await _request("GET", "/api/v1/dags", "GET /api/v1/dags", idempotent=True)
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des DAGs: {e}")
         raise
@@ -62,10 +247,10 @@ async def get_dags():
 async def get_dag(dag_id):
     """Récupère les informations d'un DAG spécifique."""
     try:
-        client = await get_airflow_client()
-        response = await client.get(f"/api/v1/dags/{dag_id}")
-        response.raise_for_status()
-        return response.json()
+        return await _request(
+            "GET", f"/api/v1/dags/{dag_id}", "GET /api/v1/dags/{dag_id}",
+            idempotent=True, coalesce=True
+        )
     except Exception as e:
         logger.error(f"Erreur lors de la récupération du DAG {dag_id}: {e}")
         raise
@@ -73,11 +258,11 @@ async def get_dag(dag_id):
 async def trigger_dag(dag_id, conf=None):
     """Déclenche l'exécution d'un DAG."""
     try:
-        client = await get_airflow_client()
         payload = {"conf": conf or {}}
-        response = await client.post(f"/api/v1/dags/{dag_id}/dagRuns", json=payload)
-        response.raise_for_status()
-        return response.json()
+        # Pas de nouvelle tentative : un POST répété créerait un second run
+        return await _request(
+            "POST", f"/api/v1/dags/{dag_id}/dagRuns", "POST /api/v1/dags/{dag_id}/dagRuns", json=payload
+        )
     except Exception as e:
         logger.error(f"Erreur lors du déclenchement du DAG {dag_id}: {e}")
         raise
@@ -85,10 +270,9 @@ async def trigger_dag(dag_id, conf=None):
 async def get_dag_runs(dag_id):
     """Récupère les exécutions d'un DAG spécifique."""
     try:
-        client = await get_airflow_client()
-        response = await client.get(f"/api/v1/dags/{dag_id}/dagRuns")
-        response.raise_for_status()
-        return response.json()
+        return await _request(
+            "GET", f"/api/v1/dags/{dag_id}/dagRuns", "GET /api/v1/dags/{dag_id}/dagRuns", idempotent=True
+        )
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des exécutions du DAG {dag_id}: {e}")
         raise
@@ -96,14 +280,46 @@ async def get_dag_runs(dag_id):
 async def get_dag_run_status(dag_id, run_id):
     """Récupère le statut d'une exécution spécifique d'un DAG."""
     try:
-        client = await get_airflow_client()
-        response = await client.get(f"/api/v1/dags/{dag_id}/dagRuns/{run_id}")
-        response.raise_for_status()
-        return response.json()
+        return await _request(
+            "GET", f"/api/v1/dags/{dag_id}/dagRuns/{run_id}", "GET /api/v1/dags/{dag_id}/dagRuns/{run_id}",
+            idempotent=True, coalesce=True
+        )
     except Exception as e:
         logger.error(f"Erreur lors de la récupération du statut de l'exécution {run_id} du DAG {dag_id}: {e}")
         raise
 
+async def list_dag_runs_batch(dag_ids, states=None, start_date_gte=None, page_limit=100):
+    """
+    Récupère en lot les exécutions de plusieurs DAGs via l'endpoint dagRuns/list.
+
+    Les pages sont parcourues jusqu'à épuisement des résultats.
+    """
+    try:
+        payload = {"dag_ids": list(dag_ids), "page_limit": page_limit}
+        if states:
+            payload["states"] = list(states)
+        if start_date_gte:
+            payload["start_date_gte"] = start_date_gte.isoformat()
+        
+        dag_runs = []
+        page_offset = 0
+        while True:
+            payload["page_offset"] = page_offset
+            # Endpoint de lecture seule malgré le verbe POST : il peut être rejoué
+            data = await _request(
+                "POST", "/api/v1/dags/~/dagRuns/list", "POST /api/v1/dags/~/dagRuns/list",
+                idempotent=True, json=dict(payload)
+            )
+            page = data.get("dag_runs", [])
+            dag_runs.extend(page)
+            page_offset += len(page)
+            if not page or page_offset >= data.get("total_entries", 0):
+                break
+        return dag_runs
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération en lot des exécutions des DAGs: {e}")
+        raise
+
 async def create_dag_file(dag_id, dag_content):
     """Crée un fichier DAG dans le répertoire dags d'Airflow."""
     # Cette fonction est une simulation car l'API Airflow ne permet pas de créer des DAGs directement
@@ -0,0 +1,237 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from bson import ObjectId
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import time
+
+from app.services import minio_client
+from app.services.minio_async import download_file, run_in_pool
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "/tmp/ml-platform/artifact-cache")
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Processus de l'API partageant ARTIFACT_CACHE_DIR : le budget est réparti entre eux
+ARTIFACT_CACHE_WORKERS = int(os.getenv("ARTIFACT_CACHE_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+
+class ArtifactDiskCache:
+    """
+    Cache disque LRU des objets MinIO, borné en octets.
+
+    La clé est (bucket, objet, ETag) : un objet remplacé n'est jamais servi
+    depuis une copie périmée. Chaque fichier est téléchargé dans un répertoire
+    temporaire puis renommé, un fichier visible dans le cache est donc toujours
+    complet. Les absences simultanées d'un même objet partagent un seul
+    téléchargement. Les fichiers en cours d'utilisation (`open`) ne sont jamais
+    évincés.
+
+    Chaque processus travaille dans son propre sous-répertoire (`worker-<n>`),
+    réservé par un verrou de fichier tant qu'il vit, avec une part du budget :
+    un processus ne supprime ni les téléchargements en cours ni les fichiers
+    utilisés par un autre.
+    """
+
+    def __init__(self, directory=ARTIFACT_CACHE_DIR, max_bytes=ARTIFACT_CACHE_MAX_BYTES,
+                 workers=ARTIFACT_CACHE_WORKERS):
+        self.root_directory = directory
+        self.directory = None
+        self.tmp_directory = None
+        self.max_bytes = max_bytes // max(1, workers)
+        self.workers = workers
+        self.lock_file = None
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.pins = {}
+        self.inflight = {}
+        self.loaded = False
+        self.load_lock = asyncio.Lock()
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "fill_errors": 0,
+            "fill_seconds": 0.0,
+        }
+
+    @staticmethod
+    def _digest(bucket_name, object_name, etag):
+        return hashlib.sha256(f"{bucket_name}/{object_name}/{etag}".encode()).hexdigest()
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _claim_directory(self):
+        """Réserve le premier sous-répertoire libre du cache pour ce processus."""
+        slot = 0
+        while True:
+            directory = os.path.join(self.root_directory, f"worker-{slot}")
+            os.makedirs(directory, exist_ok=True)
+            lock_file = open(os.path.join(directory, ".lock"), "w")
+            try:
+                # Verrou libéré par le système à la fin du processus
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                slot += 1
+                continue
+            if slot >= self.workers:
+                logger.warning(
+                    f"Cache disque des artefacts: plus de {self.workers} processus partagent "
+                    f"{self.root_directory}, le budget total est dépassé (ARTIFACT_CACHE_WORKERS)"
+                )
+            self.lock_file = lock_file
+            return directory
+
+    def _scan(self):
+        """
+        Réserve le répertoire du processus et reconstruit son index depuis le
+        disque, du moins récemment utilisé au plus récent.
+        """
+        self.directory = self._claim_directory()
+        self.tmp_directory = os.path.join(self.directory, "tmp")
+        # Téléchargements interrompus d'un processus précédent ayant occupé ce répertoire
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory, exist_ok=True)
+        files = []
+        for root, _, names in os.walk(self.directory):
+            if root.startswith(self.tmp_directory) or root == self.directory:
+                continue
+            for name in names:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        return sorted(files)
+
+    async def _ensure_loaded(self):
+        if self.loaded:
+            return
+        async with self.load_lock:
+            if self.loaded:
+                return
+            for _, digest, size in await asyncio.get_running_loop().run_in_executor(None, self._scan):
+                self.entries[digest] = size
+                self.total_bytes += size
+            self.loaded = True
+            self._evict()
+            logger.info(f"Cache disque des artefacts: {len(self.entries)} fichier(s), {self.total_bytes} octets")
+
+    def _evict(self):
+        """Supprime les fichiers les moins récemment utilisés au-delà du budget."""
+        for digest in list(self.entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if self.pins.get(digest):
+                continue
+            size = self.entries.pop(digest)
+            self.total_bytes -= size
+            self.metrics["evictions"] += 1
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+
+    async def _fill(self, digest, bucket_name, object_name):
+        start = time.perf_counter()
+        tmp_path = os.path.join(self.tmp_directory, f"{digest}.{ObjectId()}")
+        try:
+            await download_file(bucket_name, object_name, tmp_path)
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except BaseException:
+            self.metrics["fill_errors"] += 1
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            self.metrics["fill_seconds"] += time.perf_counter() - start
+        self.entries[digest] = size
+        self.total_bytes += size
+        return size
+
+    async def _get(self, bucket_name, object_name, etag=None):
+        """Retourne la clé d'un objet présent dans le cache, après téléchargement si besoin."""
+        await self._ensure_loaded()
+        if etag is None:
+            stat = await run_in_pool(bucket_name, minio_client.get_minio_client().stat_object, bucket_name, object_name)
+            etag = stat.etag
+        digest = self._digest(bucket_name, object_name, etag)
+
+        if digest in self.entries:
+            self.entries.move_to_end(digest)
+            self.metrics["hits"] += 1
+            # La date de modification conserve l'ordre LRU après un redémarrage
+            try:
+                os.utime(self._path(digest))
+            except FileNotFoundError:
+                pass
+            return digest
+
+        while digest not in self.entries:
+            # Le fichier peut être évincé par un autre remplissage avant la reprise
+            # de cette coroutine : le télécharger à nouveau dans ce cas
+            task = self.inflight.get(digest)
+            if task is not None:
+                self.metrics["coalesced"] += 1
+            else:
+                self.metrics["misses"] += 1
+                task = asyncio.ensure_future(self._fill(digest, bucket_name, object_name))
+                self.inflight[digest] = task
+                task.add_done_callback(lambda _: self.inflight.pop(digest, None))
+            await asyncio.shield(task)
+        return digest
+
+    @asynccontextmanager
+    async def open(self, bucket_name, object_name, etag=None):
+        """
+        Fournit le chemin local d'un objet, protégé de l'éviction pendant son utilisation.
+
+        `etag` évite la lecture des métadonnées de l'objet lorsqu'il est déjà connu.
+        """
+        digest = await self._get(bucket_name, object_name, etag)
+        self.pins[digest] = self.pins.get(digest, 0) + 1
+        # Un objet plus récent peut avoir été ajouté entre-temps : appliquer le budget
+        self._evict()
+        try:
+            yield self._path(digest)
+        finally:
+            self.pins[digest] -= 1
+            if not self.pins[digest]:
+                del self.pins[digest]
+            self._evict()
+
+    def stats(self):
+        """Retourne les métriques d'utilisation du cache."""
+        return dict(
+            self.metrics,
+            entries=len(self.entries),
+            bytes=self.total_bytes,
+            max_bytes=self.max_bytes,
+            pinned=len(self.pins),
+        )
+
+# Cache partagé par le processus, créé à la première utilisation
+artifact_cache = None
+
+def get_artifact_cache():
+    """Retourne le cache disque des artefacts."""
+    global artifact_cache
+    if artifact_cache is None:
+        artifact_cache = ArtifactDiskCache()
+    return artifact_cache
+
+def get_artifact_cache_metrics():
+    """Retourne les métriques du cache disque des artefacts (vides s'il n'a pas encore servi)."""
+    if artifact_cache is None:
+        return None
+    return artifact_cache.stats()
@@ -0,0 +1,121 @@
+from bson import ObjectId
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from pymongo import ReturnDocument
+import hashlib
+import logging
+import os
+
+from app.services.minio_async import stream_upload, iter_chunks, remove_object, invalidate_presigned_url
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+ARTIFACT_HASH_CHUNK_SIZE = int(os.getenv("ARTIFACT_HASH_CHUNK_SIZE", str(1024 * 1024)))
+
+# Index des artefacts : un document par contenu (_id = SHA-256) portant le nom de
+# l'objet MinIO et le nombre de modèles qui le référencent
+ARTIFACTS_COLLECTION = "artifacts"
+ARTIFACTS_BUCKET = "models"
+ARTIFACT_PREFIX = "sha256/"
+
+def is_artifact(object_name):
+    """Indique si un chemin de fichier désigne un artefact adressé par son contenu."""
+    return bool(object_name) and object_name.startswith(ARTIFACT_PREFIX)
+
+def _hash_file(file, chunk_size):
+    sha256 = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        sha256.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return sha256.hexdigest(), size
+
+async def hash_upload(upload_file):
+    """
+    Calcule le SHA-256 et la taille d'un fichier téléversé.
+
+    FastAPI a déjà reçu le fichier (en mémoire ou sur disque) : il est relu dans
+    un thread, hors de la boucle d'événements, puis rembobiné.
+    """
+    return await run_in_threadpool(_hash_file, upload_file.file, ARTIFACT_HASH_CHUNK_SIZE)
+
+async def store_artifact(db, upload_file, content_type="application/octet-stream"):
+    """
+    Enregistre le fichier d'un modèle sous son SHA-256 et ajoute une référence.
+
+    Si le contenu est déjà connu, aucun transfert n'a lieu : seul le compteur de
+    références est incrémenté. Sinon l'objet est envoyé vers un nom propre à cet
+    envoi puis publié dans l'index ; si un envoi concurrent du même contenu a été
+    publié entre-temps, l'objet en double est supprimé.
+    Retourne le nom de l'objet, la taille, le SHA-256 et l'indicateur de déduplication.
+    """
+    sha256, size = await hash_upload(upload_file)
+    artifacts = db[ARTIFACTS_COLLECTION]
+    now = datetime.now()
+
+    existing = await artifacts.find_one_and_update(
+        {"_id": sha256},
+        {"$inc": {"refcount": 1}, "$set": {"updated_at": now}},
+        projection={"object_name": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if existing is not None:
+        return {"object_name": existing["object_name"], "size": size, "sha256": sha256, "deduplicated": True}
+
+    # Nom unique par envoi : un objet supprimé par le ramasse-miettes n'est
+    # jamais celui d'un envoi plus récent du même contenu
+    object_name = f"{ARTIFACT_PREFIX}{sha256[:2]}/{sha256}/{ObjectId()}"
+    await stream_upload(ARTIFACTS_BUCKET, object_name, iter_chunks(upload_file), content_type=content_type)
+
+    published = await artifacts.find_one_and_update(
+        {"_id": sha256},
+        {
+            "$inc": {"refcount": 1},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"object_name": object_name, "size": size, "created_at": now},
+        },
+        projection={"object_name": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    if published["object_name"] != object_name:
+        await _remove_blob(object_name)
+        return {"object_name": published["object_name"], "size": size, "sha256": sha256, "deduplicated": True}
+    return {"object_name": object_name, "size": size, "sha256": sha256, "deduplicated": False}
+
+async def _remove_blob(object_name):
+    try:
+        await remove_object(ARTIFACTS_BUCKET, object_name)
+        invalidate_presigned_url(ARTIFACTS_BUCKET, object_name)
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression de l'artefact {object_name}: {e}")
+
+async def release_artifact(db, sha256):
+    """
+    Retire une référence à un artefact et supprime l'objet s'il n'est plus référencé.
+
+    La suppression de l'entrée d'index est conditionnée à un compteur nul : une
+    référence ajoutée entre-temps la préserve.
+    """
+    artifacts = db[ARTIFACTS_COLLECTION]
+    artifact = await artifacts.find_one_and_update(
+        {"_id": sha256},
+        {"$inc": {"refcount": -1}, "$set": {"updated_at": datetime.now()}},
+        projection={"refcount": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if artifact is None or artifact["refcount"] > 0:
+        return False
+
+    orphan = await artifacts.find_one_and_delete({"_id": sha256, "refcount": {"$lte": 0}})
+    if orphan is None:
+        return False
+    await _remove_blob(orphan["object_name"])
+    logger.info(f"Artefact {sha256} supprimé (plus aucune référence)")
+    return True
@@ -0,0 +1,453 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from bson import ObjectId
+from datetime import datetime, timedelta
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import socket
+import time
+
+from app.models.schemas import ExecutionEngine, ExecutionStatus
+from app.services import minio_client
+from app.services.artifact_cache import get_artifact_cache
+from app.services.event_bus import publish_execution_status
+from app.services.execution_logs import append_logs
+from app.services.minio_async import MINIO_TRANSFER_TIMEOUT, stream_upload, invalidate_presigned_url
+from app.services.model_server import load_model_file, select_features
+from app.services.result_preview import CsvIndexBuilder, block_line_offsets, save_csv_index
+from app.services.stats import record_transition, record_transitions
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+BATCH_SCORING_WORKERS = int(os.getenv("BATCH_SCORING_WORKERS", str(os.cpu_count() or 1)))
+# Taille des blocs d'entrée CSV envoyés aux processus (coupés en fin de ligne)
+BATCH_SCORING_CHUNK_BYTES = int(os.getenv("BATCH_SCORING_CHUNK_BYTES", str(8 * 1024 * 1024)))
+# Blocs en cours de calcul par exécution : borne la mémoire à ~ blocs x taille de bloc
+BATCH_SCORING_MAX_PENDING = int(os.getenv("BATCH_SCORING_MAX_PENDING", str(2 * BATCH_SCORING_WORKERS)))
+BATCH_SCORING_READ_SIZE = 1024 * 1024
+# Exécutions locales simultanées par processus de l'API ; les suivantes attendent
+# une place : la mémoire totale reste bornée à ~ exécutions x blocs x taille de bloc
+BATCH_SCORING_MAX_JOBS = int(os.getenv("BATCH_SCORING_MAX_JOBS", "4"))
+# Battement des exécutions locales en cours, et délai au-delà duquel une
+# exécution sans battement est considérée comme abandonnée
+BATCH_SCORING_HEARTBEAT_INTERVAL = float(os.getenv("BATCH_SCORING_HEARTBEAT_INTERVAL", "15"))
+BATCH_SCORING_STALE_AFTER = float(os.getenv("BATCH_SCORING_STALE_AFTER", "120"))
+
+DATASETS_BUCKET = "datasets"
+RESULTS_BUCKET = "results"
+
+# Pool de processus du scoring : le découpage et la prédiction des blocs se
+# répartissent sur tous les cœurs
+executor = None
+# Pool de threads des lectures des jeux de données, un thread par exécution
+# active : les envois en flux, qui occupent le pool des transferts MinIO
+# pendant toute leur durée, ne peuvent pas priver une exécution de sa lecture
+reader_executor = None
+# Places des exécutions actives
+job_slots = None
+
+# Processus propriétaire, enregistré sur les exécutions locales qu'il exécute
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Exécutions locales en cours dans ce processus
+jobs = {}
+# Tâche de battement des exécutions de ce processus
+heartbeat_task = None
+
+metrics = {
+    "started": 0,
+    "succeeded": 0,
+    "failed": 0,
+    "cancelled": 0,
+    "abandoned": 0,
+    "waiting": 0,
+    "chunks": 0,
+    "rows": 0,
+    "seconds": 0.0,
+}
+
+# Modèles chargés dans chaque processus du pool, par chemin local
+worker_models = {}
+
+class ScoringInputError(ValueError):
+    """Levée lorsque les paramètres d'une exécution locale sont invalides."""
+
+def get_executor():
+    """Retourne le pool de processus du scoring, créé à la première utilisation."""
+    global executor
+    if executor is None:
+        # forkserver : un fork du processus de l'API, qui a déjà des threads
+        # (MinIO, prédiction, pymongo), pourrait hériter d'un verrou déjà pris
+        executor = ProcessPoolExecutor(
+            max_workers=BATCH_SCORING_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return executor
+
+def get_reader_executor():
+    """Retourne le pool de threads des lectures des jeux de données, créé à la première utilisation."""
+    global reader_executor
+    if reader_executor is None:
+        reader_executor = ThreadPoolExecutor(max_workers=BATCH_SCORING_MAX_JOBS, thread_name_prefix="scoring-reader")
+    return reader_executor
+
+def get_job_slots():
+    """Retourne le sémaphore des exécutions actives, créé à la première utilisation."""
+    global job_slots
+    if job_slots is None:
+        job_slots = asyncio.Semaphore(BATCH_SCORING_MAX_JOBS)
+    return job_slots
+
+def _worker_model(model_path, framework, file_name):
+    model = worker_models.get(model_path)
+    if model is None:
+        worker_models.clear()
+        model = load_model_file(model_path, framework, file_name)
+        worker_models[model_path] = model
+    return model
+
+def _score_chunk(model_path, framework, file_name, probabilities, header, source, first):
+    """
+    Exécuté dans un processus du pool : prédit un bloc et retourne le CSV de
+    sortie, son nombre de lignes et les positions des lignes indexées.
+
+    `source` est soit un bloc CSV (octets sans en-tête), soit (fichier Parquet, groupe de lignes).
+    """
+    import pandas
+
+    model = _worker_model(model_path, framework, file_name)
+    if isinstance(source, bytes):
+        frame = pandas.read_csv(io.BytesIO(header + source))
+    else:
+        import pyarrow.parquet
+        path, row_group = source
+        frame = pyarrow.parquet.ParquetFile(path).read_row_group(row_group).to_pandas()
+
+    features = select_features(model, frame)
+    if type(model).__name__ == "Booster":
+        import xgboost
+        features = xgboost.DMatrix(features)
+
+    output = frame.copy()
+    if probabilities and hasattr(model, "predict_proba"):
+        scores = model.predict_proba(features)
+        for index, label in enumerate(getattr(model, "classes_", range(scores.shape[1]))):
+            output[f"probability_{label}"] = scores[:, index]
+    else:
+        output["prediction"] = model.predict(features)
+    data = output.to_csv(index=False, header=first).encode()
+    return data, len(frame), block_line_offsets(data, len(frame), skip_header=first)
+
+def _csv_chunks(object_name, chunk_bytes):
+    """Lit un CSV en flux depuis MinIO et le découpe en blocs de lignes complètes."""
+    response = minio_client.get_minio_client().get_object(DATASETS_BUCKET, object_name)
+    try:
+        header = None
+        buffer = bytearray()
+        for data in response.stream(BATCH_SCORING_READ_SIZE):
+            buffer += data
+            if header is None:
+                end = buffer.find(b"\n")
+                if end < 0:
+                    continue
+                header = bytes(buffer[:end + 1])
+                del buffer[:end + 1]
+            while len(buffer) >= chunk_bytes:
+                end = buffer.find(b"\n", chunk_bytes - 1)
+                if end < 0:
+                    break
+                yield header, bytes(buffer[:end + 1])
+                del buffer[:end + 1]
+        if header is None:
+            return
+        if buffer.strip():
+            yield header, bytes(buffer)
+    finally:
+        response.close()
+        response.release_conn()
+
+def read_dataset_chunk(chunks):
+    """Bloc suivant du jeu de données (appel bloquant exécuté dans le pool des lectures)."""
+    return next(chunks, None)
+
+def _parquet_row_groups(path):
+    import pyarrow.parquet
+    return pyarrow.parquet.ParquetFile(path).num_row_groups
+
+async def _csv_sources(input_path):
+    loop = asyncio.get_running_loop()
+    chunks = _csv_chunks(input_path, BATCH_SCORING_CHUNK_BYTES)
+    try:
+        while True:
+            chunk = await asyncio.wait_for(
+                loop.run_in_executor(get_reader_executor(), read_dataset_chunk, chunks),
+                timeout=MINIO_TRANSFER_TIMEOUT,
+            )
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        try:
+            chunks.close()
+        except ValueError:
+            # Lecture encore en cours dans le pool après une annulation : la
+            # connexion sera libérée par le ramasse-miettes
+            pass
+
+async def _parquet_sources(path):
+    row_groups = await asyncio.get_running_loop().run_in_executor(None, _parquet_row_groups, path)
+    for row_group in range(row_groups):
+        yield b"", (path, row_group)
+
+async def _scored_chunks(sources, model_path, model, probabilities, progress):
+    """
+    Soumet les blocs au pool de processus et restitue les sorties dans l'ordre.
+
+    Au plus BATCH_SCORING_MAX_PENDING blocs sont en cours : la lecture est
+    suspendue tant que le plus ancien n'est pas terminé et envoyé.
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()
+
+    async def next_output():
+        data, rows, line_offsets = await pending.popleft()
+        progress["chunks"] += 1
+        progress["rows"] += rows
+        progress["index"].add(data, rows, line_offsets)
+        return data
+
+    try:
+        async for header, source in sources:
+            pending.append(loop.run_in_executor(
+                get_executor(), _score_chunk, model_path, model.get("framework"),
+                model.get("file_name") or model["file_path"], probabilities, header, source, not progress["submitted"],
+            ))
+            progress["submitted"] += 1
+            if len(pending) >= BATCH_SCORING_MAX_PENDING:
+                yield await next_output()
+        while pending:
+            yield await next_output()
+    finally:
+        for future in pending:
+            future.cancel()
+
+async def _finish(db, execution_id, status, message, **fields):
+    execution = await db.executions.find_one_and_update(
+        # Ne pas écraser une exécution annulée entre-temps
+        {"_id": ObjectId(execution_id), "status": ExecutionStatus.RUNNING},
+        {"$set": dict(fields, status=status, end_time=datetime.now())},
+        projection={"status": 1, "created_at": 1},
+    )
+    if execution is not None:
+        await record_transition(db, "executions", execution, ExecutionStatus.RUNNING, status)
+        publish_execution_status(execution_id, status)
+    await append_logs(db, execution_id, message)
+
+async def _run_job(db, execution_id, model, parameters):
+    try:
+        slots = get_job_slots()
+        if slots.locked():
+            metrics["waiting"] += 1
+            logger.info(f"Scoring local de l'exécution {execution_id} en attente d'une place")
+            try:
+                await slots.acquire()
+            finally:
+                metrics["waiting"] -= 1
+        else:
+            await slots.acquire()
+        try:
+            await _score(db, execution_id, model, parameters)
+        finally:
+            slots.release()
+    finally:
+        jobs.pop(execution_id, None)
+
+async def _score(db, execution_id, model, parameters):
+    input_path = parameters["input_path"]
+    probabilities = bool(parameters.get("probabilities", False))
+    result_path = f"{execution_id}/predictions.csv"
+    progress = {"submitted": 0, "chunks": 0, "rows": 0, "index": CsvIndexBuilder()}
+    start = time.perf_counter()
+    metrics["started"] += 1
+    try:
+        cache = get_artifact_cache()
+        async with cache.open("models", model["file_path"]) as model_path:
+            if input_path.lower().endswith(".parquet"):
+                async with cache.open(DATASETS_BUCKET, input_path) as dataset_path:
+                    sources = _parquet_sources(dataset_path)
+                    chunks = _scored_chunks(sources, model_path, model, probabilities, progress)
+                    result = await stream_upload(RESULTS_BUCKET, result_path, chunks, content_type="text/csv")
+            else:
+                sources = _csv_sources(input_path)
+                chunks = _scored_chunks(sources, model_path, model, probabilities, progress)
+                result = await stream_upload(RESULTS_BUCKET, result_path, chunks, content_type="text/csv")
+        invalidate_presigned_url(RESULTS_BUCKET, result_path)
+        try:
+            # Index des positions de lignes pour les aperçus par requêtes de plage
+            await save_csv_index(db, execution_id, result_path, result["etag"], progress["index"])
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement de l'index des résultats de {execution_id}: {e}")
+
+        elapsed = time.perf_counter() - start
+        metrics["succeeded"] += 1
+        await _finish(
+            db, execution_id, ExecutionStatus.SUCCESS,
+            f"Scoring local terminé: {progress['rows']} ligne(s) en {progress['chunks']} bloc(s), "
+            f"{result['size']} octets écrits en {elapsed:.1f} s",
+            result_path=result_path, result_rows=progress["rows"],
+        )
+    except asyncio.CancelledError:
+        metrics["cancelled"] += 1
+        raise
+    except Exception as e:
+        metrics["failed"] += 1
+        logger.error(f"Erreur lors du scoring local de l'exécution {execution_id}: {e}")
+        await _finish(db, execution_id, ExecutionStatus.FAILED, f"Erreur lors du scoring local: {e}")
+    finally:
+        metrics["chunks"] += progress["chunks"]
+        metrics["rows"] += progress["rows"]
+        metrics["seconds"] += time.perf_counter() - start
+
+def validate_parameters(parameters):
+    """Vérifie les paramètres d'une exécution locale avant son enregistrement."""
+    input_path = parameters.get("input_path")
+    if not input_path or not isinstance(input_path, str):
+        raise ScoringInputError("Le paramètre input_path (objet du bucket datasets) est requis")
+
+def runner_fields():
+    """Champs de propriété à enregistrer sur une exécution locale démarrée par ce processus."""
+    return {"runner_id": RUNNER_ID, "heartbeat_at": datetime.now()}
+
+async def _beat(db):
+    """
+    Renouvelle le battement des exécutions de ce processus.
+
+    Une exécution qui n'est plus en cours (annulée depuis un autre processus)
+    est interrompue ici.
+    """
+    ids = [ObjectId(execution_id) for execution_id in jobs]
+    if not ids:
+        return
+    result = await db.executions.update_many(
+        {"_id": {"$in": ids}, "status": ExecutionStatus.RUNNING},
+        {"$set": {"heartbeat_at": datetime.now()}},
+    )
+    if result.matched_count == len(ids):
+        return
+    running = {
+        str(doc["_id"])
+        async for doc in db.executions.find({"_id": {"$in": ids}, "status": ExecutionStatus.RUNNING}, {"_id": 1})
+    }
+    for execution_id in [str(id) for id in ids if str(id) not in running]:
+        if await cancel_scoring_job(execution_id):
+            logger.info(f"Scoring local de l'exécution {execution_id} interrompu: exécution terminée ailleurs")
+
+async def _run_heartbeat(db):
+    while True:
+        await asyncio.sleep(BATCH_SCORING_HEARTBEAT_INTERVAL)
+        try:
+            await _beat(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors du battement des exécutions locales: {e}")
+
+def start_scoring_job(db, execution_id, model, parameters):
+    """
+    Démarre en arrière-plan le scoring local d'une exécution déjà enregistrée
+    comme en cours, avec les champs de `runner_fields()`.
+    """
+    global heartbeat_task
+    execution_id = str(execution_id)
+    jobs[execution_id] = asyncio.create_task(_run_job(db, execution_id, model, parameters))
+    if heartbeat_task is None or heartbeat_task.done():
+        heartbeat_task = asyncio.create_task(_run_heartbeat(db))
+    return jobs[execution_id]
+
+async def cancel_scoring_job(execution_id):
+    """
+    Interrompt le scoring local d'une exécution s'il a lieu dans ce processus.
+
+    Seul le processus propriétaire peut interrompre la tâche : une annulation
+    reçue par un autre processus de l'API ne fait que changer le statut, et le
+    propriétaire interrompt le scoring à son battement suivant.
+    """
+    task = jobs.pop(str(execution_id), None)
+    if task is None:
+        return False
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return True
+
+async def fail_stale_jobs(db):
+    """
+    Marque en échec les exécutions locales en cours dont le processus
+    propriétaire ne bat plus (arrêt brutal, redémarrage).
+    """
+    cutoff = datetime.now() - timedelta(seconds=BATCH_SCORING_STALE_AFTER)
+    stale = {
+        "engine": ExecutionEngine.LOCAL,
+        "status": ExecutionStatus.RUNNING,
+        "$or": [{"heartbeat_at": {"$lt": cutoff}}, {"heartbeat_at": {"$exists": False}}],
+    }
+    candidates = await db.executions.find(stale, {"_id": 1}).to_list(length=None)
+
+    transitions = []
+    for candidate in candidates:
+        if str(candidate["_id"]) in jobs:
+            continue
+        # Le filtre est répété : un battement reçu entre-temps conserve l'exécution
+        execution = await db.executions.find_one_and_update(
+            dict(stale, _id=candidate["_id"]),
+            {"$set": {"status": ExecutionStatus.FAILED, "end_time": datetime.now()}},
+            projection={"status": 1, "created_at": 1, "runner_id": 1},
+        )
+        if execution is None:
+            continue
+        transitions.append((execution, ExecutionStatus.RUNNING, ExecutionStatus.FAILED))
+        execution_id = str(execution["_id"])
+        publish_execution_status(execution_id, ExecutionStatus.FAILED)
+        await append_logs(
+            db, execution_id,
+            f"Scoring local abandonné: le processus {execution.get('runner_id', 'inconnu')} ne répond plus",
+        )
+
+    if transitions:
+        metrics["abandoned"] += len(transitions)
+        await record_transitions(db, "executions", transitions)
+    return len(transitions)
+
+async def stop_scoring_jobs(db):
+    """Interrompt les scorings en cours et les marque en échec, puis arrête le pool."""
+    global executor, reader_executor, heartbeat_task
+    if heartbeat_task is not None:
+        heartbeat_task.cancel()
+        try:
+            await heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        heartbeat_task = None
+    for execution_id in list(jobs):
+        await cancel_scoring_job(execution_id)
+        try:
+            await _finish(db, execution_id, ExecutionStatus.FAILED, "Scoring local interrompu par l'arrêt du service")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'arrêt du scoring de l'exécution {execution_id}: {e}")
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+    if reader_executor is not None:
+        reader_executor.shutdown(wait=False, cancel_futures=True)
+        reader_executor = None
+
+def get_batch_scoring_metrics():
+    """Retourne les métriques du scoring local."""
+    return dict(
+        metrics, running=len(jobs) - metrics["waiting"], workers=BATCH_SCORING_WORKERS, max_jobs=BATCH_SCORING_MAX_JOBS,
+    )
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+import threading
+import time
+
+class TTLCache:
+    """
+    Cache mémoire LRU dont les entrées expirent après une durée de vie.
+
+    Chaque entrée peut avoir sa propre date d'expiration ; au-delà de
+    `max_size` entrées, la moins récemment utilisée est évincée.
+    """
+
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Retourne la valeur associée à `key` si elle n'a pas expiré."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Ajoute ou remplace une entrée, avec une durée de vie optionnelle."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Supprime une entrée et retourne sa valeur."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        """Vide le cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Retourne les statistiques d'utilisation du cache."""
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
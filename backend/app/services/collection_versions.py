@@ -0,0 +1,49 @@
+from pymongo import ReturnDocument
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+COLLECTION_VERSION_CHECK = float(os.getenv("COLLECTION_VERSION_CHECK", "1"))
+
+# Un document par collection porte un numéro de version partagé entre les
+# workers : il est incrémenté à chaque écriture et sert à invalider les caches
+# locaux et à calculer les ETags des listes.
+VERSIONS_COLLECTION = "cache_versions"
+
+# Dernière version connue et date de la dernière lecture, par collection
+known_versions = {}
+checked_at = {}
+
+async def get_version(db, name, max_age=COLLECTION_VERSION_CHECK):
+    """
+    Retourne la version courante d'une collection.
+
+    La version partagée est relue au plus une fois toutes les `max_age`
+    secondes ; entre deux lectures, la dernière valeur connue est retournée.
+    """
+    now = time.monotonic()
+    if name in known_versions and now - checked_at.get(name, 0.0) < max_age:
+        return known_versions[name]
+    # Marquer la lecture avant l'appel pour éviter les lectures concurrentes
+    checked_at[name] = now
+
+    document = await db[VERSIONS_COLLECTION].find_one({"_id": name})
+    version = document["version"] if document else 0
+    # Une incrémentation locale plus récente que la lecture a priorité
+    known_versions[name] = max(version, known_versions.get(name, 0))
+    return known_versions[name]
+
+async def bump_version(db, name):
+    """Incrémente la version partagée d'une collection et retourne la nouvelle valeur."""
+    document = await db[VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    known_versions[name] = max(document["version"], known_versions.get(name, 0))
+    checked_at[name] = time.monotonic()
+    return document["version"]
@@ -1,5 +1,8 @@
-from pymongo import MongoClient
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import CollectionInvalid
+from app.services.indexes import ensure_required_indexes, start_index_build
+from app.services.metrics import MongoCommandListener
+import asyncio
 import logging
 import os
 
@@ -7,59 +10,60 @@ logger = logging.getLogger(__name__)
 
 # Variables d'environnement
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://mongodb:27017/ml-platform")
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
 
-# Clients MongoDB
-mongo_client = None
+# Collections nécessaires à l'application
+COLLECTIONS = ["models", "deployments", "executions", "execution_logs", "users", "artifacts", "result_indexes"]
+
+# Client MongoDB
 motor_client = None
 db = None
 
 async def init_db():
-    """Initialise la connexion à la base de données MongoDB."""
-    global mongo_client, motor_client, db
+    """
+    Initialise la connexion à la base de données MongoDB.
+
+    Le client est asynchrone uniquement : aucune opération bloquante n'est faite
+    dans la boucle d'événements. La disponibilité de MongoDB est ensuite suivie
+    par la sonde /health/ready.
+    """
+    global motor_client, db
     
     try:
-        # Initialiser le client synchrone
-        mongo_client = MongoClient(MONGODB_URI)
-        # Vérifier la connexion
-        mongo_client.admin.command('ping')
-        logger.info("Connexion MongoDB (synchrone) établie avec succès")
-        
-        # Initialiser le client asynchrone
-        motor_client = AsyncIOMotorClient(MONGODB_URI)
+        # Chaque commande est mesurée par collection pour /metrics
+        motor_client = AsyncIOMotorClient(
+            MONGODB_URI,
+            event_listeners=[MongoCommandListener()],
+            serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        )
         db = motor_client.get_database()
-        logger.info("Connexion MongoDB (asynchrone) établie avec succès")
         
-        # Créer les collections si elles n'existent pas
+        # Créer les collections si elles n'existent pas (premier échange avec le serveur)
         await create_collections()
+        logger.info("Connexion MongoDB établie avec succès")
+        
+        # Les index dont dépendent des contraintes (unicité des noms d'utilisateur)
+        # sont créés avant de servir des requêtes, les autres en arrière-plan
+        await ensure_required_indexes(db)
+        start_index_build(db)
         
         return True
     except Exception as e:
         logger.error(f"Erreur lors de la connexion à MongoDB: {e}")
         raise
 
+async def _create_collection(name):
+    try:
+        await db.create_collection(name)
+        logger.info(f"Collection '{name}' créée")
+    except CollectionInvalid:
+        # Créée entre-temps par un autre worker
+        pass
+
 async def create_collections():
-    """Crée les collections nécessaires si elles n'existent pas."""
-    collections = await db.list_collection_names()
-    
-    # Collection pour les modèles
-    if "models" not in collections:
-        await db.create_collection("models")
-        logger.info("Collection 'models' créée")
-    
-    # Collection pour les déploiements
-    if "deployments" not in collections:
-        await db.create_collection("deployments")
-        logger.info("Collection 'deployments' créée")
-    
-    # Collection pour les exécutions
-    if "executions" not in collections:
-        await db.create_collection("executions")
-        logger.info("Collection 'executions' créée")
-    
-    # Collection pour les utilisateurs
-    if "users" not in collections:
-        await db.create_collection("users")
-        logger.info("Collection 'users' créée")
+    """Crée en parallèle les collections nécessaires qui n'existent pas."""
+    existing = set(await db.list_collection_names())
+    await asyncio.gather(*[_create_collection(name) for name in COLLECTIONS if name not in existing])
 
 def get_db():
     """Retourne l'instance de la base de données."""
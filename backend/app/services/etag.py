@@ -0,0 +1,52 @@
+from fastapi import Response
+import hashlib
+
+from app.services.collection_versions import get_version, bump_version
+
+# Les réponses restent en cache côté client mais doivent être revalidées
+CACHE_CONTROL = "private, no-cache"
+
+def document_etag(document_id, updated_at):
+    """ETag faible d'un document, dérivé de sa date de dernière modification."""
+    stamp = int(updated_at.timestamp() * 1000) if updated_at is not None else 0
+    return f'W/"{document_id}-{stamp}"'
+
+def list_etag(name, version, request, *extra):
+    """
+    ETag faible d'une liste, dérivé de la version de la collection et des
+    paramètres de la requête (filtres, pagination, éléments propres à l'appelant).
+    """
+    key = "&".join([str(request.query_params)] + [str(part) for part in extra])
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'W/"{name}-{version}-{digest}"'
+
+async def collection_etag(db, name, request, *extra):
+    """Calcule l'ETag d'une liste à partir de la version partagée de la collection."""
+    version = await get_version(db, name)
+    return list_etag(name, version, request, *extra)
+
+async def touch_collection(db, name):
+    """Signale une écriture sur une collection : les ETags de ses listes changent."""
+    return await bump_version(db, name)
+
+def _opaque(etag):
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+def is_not_modified(request, etag):
+    """Indique si l'en-tête If-None-Match correspond à l'ETag (comparaison faible)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(candidate) for candidate in header.split(",")}
+
+def not_modified_response(etag):
+    """Réponse 304 sans corps, le client réutilise sa copie."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def set_etag(response, etag):
+    """Ajoute l'ETag et la politique de revalidation à une réponse."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
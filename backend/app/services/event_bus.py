@@ -0,0 +1,190 @@
+from bson import ObjectId
+from datetime import datetime
+from pymongo.errors import OperationFailure
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_CHANGE_STREAMS = os.getenv("EVENT_CHANGE_STREAMS", "false").lower() in ("1", "true", "yes")
+
+# Types d'objets suivis et collection MongoDB correspondante
+TOPICS = {
+    "execution": "executions",
+    "deployment": "deployments",
+}
+
+# Abonnements par sujet (type, identifiant)
+subscribers = {}
+
+# Lorsque les change streams MongoDB alimentent le bus, les publications locales
+# des routes sont ignorées : chaque transition n'est publiée qu'une fois, quel
+# que soit le worker qui l'a écrite.
+change_streams_active = False
+watch_tasks = []
+
+metrics = {
+    "published": 0,
+    "delivered": 0,
+    "dropped": 0,
+}
+
+def _status_value(status):
+    return getattr(status, "value", status)
+
+class Subscription:
+    """
+    File d'événements d'une connexion cliente, abonnée à plusieurs sujets.
+
+    Les transitions répétées (même statut pour un même sujet) ne sont livrées
+    qu'une fois ; si le client ne consomme pas assez vite, les événements les
+    plus anciens sont abandonnés.
+    """
+
+    def __init__(self, max_size=EVENT_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.topics = set()
+        self.last_status = {}
+
+    def subscribe(self, kind, object_id):
+        topic = (kind, str(object_id))
+        self.topics.add(topic)
+        subscribers.setdefault(topic, set()).add(self)
+
+    def unsubscribe(self, kind, object_id):
+        topic = (kind, str(object_id))
+        self.topics.discard(topic)
+        self.last_status.pop(topic, None)
+        topic_subscribers = subscribers.get(topic)
+        if topic_subscribers is not None:
+            topic_subscribers.discard(self)
+            if not topic_subscribers:
+                del subscribers[topic]
+
+    def close(self):
+        for kind, object_id in list(self.topics):
+            self.unsubscribe(kind, object_id)
+
+    def deliver(self, event):
+        topic = (event["type"], event["id"])
+        if topic not in self.topics or self.last_status.get(topic) == event["status"]:
+            return
+        self.last_status[topic] = event["status"]
+        if self.queue.full():
+            self.queue.get_nowait()
+            metrics["dropped"] += 1
+        self.queue.put_nowait(event)
+        metrics["delivered"] += 1
+
+    async def get(self):
+        return await self.queue.get()
+
+def _make_event(kind, object_id, status, **fields):
+    event = {
+        "type": kind,
+        "id": str(object_id),
+        "status": _status_value(status),
+        "at": datetime.now().isoformat(),
+    }
+    event.update(fields)
+    return event
+
+def _dispatch(event):
+    metrics["published"] += 1
+    for subscription in list(subscribers.get((event["type"], event["id"]), ())):
+        subscription.deliver(event)
+
+def publish_status(kind, object_id, status, **fields):
+    """
+    Publie une transition de statut écrite par une route ou une tâche de fond.
+
+    Doit être appelée depuis la boucle d'événements, après l'écriture en base.
+    """
+    if change_streams_active:
+        return
+    _dispatch(_make_event(kind, object_id, status, **fields))
+
+def publish_execution_status(execution_id, status, **fields):
+    publish_status("execution", execution_id, status, **fields)
+
+def publish_deployment_status(deployment_id, status, **fields):
+    publish_status("deployment", deployment_id, status, **fields)
+
+async def current_status(db, kind, object_id):
+    """Retourne l'événement décrivant le statut actuel d'un objet, ou None s'il n'existe pas."""
+    if kind not in TOPICS or not ObjectId.is_valid(object_id):
+        return None
+    document = await db[TOPICS[kind]].find_one({"_id": ObjectId(object_id)}, {"status": 1})
+    if document is None:
+        return None
+    return _make_event(kind, object_id, document.get("status"), snapshot=True)
+
+# Seules les insertions et les mises à jour du statut sont publiées
+CHANGE_STREAM_PIPELINE = [{"$match": {"$or": [
+    {"operationType": "insert"},
+    {"operationType": "update", "updateDescription.updatedFields.status": {"$exists": True}},
+]}}]
+
+def _change_event(kind, change):
+    if change["operationType"] == "insert":
+        status = change["fullDocument"].get("status")
+    else:
+        status = change["updateDescription"]["updatedFields"]["status"]
+    return _make_event(kind, change["documentKey"]["_id"], status)
+
+async def _consume(kind, stream, first_change):
+    """Publie les changements d'une collection reçus par son change stream."""
+    if first_change is not None:
+        _dispatch(_change_event(kind, first_change))
+    async for change in stream:
+        _dispatch(_change_event(kind, change))
+
+async def _run_change_streams(db):
+    global change_streams_active
+
+    # Ouvrir tous les change streams avant de désactiver la publication locale ;
+    # hors replica set, MongoDB refuse l'ouverture
+    streams = {}
+    try:
+        try:
+            for kind, collection in TOPICS.items():
+                stream = db[collection].watch(CHANGE_STREAM_PIPELINE)
+                streams[kind] = (stream, await stream.try_next())
+        except OperationFailure as e:
+            logger.warning(f"Change streams MongoDB indisponibles, publication locale conservée: {e}")
+            return
+
+        change_streams_active = True
+        logger.info("Bus d'événements alimenté par les change streams MongoDB")
+        await asyncio.gather(*[_consume(kind, stream, first) for kind, (stream, first) in streams.items()])
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur du change stream MongoDB, retour à la publication locale: {e}")
+    finally:
+        change_streams_active = False
+        for stream, _ in streams.values():
+            await stream.close()
+
+def start_change_streams(db):
+    """Démarre l'alimentation du bus par les change streams si elle est activée."""
+    if EVENT_CHANGE_STREAMS and not watch_tasks:
+        watch_tasks.append(asyncio.create_task(_run_change_streams(db)))
+
+async def stop_change_streams():
+    """Arrête les change streams."""
+    while watch_tasks:
+        task = watch_tasks.pop()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+def get_event_bus_metrics():
+    """Retourne les métriques du bus d'événements."""
+    return dict(
+        metrics,
+        topics=len(subscribers),
+        change_streams=change_streams_active,
+    )
@@ -0,0 +1,148 @@
+from pymongo import ReturnDocument
+from bson import ObjectId
+from datetime import datetime
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+LOG_CHUNK_LINES = int(os.getenv("LOG_CHUNK_LINES", "1000"))
+LOG_MAX_READ_LINES = int(os.getenv("LOG_MAX_READ_LINES", "10000"))
+
+# Collection des blocs de logs : un document par tranche de LOG_CHUNK_LINES lignes.
+# Chaque ligne est stockée avec son numéro (n) et son offset en octets (o) dans le
+# flux de logs de l'exécution, pour permettre les lectures par lignes ou par octets.
+LOGS_COLLECTION = "execution_logs"
+
+def _line_size(line):
+    """Taille en octets d'une ligne dans le flux de logs (saut de ligne inclus)."""
+    return len(line.encode("utf-8")) + 1
+
+async def append_logs(db, execution_id, lines):
+    """
+    Ajoute des lignes au journal d'une exécution.
+
+    La plage de lignes et d'octets est réservée atomiquement sur le document de
+    l'exécution, puis les lignes sont poussées ($push) dans les blocs concernés.
+    """
+    if isinstance(lines, str):
+        lines = [lines]
+    if not lines:
+        return None
+
+    sizes = [_line_size(line) for line in lines]
+    execution = await db.executions.find_one_and_update(
+        {"_id": ObjectId(execution_id)},
+        {"$inc": {"log_lines": len(lines), "log_bytes": sum(sizes)}},
+        projection={"log_lines": 1, "log_bytes": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if execution is None:
+        raise ValueError(f"Exécution {execution_id} introuvable")
+
+    first_line = execution["log_lines"] - len(lines)
+    offset = execution["log_bytes"] - sum(sizes)
+
+    # Répartir les lignes entre les blocs selon leur numéro
+    chunks = {}
+    for i, (line, size) in enumerate(zip(lines, sizes)):
+        number = first_line + i
+        chunks.setdefault(number // LOG_CHUNK_LINES, []).append({"n": number, "o": offset, "t": line})
+        offset += size
+
+    now = datetime.now()
+    for seq, entries in chunks.items():
+        await db[LOGS_COLLECTION].update_one(
+            {"execution_id": str(execution_id), "seq": seq},
+            {
+                # $sort garde l'ordre des lignes même si des ajouts concurrents se croisent
+                "$push": {"lines": {"$each": entries, "$sort": {"n": 1}}},
+                "$min": {"first_byte": entries[0]["o"]},
+                "$max": {"end_byte": entries[-1]["o"] + _line_size(entries[-1]["t"])},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"created_at": now},
+            },
+            upsert=True,
+        )
+
+    return {"first_line": first_line, "line_count": len(lines)}
+
+async def migrate_legacy_logs(db, execution_id):
+    """
+    Déplace les logs encore embarqués dans le document d'exécution vers les blocs.
+
+    Le retrait des logs embarqués est atomique : entre deux migrations
+    concurrentes, seule celle qui les a retirés les ajoute aux blocs.
+    """
+    execution = await db.executions.find_one_and_update(
+        {"_id": ObjectId(execution_id), "logs.0": {"$exists": True}},
+        {"$unset": {"logs": ""}},
+        projection={"logs": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if execution is None:
+        return False
+
+    await append_logs(db, execution_id, execution["logs"])
+    logger.info(f"Logs de l'exécution {execution_id} migrés vers la collection '{LOGS_COLLECTION}'")
+    return True
+
+async def read_lines(db, execution_id, start=0, limit=LOG_MAX_READ_LINES):
+    """Lit une plage de lignes [start, start + limit) du journal d'une exécution."""
+    limit = min(limit, LOG_MAX_READ_LINES)
+    if limit <= 0:
+        return []
+    end = start + limit
+
+    cursor = db[LOGS_COLLECTION].find(
+        {
+            "execution_id": str(execution_id),
+            "seq": {"$gte": start // LOG_CHUNK_LINES, "$lte": (end - 1) // LOG_CHUNK_LINES},
+        },
+        {"lines": 1},
+    ).sort("seq", 1)
+
+    lines = []
+    async for chunk in cursor:
+        lines.extend(entry["t"] for entry in chunk["lines"] if start <= entry["n"] < end)
+    return lines
+
+async def read_tail(db, execution_id, count):
+    """Lit les `count` dernières lignes du journal d'une exécution."""
+    execution = await db.executions.find_one({"_id": ObjectId(execution_id)}, {"log_lines": 1})
+    if execution is None:
+        return None
+    total = execution.get("log_lines", 0)
+    start = max(0, total - count)
+    return {"start": start, "lines": await read_lines(db, execution_id, start, count)}
+
+async def read_bytes(db, execution_id, offset=0, max_bytes=64 * 1024):
+    """
+    Lit le journal à partir d'un offset en octets.
+
+    Seules des lignes complètes sont renvoyées ; `next_offset` permet de
+    reprendre la lecture là où elle s'est arrêtée.
+    """
+    cursor = db[LOGS_COLLECTION].find(
+        {"execution_id": str(execution_id), "end_byte": {"$gt": offset}},
+        {"lines": 1},
+    ).sort("seq", 1)
+
+    parts = []
+    size = 0
+    next_offset = offset
+    async for chunk in cursor:
+        for entry in chunk["lines"]:
+            if entry["o"] + _line_size(entry["t"]) <= offset:
+                continue
+            line_size = _line_size(entry["t"])
+            if parts and size + line_size > max_bytes:
+                return {"offset": offset, "next_offset": next_offset, "data": "".join(parts)}
+            parts.append(entry["t"] + "\n")
+            size += line_size
+            next_offset = entry["o"] + line_size
+        if size >= max_bytes:
+            break
+
+    return {"offset": offset, "next_offset": next_offset, "data": "".join(parts)}
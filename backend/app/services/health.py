@@ -0,0 +1,101 @@
+from datetime import datetime
+import asyncio
+import logging
+import os
+import time
+
+from app.services import airflow_client, database, minio_async, minio_client
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+# Dépendances sans lesquelles l'instance ne doit pas recevoir de trafic ; les
+# autres sont signalées comme dégradées sans rendre l'instance indisponible
+HEALTH_READY_DEPENDENCIES = [
+    name.strip() for name in os.getenv("HEALTH_READY_DEPENDENCIES", "mongodb,minio").split(",") if name.strip()
+]
+
+# Positionné à la fin de l'événement de démarrage
+startup_complete = False
+
+# Dernier résultat de chaque sonde : (instant monotone, résultat)
+probe_results = {}
+# Sondes en cours, partagées entre les requêtes concurrentes
+inflight_probes = {}
+
+async def _probe_mongodb():
+    await database.get_db().command("ping")
+
+async def _probe_minio():
+    client = minio_client.get_minio_client()
+    await minio_async.run_in_pool("models", client.bucket_exists, "models", timeout=HEALTH_PROBE_TIMEOUT)
+
+async def _probe_airflow():
+    await airflow_client.get_health()
+
+PROBES = {
+    "mongodb": _probe_mongodb,
+    "minio": _probe_minio,
+    "airflow": _probe_airflow,
+}
+
+async def _run_probe(name):
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(PROBES[name](), timeout=HEALTH_PROBE_TIMEOUT)
+        result = {"status": "up"}
+    except asyncio.TimeoutError:
+        result = {"status": "down", "error": f"Délai de {HEALTH_PROBE_TIMEOUT}s dépassé"}
+    except Exception as e:
+        result = {"status": "down", "error": str(e)}
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    result["checked_at"] = datetime.now().isoformat()
+    if result["status"] == "down":
+        logger.warning(f"Sonde de santé {name} en échec: {result['error']}")
+    probe_results[name] = (time.monotonic(), result)
+    return result
+
+async def check(name):
+    """
+    Retourne le résultat de la sonde d'une dépendance.
+
+    Le résultat est réutilisé pendant HEALTH_CACHE_TTL secondes et les appels
+    concurrents partagent la même sonde : la fréquence des vérifications du
+    répartiteur de charge ne se répercute pas sur les dépendances.
+    """
+    cached = probe_results.get(name)
+    if cached is not None and time.monotonic() - cached[0] < HEALTH_CACHE_TTL:
+        return cached[1]
+    task = inflight_probes.get(name)
+    if task is None:
+        task = asyncio.ensure_future(_run_probe(name))
+        inflight_probes[name] = task
+        task.add_done_callback(lambda _: inflight_probes.pop(name, None))
+    return await asyncio.shield(task)
+
+async def readiness():
+    """
+    Sonde toutes les dépendances en parallèle.
+
+    Retourne (prête, rapport) : l'instance est prête lorsque le démarrage est
+    terminé et que les dépendances de HEALTH_READY_DEPENDENCIES répondent.
+    """
+    if not startup_complete:
+        # Clients non initialisés : inutile de sonder (ni de mettre en cache un échec)
+        return False, {"status": "starting", "startup_complete": False, "services": {}}
+    names = list(PROBES)
+    results = dict(zip(names, await asyncio.gather(*[check(name) for name in names])))
+    for name, result in results.items():
+        result["required"] = name in HEALTH_READY_DEPENDENCIES
+    ready = all(
+        result["status"] == "up" for result in results.values() if result["required"]
+    )
+    if not ready:
+        status = "unavailable"
+    elif any(result["status"] != "up" for result in results.values()):
+        status = "degraded"
+    else:
+        status = "healthy"
+    return ready, {"status": status, "startup_complete": True, "services": results}
@@ -0,0 +1,201 @@
+from pymongo import ASCENDING, DESCENDING
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Index déclarés par collection : chaque entrée décrit les clés et les options
+# attendues. Les noms sont explicites pour pouvoir détecter les écarts (drift)
+# entre la déclaration et ce qui existe réellement dans MongoDB. Les index
+# "required" garantissent une contrainte dont le code dépend : ils sont créés
+# avant que l'API ne serve des requêtes (ensure_required_indexes).
+INDEXES = {
+    "models": [
+        {
+            "name": "models_department_region_status",
+            "keys": [("department", ASCENDING), ("region", ASCENDING), ("status", ASCENDING)],
+        },
+        # Filtres de la liste suivis du tri de pagination (created_at, _id)
+        {
+            "name": "models_department_region_status_created_at",
+            "keys": [
+                ("department", ASCENDING), ("region", ASCENDING), ("status", ASCENDING),
+                ("created_at", DESCENDING), ("_id", DESCENDING),
+            ],
+        },
+        {
+            "name": "models_status_created_at",
+            "keys": [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "models_created_at_id",
+            "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+    ],
+    "deployments": [
+        {
+            "name": "deployments_model_id_status",
+            "keys": [("model_id", ASCENDING), ("status", ASCENDING)],
+        },
+        # Filtres de la liste suivis du tri de pagination (created_at, _id)
+        {
+            "name": "deployments_model_id_created_at",
+            "keys": [("model_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "deployments_status_created_at",
+            "keys": [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "deployments_created_at_id",
+            "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+    ],
+    "executions": [
+        {
+            "name": "executions_deployment_id_created_at",
+            "keys": [("deployment_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "executions_model_id_created_at",
+            "keys": [("model_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "executions_status_created_at",
+            "keys": [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+        {
+            "name": "executions_created_at_id",
+            "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+    ],
+    "execution_logs": [
+        {
+            "name": "execution_logs_execution_id_seq",
+            "keys": [("execution_id", ASCENDING), ("seq", ASCENDING)],
+            "unique": True,
+        },
+    ],
+    "users": [
+        {
+            "name": "users_username_unique",
+            "keys": [("username", ASCENDING)],
+            "unique": True,
+            # create_user s'appuie sur cet index pour refuser les doublons
+            "required": True,
+        },
+        {
+            "name": "users_created_at_id",
+            "keys": [("created_at", DESCENDING), ("_id", DESCENDING)],
+        },
+    ],
+}
+
+# Tâche de construction des index lancée au démarrage
+index_task = None
+# Dernier rapport d'écarts calculé
+index_report = {}
+
+def _normalize_keys(keys):
+    """Normalise une liste de clés d'index pour la comparaison."""
+    return [(field, int(direction)) for field, direction in keys]
+
+async def check_indexes(db, collection_name):
+    """Compare les index déclarés d'une collection avec ceux existants."""
+    existing = await db[collection_name].index_information()
+    declared = {spec["name"]: spec for spec in INDEXES.get(collection_name, [])}
+
+    report = {"missing": [], "conflicting": [], "unexpected": []}
+
+    # Index déclarés absents ou différents de la déclaration
+    existing_by_keys = {
+        tuple(_normalize_keys(info["key"])): name for name, info in existing.items()
+    }
+    for name, spec in declared.items():
+        keys = _normalize_keys(spec["keys"])
+        info = existing.get(name)
+        if info is None:
+            # Un index équivalent peut exister sous un autre nom
+            other_name = existing_by_keys.get(tuple(keys))
+            if other_name is not None:
+                report["conflicting"].append(
+                    {"name": name, "reason": f"clés déjà indexées par '{other_name}'"}
+                )
+            else:
+                report["missing"].append(name)
+            continue
+        if _normalize_keys(info["key"]) != keys:
+            report["conflicting"].append({"name": name, "reason": "clés différentes"})
+        elif bool(info.get("unique", False)) != bool(spec.get("unique", False)):
+            report["conflicting"].append({"name": name, "reason": "option 'unique' différente"})
+
+    # Index existants non déclarés (hors index par défaut sur _id)
+    for name in existing:
+        if name != "_id_" and name not in declared:
+            report["unexpected"].append(name)
+
+    return report
+
+async def ensure_indexes(db):
+    """Crée en arrière-plan les index déclarés manquants et signale les écarts."""
+    global index_report
+
+    report = {}
+    for collection_name, specs in INDEXES.items():
+        try:
+            collection_report = await check_indexes(db, collection_name)
+            declared = {spec["name"]: spec for spec in specs}
+
+            for name in collection_report["missing"]:
+                spec = declared[name]
+                await db[collection_name].create_index(
+                    spec["keys"],
+                    name=name,
+                    unique=spec.get("unique", False),
+                    background=True,
+                )
+                logger.info(f"Index '{name}' créé sur la collection '{collection_name}'")
+
+            for conflict in collection_report["conflicting"]:
+                logger.warning(
+                    f"Index '{conflict['name']}' de la collection '{collection_name}' "
+                    f"non conforme à la déclaration: {conflict['reason']}"
+                )
+            for name in collection_report["unexpected"]:
+                logger.warning(f"Index non déclaré '{name}' présent sur la collection '{collection_name}'")
+
+            report[collection_name] = collection_report
+        except Exception as e:
+            logger.error(f"Erreur lors de la création des index de la collection '{collection_name}': {e}")
+            report[collection_name] = {"error": str(e)}
+
+    index_report = report
+    return report
+
+async def ensure_required_indexes(db):
+    """
+    Crée les index requis avant le démarrage de l'API.
+
+    Toute erreur (doublons existants, index en conflit) est propagée et fait
+    échouer le démarrage.
+    """
+    for collection_name, specs in INDEXES.items():
+        for spec in specs:
+            if not spec.get("required"):
+                continue
+            await db[collection_name].create_index(
+                spec["keys"], name=spec["name"], unique=spec.get("unique", False)
+            )
+            logger.info(f"Index requis '{spec['name']}' présent sur la collection '{collection_name}'")
+
+def start_index_build(db):
+    """Lance la construction des index sans bloquer le démarrage de l'API."""
+    global index_task
+
+    if index_task is None or index_task.done():
+        index_task = asyncio.create_task(ensure_indexes(db))
+    return index_task
+
+def get_index_report():
+    """Retourne le dernier rapport d'écarts des index."""
+    return index_report
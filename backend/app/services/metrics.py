@@ -0,0 +1,299 @@
+from pymongo import monitoring
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Bornes des histogrammes de latence, en secondes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Libellé des requêtes ne correspondant à aucune route : les chemins bruts
+# feraient exploser le nombre de séries
+UNMATCHED_ROUTE = "unmatched"
+
+class Histogram:
+    """
+    Histogramme cumulatif au format Prometheus, par combinaison de libellés.
+
+    Les observations peuvent venir de threads (listener pymongo, pool MinIO) :
+    les mises à jour sont protégées par un verrou.
+    """
+
+    def __init__(self, name, documentation, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(series):
+            label_text = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Durée des requêtes HTTP par gabarit de route",
+    ["method", "route", "status"],
+)
+mongodb_command_duration = Histogram(
+    "mongodb_command_duration_seconds",
+    "Durée des commandes MongoDB par collection",
+    ["command", "collection", "outcome"],
+)
+airflow_request_duration = Histogram(
+    "airflow_request_duration_seconds",
+    "Durée des appels à l'API REST d'Airflow par endpoint",
+    ["endpoint", "outcome"],
+)
+minio_operation_duration = Histogram(
+    "minio_operation_duration_seconds",
+    "Durée des opérations MinIO, attente du pool de threads comprise",
+    ["operation", "bucket", "outcome"],
+)
+
+HISTOGRAMS = [http_request_duration, mongodb_command_duration, airflow_request_duration, minio_operation_duration]
+
+def _outcome(error):
+    return "error" if error else "success"
+
+def observe_airflow(endpoint, duration, error):
+    """Enregistre la durée d'un appel Airflow (`endpoint` est le gabarit du chemin)."""
+    airflow_request_duration.observe(duration, endpoint, _outcome(error))
+
+def observe_minio(operation, bucket, duration, error):
+    """Enregistre la durée d'une opération MinIO."""
+    minio_operation_duration.observe(duration, operation, bucket, _outcome(error))
+
+# Commandes dont le premier champ ne désigne pas une collection
+NON_COLLECTION_COMMANDS = {"ping", "hello", "ismaster", "isMaster", "listCollections", "buildInfo", "endSessions"}
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Mesure chaque commande envoyée par pymongo/motor, par nom de commande et collection.
+
+    La collection n'est connue qu'à l'événement de démarrage ; elle est conservée
+    jusqu'à l'événement de fin correspondant.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        command_name = event.command_name
+        if command_name == "getMore":
+            collection = event.command.get("collection")
+        elif command_name in NON_COLLECTION_COMMANDS:
+            collection = None
+        else:
+            collection = event.command.get(command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        self._pending[self._key(event)] = collection
+
+    def _finish(self, event, error):
+        collection = self._pending.pop(self._key(event), "-")
+        mongodb_command_duration.observe(
+            event.duration_micros / 1e6, event.command_name, collection, _outcome(error)
+        )
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI mesurant la durée des requêtes HTTP.
+
+    Le libellé de route est le gabarit déclaré (`/api/models/{model_id}`),
+    retrouvé à partir de l'endpoint résolu par le routeur : les identifiants
+    n'apparaissent jamais dans les séries.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+        self._templates = {}
+
+    def _template(self, scope):
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        template = self._templates.get(endpoint)
+        if template is None:
+            # Table reconstruite si des routes ont été ajoutées depuis
+            self._templates = {
+                getattr(route, "endpoint", None): route.path for route in self.routes if hasattr(route, "path")
+            }
+            template = self._templates.get(endpoint, UNMATCHED_ROUTE)
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Les réponses en flux sont mesurées jusqu'au dernier bloc envoyé
+            http_request_duration.observe(
+                time.perf_counter() - start, scope["method"], self._template(scope), status
+            )
+
+def _gauge(lines, name, documentation, samples, metric_type="gauge"):
+    lines.append(f"# HELP {name} {documentation}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {float(value)}" if label_text else f"{name} {float(value)}")
+
+def _service_metrics(lines):
+    """Expose les compteurs déjà tenus par les services (pool de hachage, caches, bus, disjoncteur)."""
+    from app.services.airflow_client import get_airflow_metrics
+    from app.services.artifact_cache import get_artifact_cache_metrics
+    from app.services.batch_scoring import get_batch_scoring_metrics
+    from app.services.event_bus import get_event_bus_metrics
+    from app.services.minio_async import presigned_url_cache
+    from app.services.model_server import get_model_server_metrics
+    from app.services.password_hashing import get_hashing_metrics
+    from app.services.result_preview import get_result_preview_metrics
+    from app.services.user_cache import token_cache, user_cache
+
+    breaker_states = ["closed", "half-open", "open"]
+    state = get_airflow_metrics()["circuit_breaker"]
+    _gauge(lines, "airflow_circuit_breaker_state", "État du disjoncteur Airflow (1 pour l'état courant)",
+           [({"state": name}, name == state) for name in breaker_states])
+
+    hashing = get_hashing_metrics()
+    _gauge(lines, "password_hashing_in_flight", "Hachages bcrypt en cours", [({}, hashing["in_flight"])])
+    _gauge(lines, "password_hashing_waiting", "Hachages bcrypt en attente", [({}, hashing["waiting"])])
+    _gauge(lines, "password_hashing_total", "Hachages bcrypt par résultat", [
+        ({"result": result}, hashing[result]) for result in ("completed", "rejected", "upgraded")
+    ], metric_type="counter")
+
+    caches = {"token": token_cache, "user": user_cache, "presigned_url": presigned_url_cache}
+    cache_stats = {name: cache.stats() for name, cache in caches.items()}
+    _gauge(lines, "cache_entries", "Entrées des caches locaux",
+           [({"cache": name}, stats["size"]) for name, stats in cache_stats.items()])
+    _gauge(lines, "cache_requests_total", "Lectures des caches locaux par résultat", [
+        ({"cache": name, "result": result}, stats[field])
+        for name, stats in cache_stats.items() for result, field in (("hit", "hits"), ("miss", "misses"))
+    ], metric_type="counter")
+
+    artifacts = get_artifact_cache_metrics()
+    if artifacts is not None:
+        _gauge(lines, "artifact_cache_requests_total", "Lectures du cache disque des artefacts par résultat", [
+            ({"result": result}, artifacts[field])
+            for result, field in (("hit", "hits"), ("miss", "misses"), ("coalesced", "coalesced"))
+        ], metric_type="counter")
+        _gauge(lines, "artifact_cache_evictions_total", "Fichiers évincés du cache disque des artefacts",
+               [({}, artifacts["evictions"])], metric_type="counter")
+        _gauge(lines, "artifact_cache_fill_errors_total", "Téléchargements en échec du cache disque des artefacts",
+               [({}, artifacts["fill_errors"])], metric_type="counter")
+        _gauge(lines, "artifact_cache_fill_seconds_total", "Temps passé à remplir le cache disque des artefacts",
+               [({}, artifacts["fill_seconds"])], metric_type="counter")
+        _gauge(lines, "artifact_cache_bytes", "Octets occupés par le cache disque des artefacts",
+               [({}, artifacts["bytes"])])
+        _gauge(lines, "artifact_cache_entries", "Fichiers présents dans le cache disque des artefacts",
+               [({}, artifacts["entries"])])
+
+    predictions = get_model_server_metrics()
+    _gauge(lines, "prediction_requests_total", "Requêtes de prédiction synchrone", [({}, predictions["requests"])],
+           metric_type="counter")
+    _gauge(lines, "prediction_errors_total", "Requêtes de prédiction en échec", [({}, predictions["errors"])],
+           metric_type="counter")
+    _gauge(lines, "prediction_rows_total", "Lignes prédites", [({}, predictions["rows"])], metric_type="counter")
+    _gauge(lines, "prediction_batches_total", "Appels aux modèles (lots regroupés)", [({}, predictions["batches"])],
+           metric_type="counter")
+    _gauge(lines, "prediction_model_loads_total", "Chargements de modèles par résultat du cache", [
+        ({"result": result}, predictions[field])
+        for result, field in (("hit", "model_hits"), ("load", "model_loads"), ("eviction", "model_evictions"))
+    ], metric_type="counter")
+    _gauge(lines, "prediction_loaded_models", "Modèles chargés en mémoire", [({}, predictions["loaded_models"])])
+
+    scoring = get_batch_scoring_metrics()
+    _gauge(lines, "batch_scoring_jobs_total", "Scorings locaux par résultat", [
+        ({"result": result}, scoring[result]) for result in ("started", "succeeded", "failed", "cancelled")
+    ], metric_type="counter")
+    _gauge(lines, "batch_scoring_jobs_running", "Scorings locaux en cours", [({}, scoring["running"])])
+    _gauge(lines, "batch_scoring_rows_total", "Lignes prédites par le scoring local", [({}, scoring["rows"])],
+           metric_type="counter")
+    _gauge(lines, "batch_scoring_chunks_total", "Blocs traités par le scoring local", [({}, scoring["chunks"])],
+           metric_type="counter")
+
+    previews = get_result_preview_metrics()
+    _gauge(lines, "result_preview_requests_total", "Aperçus de résultats par mode de lecture", [
+        ({"mode": mode}, previews[mode]) for mode in ("indexed", "sequential", "parquet")
+    ], metric_type="counter")
+    _gauge(lines, "result_preview_range_requests_total", "Requêtes de plage MinIO des aperçus",
+           [({}, previews["range_requests"])], metric_type="counter")
+    _gauge(lines, "result_preview_bytes_total", "Octets lus dans MinIO par les aperçus",
+           [({}, previews["bytes_read"])], metric_type="counter")
+
+    events = get_event_bus_metrics()
+    _gauge(lines, "event_bus_events_total", "Événements de statut du bus par étape", [
+        ({"stage": stage}, events[stage]) for stage in ("published", "delivered", "dropped")
+    ], metric_type="counter")
+    _gauge(lines, "event_bus_topics", "Sujets ayant au moins un abonné", [({}, events["topics"])])
+
+def render_metrics():
+    """Retourne toutes les métriques du processus au format texte Prometheus."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    service_lines = []
+    try:
+        _service_metrics(service_lines)
+        lines.extend(service_lines)
+    except Exception as e:
+        logger.error(f"Erreur lors de la collecte des métriques des services: {e}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,288 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from app.services import minio_client
+from app.services.cache import TTLCache
+from app.services.metrics import observe_minio
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+MINIO_MAX_WORKERS = int(os.getenv("MINIO_MAX_WORKERS", "16"))
+MINIO_BUCKET_CONCURRENCY = int(os.getenv("MINIO_BUCKET_CONCURRENCY", "8"))
+MINIO_TIMEOUT = float(os.getenv("MINIO_TIMEOUT", "30"))
+MINIO_TRANSFER_TIMEOUT = float(os.getenv("MINIO_TRANSFER_TIMEOUT", "3600"))
+# Threads réservés aux transferts (flux et fichiers), qui occupent un thread pendant toute leur durée
+MINIO_STREAM_WORKERS = int(os.getenv("MINIO_STREAM_WORKERS", "8"))
+
+# Paramètres des envois en flux (mémoire bornée à ~ part + file d'attente de blocs)
+UPLOAD_CHUNK_SIZE = int(os.getenv("MINIO_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_PART_SIZE = int(os.getenv("MINIO_UPLOAD_PART_SIZE", str(10 * 1024 * 1024)))
+UPLOAD_QUEUE_SIZE = int(os.getenv("MINIO_UPLOAD_QUEUE_SIZE", "4"))
+
+# Cache des URL présignées : une URL est réutilisée tant qu'il lui reste au moins
+# PRESIGNED_URL_MIN_REMAINING secondes de validité
+PRESIGNED_URL_CACHE_SIZE = int(os.getenv("PRESIGNED_URL_CACHE_SIZE", "10000"))
+PRESIGNED_URL_MIN_REMAINING = float(os.getenv("PRESIGNED_URL_MIN_REMAINING", "600"))
+presigned_url_cache = TTLCache(max_size=PRESIGNED_URL_CACHE_SIZE)
+
+# Pool de threads dédié aux appels bloquants du SDK MinIO
+executor = None
+# Pool de threads des transferts : ils ne privent pas les requêtes courtes de
+# threads du pool principal
+stream_executor = None
+# Sémaphores limitant le nombre d'opérations simultanées par bucket
+bucket_semaphores = {}
+
+def get_executor():
+    """Retourne le pool de threads MinIO, créé à la première utilisation."""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=MINIO_MAX_WORKERS, thread_name_prefix="minio")
+    return executor
+
+def get_stream_executor():
+    """Retourne le pool de threads des transferts, créé à la première utilisation."""
+    global stream_executor
+    if stream_executor is None:
+        stream_executor = ThreadPoolExecutor(max_workers=MINIO_STREAM_WORKERS, thread_name_prefix="minio-stream")
+    return stream_executor
+
+def get_bucket_semaphore(bucket_name):
+    """Retourne le sémaphore de concurrence associé à un bucket."""
+    semaphore = bucket_semaphores.get(bucket_name)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MINIO_BUCKET_CONCURRENCY)
+        bucket_semaphores[bucket_name] = semaphore
+    return semaphore
+
+def shutdown_minio_pool():
+    """Arrête les pools de threads MinIO."""
+    global executor, stream_executor
+    if executor is not None:
+        executor.shutdown(wait=False)
+        executor = None
+    if stream_executor is not None:
+        stream_executor.shutdown(wait=False)
+        stream_executor = None
+
+def _release_slot(semaphore):
+    """Rappel de fin d'un appel du pool : libère sa place dans le sémaphore du bucket."""
+    def release(future):
+        semaphore.release()
+        # Éviter l'avertissement « exception jamais récupérée » après une expiration
+        if not future.cancelled():
+            future.exception()
+    return release
+
+async def run_in_pool(bucket_name, func, *args, timeout=MINIO_TIMEOUT, **kwargs):
+    """
+    Exécute un appel bloquant du SDK MinIO dans le pool de threads.
+
+    Le nombre d'appels simultanés sur un même bucket est borné et l'attente,
+    file du sémaphore comprise, est limitée à `timeout` secondes. Un appel
+    expiré libère la requête HTTP mais le thread termine son travail en
+    arrière-plan, et occupe sa place dans le sémaphore jusque-là.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    deadline = loop.time() + timeout
+    semaphore = get_bucket_semaphore(bucket_name)
+    error = True
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+        try:
+            future = loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+        future.add_done_callback(_release_slot(semaphore))
+        # shield : l'expiration n'annule pas le suivi de l'appel, qui garde sa
+        # place dans le sémaphore jusqu'à la fin réelle du thread
+        result = await asyncio.wait_for(asyncio.shield(future), timeout=max(0.0, deadline - loop.time()))
+        error = False
+        return result
+    finally:
+        observe_minio(func.__name__, bucket_name, time.perf_counter() - start, error)
+
+async def run_in_stream_pool(bucket_name, func, *args, timeout=MINIO_TRANSFER_TIMEOUT, **kwargs):
+    """
+    Exécute un transfert ou une étape d'un transfert en flux dans le pool dédié.
+
+    Le sémaphore du bucket n'est pas pris : un transfert de longue durée
+    n'occupe pas les places réservées aux appels courts.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    error = True
+    try:
+        future = loop.run_in_executor(get_stream_executor(), partial(func, *args, **kwargs))
+        result = await asyncio.wait_for(future, timeout=timeout)
+        error = False
+        return result
+    finally:
+        observe_minio(func.__name__, bucket_name, time.perf_counter() - start, error)
+
+async def create_buckets():
+    """Crée en parallèle les buckets nécessaires s'ils n'existent pas."""
+    await asyncio.gather(*[
+        run_in_pool(bucket, minio_client.create_bucket, bucket) for bucket in minio_client.BUCKETS
+    ])
+
+async def upload_file(bucket_name, object_name, file_path, timeout=MINIO_TRANSFER_TIMEOUT, **kwargs):
+    """
+    Télécharge un fichier vers MinIO sans bloquer la boucle d'événements.
+    Les options de transfert (`part_size`, `concurrency`, `content_type`) sont transmises à minio_client.
+    """
+    return await run_in_stream_pool(
+        bucket_name, minio_client.upload_file, bucket_name, object_name, file_path, timeout=timeout, **kwargs
+    )
+
+async def download_file(bucket_name, object_name, file_path, timeout=MINIO_TRANSFER_TIMEOUT, **kwargs):
+    """
+    Télécharge un fichier depuis MinIO sans bloquer la boucle d'événements.
+    Les options de transfert (`part_size`, `concurrency`) sont transmises à minio_client.
+    """
+    return await run_in_stream_pool(
+        bucket_name, minio_client.download_file, bucket_name, object_name, file_path, timeout=timeout, **kwargs
+    )
+
+async def remove_object(bucket_name, object_name):
+    """Supprime un objet de MinIO sans bloquer la boucle d'événements."""
+    return await run_in_pool(bucket_name, minio_client.remove_file, bucket_name, object_name)
+
+async def get_presigned_url(bucket_name, object_name, expires=3600):
+    """
+    Génère une URL présignée sans bloquer la boucle d'événements.
+
+    L'URL est mise en cache et réutilisée tant qu'il lui reste suffisamment de
+    durée de validité.
+    """
+    key = (bucket_name, object_name)
+    cached = presigned_url_cache.get(key)
+    if cached is not None and cached[0] == expires:
+        return cached[1]
+
+    url = await run_in_pool(
+        bucket_name, minio_client.get_presigned_url, bucket_name, object_name, expires=expires
+    )
+    reuse_for = expires - PRESIGNED_URL_MIN_REMAINING
+    if reuse_for > 0:
+        presigned_url_cache.set(key, (expires, url), ttl=reuse_for)
+    return url
+
+def invalidate_presigned_url(bucket_name, object_name):
+    """Supprime du cache l'URL présignée d'un objet dont le chemin a changé ou qui a été supprimé."""
+    if object_name:
+        presigned_url_cache.pop((bucket_name, object_name))
+
+class _StreamReader:
+    """
+    Lecteur synchrone alimenté par une file asyncio de blocs.
+
+    Il est consommé par `put_object` dans un thread et calcule au passage la
+    taille et le SHA-256 des données envoyées.
+    """
+
+    def __init__(self, loop, queue):
+        self._loop = loop
+        self._queue = queue
+        self._buffer = b""
+        self._eof = False
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def _next_chunk(self):
+        item = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._next_chunk()
+            if chunk is None:
+                self._eof = True
+                break
+            self.size += len(chunk)
+            self.sha256.update(chunk)
+            self._buffer += chunk
+
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+async def iter_chunks(file, chunk_size=UPLOAD_CHUNK_SIZE):
+    """Itère de manière asynchrone sur les blocs d'un fichier téléversé."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+async def stream_upload(bucket_name, object_name, chunks, content_type="application/octet-stream",
+                        part_size=UPLOAD_PART_SIZE):
+    """
+    Envoie un flux asynchrone de blocs vers MinIO par upload multipart.
+
+    Les blocs transitent par une file bornée vers `put_object` exécuté dans le
+    pool des transferts en flux : la mémoire utilisée ne dépend pas de la taille
+    de l'objet et la boucle d'événements n'est jamais bloquée. L'envoi ne
+    prend pas de place dans le sémaphore du bucket, réservé aux appels courts.
+    Retourne la taille, le SHA-256 et l'ETag de l'objet créé.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_SIZE)
+    reader = _StreamReader(loop, queue)
+    client = minio_client.get_minio_client()
+    start = time.perf_counter()
+
+    upload = loop.run_in_executor(
+        get_stream_executor(),
+        partial(
+            client.put_object, bucket_name, object_name, reader, length=-1,
+            content_type=content_type, part_size=part_size, num_parallel_uploads=1,
+        ),
+    )
+
+    async def feed(item):
+        # Ne pas rester bloqué sur une file pleine si l'upload a échoué
+        put = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({put, upload}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            return False
+        return True
+
+    try:
+        async for chunk in chunks:
+            if chunk and not await feed(chunk):
+                break
+        await feed(None)
+    except BaseException as e:
+        await feed(e if isinstance(e, Exception) else Exception("Envoi interrompu"))
+        await asyncio.gather(upload, return_exceptions=True)
+        observe_minio("stream_upload", bucket_name, time.perf_counter() - start, True)
+        logger.error(f"Erreur lors de l'envoi en flux du fichier vers MinIO: {e}")
+        raise
+
+    try:
+        result = await upload
+    except Exception as e:
+        observe_minio("stream_upload", bucket_name, time.perf_counter() - start, True)
+        logger.error(f"Erreur lors de l'envoi en flux du fichier vers MinIO: {e}")
+        raise
+    observe_minio("stream_upload", bucket_name, time.perf_counter() - start, False)
+
+    return {
+        "size": reader.size,
+        "sha256": reader.sha256.hexdigest(),
+        "etag": result.etag,
+    }
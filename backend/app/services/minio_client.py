@@ -1,6 +1,12 @@
 from minio import Minio
+from minio.datatypes import Part
+from minio.error import S3Error
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import json
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -10,11 +16,28 @@ MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
 
+# Transferts de fichiers : taille des parts et nombre de parts simultanées
+TRANSFER_PART_SIZE = int(os.getenv("MINIO_TRANSFER_PART_SIZE", str(64 * 1024 * 1024)))
+TRANSFER_CONCURRENCY = int(os.getenv("MINIO_TRANSFER_CONCURRENCY", "4"))
+TRANSFER_READ_SIZE = 1024 * 1024
+
+# Limites S3 des uploads multipart
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10000
+
+# Buckets nécessaires à l'application
+BUCKETS = ["models", "datasets", "results"]
+
 # Client MinIO
 minio_client = None
 
-def init_minio():
-    """Initialise la connexion au service MinIO."""
+def init_minio(check_buckets=True):
+    """
+    Initialise la connexion au service MinIO.
+
+    Avec `check_buckets=False`, seule l'instance du client est créée : la
+    vérification des buckets est alors laissée à la couche asynchrone.
+    """
     global minio_client
     
     try:
@@ -27,7 +50,8 @@ def init_minio():
         )
         
         # Vérifier si les buckets nécessaires existent, sinon les créer
-        create_buckets()
+        if check_buckets:
+            create_buckets()
         
         logger.info("Connexion MinIO établie avec succès")
         return True
@@ -35,14 +59,16 @@ def init_minio():
         logger.error(f"Erreur lors de la connexion à MinIO: {e}")
         raise
 
+def create_bucket(bucket):
+    """Crée un bucket s'il n'existe pas."""
+    if not minio_client.bucket_exists(bucket):
+        minio_client.make_bucket(bucket)
+        logger.info(f"Bucket '{bucket}' créé")
+
 def create_buckets():
     """Crée les buckets nécessaires s'ils n'existent pas."""
-    buckets = ["models", "datasets", "results"]
-    
-    for bucket in buckets:
-        if not minio_client.bucket_exists(bucket):
-            minio_client.make_bucket(bucket)
-            logger.info(f"Bucket '{bucket}' créé")
+    for bucket in BUCKETS:
+        create_bucket(bucket)
 
 def get_minio_client():
     """Retourne l'instance du client MinIO."""
@@ -50,30 +76,193 @@ def get_minio_client():
         raise Exception("Le client MinIO n'a pas été initialisé")
     return minio_client
 
-def upload_file(bucket_name, object_name, file_path):
-    """Télécharge un fichier vers MinIO."""
+def _part_size(size, part_size):
+    """Taille de part effective : au moins 5 Mio et au plus MULTIPART_MAX_PARTS parts."""
+    return max(part_size, MULTIPART_MIN_PART_SIZE, -(-size // MULTIPART_MAX_PARTS))
+
+def _part_ranges(size, part_size):
+    """Liste des parts (numéro à partir de 1, position, longueur) d'un objet."""
+    return [
+        (index + 1, offset, min(part_size, size - offset))
+        for index, offset in enumerate(range(0, size, part_size))
+    ]
+
+def _load_state(state_path, expected):
+    """Relit l'état d'un transfert interrompu s'il correspond au même fichier et au même objet."""
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(state.get(key) != value for key, value in expected.items()):
+        return None
+    return state
+
+def _save_state(state_path, state):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _uploaded_parts(client, bucket_name, object_name, upload_id):
+    """Parts déjà reçues par le serveur pour un upload multipart : {numéro: (etag, taille)}."""
+    parts = {}
+    marker = None
+    while True:
+        result = client._list_parts(bucket_name, object_name, upload_id, part_number_marker=marker)
+        for part in result.parts:
+            parts[part.part_number] = (part.etag, part.size)
+        if not result.is_truncated:
+            return parts
+        marker = result.next_part_number_marker
+
+def upload_file(bucket_name, object_name, file_path, content_type="application/octet-stream",
+                part_size=TRANSFER_PART_SIZE, concurrency=TRANSFER_CONCURRENCY):
+    """
+    Télécharge un fichier vers MinIO.
+
+    Au-delà d'une part, le fichier est envoyé en upload multipart avec
+    `concurrency` parts en parallèle. L'identifiant de l'upload est conservé à
+    côté du fichier (`<fichier>.upload.json`) : après une interruption, un nouvel
+    appel reprend l'upload et n'envoie que les parts absentes du serveur.
+    """
     try:
         client = get_minio_client()
-        client.fput_object(bucket_name, object_name, file_path)
+        size = os.path.getsize(file_path)
+        if size <= part_size:
+            client.fput_object(bucket_name, object_name, file_path, content_type=content_type)
+            return True
+
+        part_size = _part_size(size, part_size)
+        state_path = file_path + ".upload.json"
+        fingerprint = {
+            "bucket": bucket_name, "object": object_name, "size": size,
+            "mtime": os.path.getmtime(file_path), "part_size": part_size,
+        }
+        state = _load_state(state_path, fingerprint)
+        upload_id = state["upload_id"] if state else None
+        uploaded = {}
+        if upload_id:
+            try:
+                uploaded = _uploaded_parts(client, bucket_name, object_name, upload_id)
+                logger.info(f"Reprise de l'upload de {object_name} ({len(uploaded)} part(s) déjà envoyée(s))")
+            except S3Error as e:
+                if e.code != "NoSuchUpload":
+                    raise
+                upload_id = None
+        if not upload_id:
+            upload_id = client._create_multipart_upload(bucket_name, object_name, {"Content-Type": content_type})
+            _save_state(state_path, dict(fingerprint, upload_id=upload_id))
+
+        ranges = _part_ranges(size, part_size)
+        etags = {number: uploaded[number][0] for number, _, length in ranges
+                 if number in uploaded and uploaded[number][1] == length}
+
+        def send_part(part):
+            number, offset, length = part
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                data = f.read(length)
+            return number, client._upload_part(bucket_name, object_name, data, None, upload_id, number)
+
+        # Les parts envoyées restent sur le serveur en cas d'échec : l'upload
+        # n'est pas annulé afin de pouvoir être repris
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for number, etag in pool.map(send_part, [part for part in ranges if part[0] not in etags]):
+                etags[number] = etag
+
+        client._complete_multipart_upload(
+            bucket_name, object_name, upload_id, [Part(number, etags[number]) for number, _, _ in ranges]
+        )
+        _remove(state_path)
         return True
     except Exception as e:
         logger.error(f"Erreur lors du téléchargement du fichier vers MinIO: {e}")
         raise
 
-def download_file(bucket_name, object_name, file_path):
-    """Télécharge un fichier depuis MinIO."""
+def download_file(bucket_name, object_name, file_path,
+                  part_size=TRANSFER_PART_SIZE, concurrency=TRANSFER_CONCURRENCY):
+    """
+    Télécharge un fichier depuis MinIO.
+
+    Au-delà d'une part, l'objet est lu par requêtes de plage parallèles dans un
+    fichier temporaire pré-alloué (`<fichier>.<etag>.part`). Les parts terminées
+    sont notées à côté : après une interruption, un nouvel appel ne relit que les
+    parts manquantes, tant que l'objet n'a pas changé (même ETag).
+    """
     try:
         client = get_minio_client()
-        client.fget_object(bucket_name, object_name, file_path)
+        stat = client.stat_object(bucket_name, object_name)
+        if stat.size <= part_size:
+            client.fget_object(bucket_name, object_name, file_path)
+            return True
+
+        tmp_path = f"{file_path}.{stat.etag}.part"
+        state_path = tmp_path + ".json"
+        fingerprint = {"etag": stat.etag, "size": stat.size, "part_size": part_size}
+        state = _load_state(state_path, fingerprint) if os.path.exists(tmp_path) else None
+        completed = set(state["completed"]) if state else set()
+        if not completed:
+            with open(tmp_path, "wb") as f:
+                f.truncate(stat.size)
+        lock = threading.Lock()
+
+        def fetch_part(part):
+            number, offset, length = part
+            # If-Match : une modification de l'objet en cours de lecture fait échouer la part
+            response = client.get_object(
+                bucket_name, object_name, offset=offset, length=length,
+                request_headers={"If-Match": f'"{stat.etag}"'},
+            )
+            try:
+                written = 0
+                with open(tmp_path, "r+b") as f:
+                    f.seek(offset)
+                    for data in response.stream(TRANSFER_READ_SIZE):
+                        written += f.write(data)
+            finally:
+                response.close()
+                response.release_conn()
+            if written != length:
+                raise IOError(f"Part {number} incomplète ({written}/{length} octets)")
+            with lock:
+                completed.add(number)
+                _save_state(state_path, dict(fingerprint, completed=sorted(completed)))
+
+        ranges = _part_ranges(stat.size, part_size)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch_part, [part for part in ranges if part[0] not in completed]))
+
+        os.replace(tmp_path, file_path)
+        _remove(state_path)
         return True
     except Exception as e:
         logger.error(f"Erreur lors du téléchargement du fichier depuis MinIO: {e}")
         raise
 
+def remove_file(bucket_name, object_name):
+    """Supprime un objet de MinIO."""
+    try:
+        client = get_minio_client()
+        client.remove_object(bucket_name, object_name)
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors de la suppression du fichier dans MinIO: {e}")
+        raise
+
 def get_presigned_url(bucket_name, object_name, expires=3600):
     """Génère une URL présignée pour accéder à un objet."""
     try:
         client = get_minio_client()
+        # Le SDK MinIO attend une durée de validité sous forme de timedelta
+        if not isinstance(expires, timedelta):
+            expires = timedelta(seconds=expires)
         url = client.presigned_get_object(bucket_name, object_name, expires=expires)
         return url
     except Exception as e:
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
+import os
+import time
+
+from app.models.schemas import ModelFramework
+from app.services.artifact_cache import get_artifact_cache
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "8"))
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", str(min(8, os.cpu_count() or 1))))
+# Lignes au plus par appel au modèle ; au-delà les requêtes attendent le lot suivant
+PREDICT_MAX_BATCH_ROWS = int(os.getenv("PREDICT_MAX_BATCH_ROWS", "512"))
+# Lots exécutés simultanément pour un même modèle
+PREDICT_MODEL_CONCURRENCY = int(os.getenv("PREDICT_MODEL_CONCURRENCY", "2"))
+PREDICT_TIMEOUT = float(os.getenv("PREDICT_TIMEOUT", "10"))
+# Durée pendant laquelle un déploiement résolu (déploiement et modèle) est réutilisé
+PREDICT_DEPLOYMENT_TTL = float(os.getenv("PREDICT_DEPLOYMENT_TTL", "5"))
+
+# Frameworks servis en processus
+SERVABLE_FRAMEWORKS = {ModelFramework.SCIKIT_LEARN, ModelFramework.XGBOOST}
+
+# Extensions des formats natifs XGBoost (les autres fichiers sont lus avec joblib)
+XGBOOST_NATIVE_EXTENSIONS = (".json", ".ubj", ".bst", ".model")
+
+# Pool de threads des prédictions : numpy, scikit-learn et XGBoost libèrent le
+# GIL pendant les calculs
+executor = None
+
+# Modèles chargés, du moins récemment utilisé au plus récent
+loaded_models = OrderedDict()
+loading_models = {}
+
+# Déploiements résolus : évite deux lectures MongoDB par prédiction
+deployment_cache = TTLCache(max_size=1024, ttl=PREDICT_DEPLOYMENT_TTL)
+
+metrics = {
+    "requests": 0,
+    "rows": 0,
+    "batches": 0,
+    "max_batch_rows": 0,
+    "model_hits": 0,
+    "model_loads": 0,
+    "model_evictions": 0,
+    "errors": 0,
+    "seconds": 0.0,
+}
+
+class PredictionInputError(ValueError):
+    """Levée lorsque les lignes fournies ne sont pas acceptées par le modèle."""
+
+def get_executor():
+    """Retourne le pool de threads des prédictions, créé à la première utilisation."""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=PREDICT_WORKERS, thread_name_prefix="predict")
+    return executor
+
+def shutdown_model_server():
+    """Arrête le pool de prédiction et libère les modèles chargés."""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False)
+        executor = None
+    loaded_models.clear()
+    deployment_cache.clear()
+
+def load_model_file(path, framework, file_name):
+    """Charge un modèle enregistré : format natif XGBoost ou fichier joblib/pickle."""
+    if framework == ModelFramework.XGBOOST and (file_name or "").lower().endswith(XGBOOST_NATIVE_EXTENSIONS):
+        import xgboost
+        booster = xgboost.Booster()
+        booster.load_model(path)
+        return booster
+    import joblib
+    return joblib.load(path)
+
+def select_features(model, frame):
+    """Restreint un DataFrame aux variables du modèle, dans l'ordre de l'entraînement."""
+    columns = getattr(model, "feature_names_in_", None)
+    if columns is None and hasattr(model, "feature_names"):
+        columns = model.feature_names
+    if columns is None:
+        return frame
+    missing = [column for column in columns if column not in frame.columns]
+    if missing:
+        raise PredictionInputError(f"Variables manquantes: {', '.join(map(str, missing))}")
+    return frame[list(columns)]
+
+def _to_matrix(model, rows):
+    """Construit l'entrée du modèle : DataFrame si les lignes sont nommées, tableau sinon."""
+    named = isinstance(rows[0], dict)
+    if any(isinstance(row, dict) != named for row in rows):
+        raise PredictionInputError("Les lignes doivent être toutes nommées ou toutes positionnelles")
+    if named:
+        import pandas
+        return select_features(model, pandas.DataFrame.from_records(rows))
+    import numpy
+    return numpy.asarray(rows)
+
+def _predict(model, method, rows):
+    """Exécuté dans le pool : une seule invocation du modèle pour tout le lot."""
+    booster = type(model).__name__ == "Booster"
+    if booster:
+        method = "predict"
+    if not hasattr(model, method):
+        raise PredictionInputError(f"Le modèle ne fournit pas {method}")
+    try:
+        matrix = _to_matrix(model, rows)
+        if booster:
+            import xgboost
+            matrix = xgboost.DMatrix(matrix)
+        result = getattr(model, method)(matrix)
+    except (ValueError, TypeError, KeyError) as e:
+        raise PredictionInputError(str(e))
+    return result.tolist() if hasattr(result, "tolist") else list(result)
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes concurrentes adressées à un même modèle.
+
+    Un lot part immédiatement lorsque le modèle est libre : une requête isolée
+    n'attend jamais. Tant que PREDICT_MODEL_CONCURRENCY lots sont en cours, les
+    requêtes suivantes s'accumulent et partent ensemble dans le lot suivant.
+    La taille des lots suit donc la charge sans délai d'attente fixe.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.pending = {}
+        self.running = 0
+
+    def submit(self, method, rows):
+        future = asyncio.get_running_loop().create_future()
+        # Lignes nommées et positionnelles ne sont jamais mélangées dans un lot
+        key = (method, isinstance(rows[0], dict))
+        self.pending.setdefault(key, []).append((rows, future))
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        while self.running < PREDICT_MODEL_CONCURRENCY and self.pending:
+            key = next(iter(self.pending))
+            queue = self.pending[key]
+            batch = [queue.pop(0)]
+            size = len(batch[0][0])
+            while queue and size + len(queue[0][0]) <= PREDICT_MAX_BATCH_ROWS:
+                size += len(queue[0][0])
+                batch.append(queue.pop(0))
+            if not queue:
+                del self.pending[key]
+            self.running += 1
+            asyncio.ensure_future(self._run(key[0], batch, size))
+
+    async def _run(self, method, batch, size):
+        rows = [row for request_rows, _ in batch for row in request_rows]
+        metrics["batches"] += 1
+        metrics["max_batch_rows"] = max(metrics["max_batch_rows"], size)
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                results = await loop.run_in_executor(get_executor(), _predict, self.model, method, rows)
+            except PredictionInputError:
+                if len(batch) == 1:
+                    raise
+                # Une requête invalide ne doit pas faire échouer les autres : les
+                # requêtes du lot sont rejouées séparément
+                for request_rows, future in batch:
+                    try:
+                        result = await loop.run_in_executor(get_executor(), _predict, self.model, method, request_rows)
+                        if not future.done():
+                            future.set_result(result)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                return
+            offset = 0
+            for request_rows, future in batch:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(request_rows)])
+                offset += len(request_rows)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.running -= 1
+            self._dispatch()
+
+async def _load_model(key, model):
+    cache = get_artifact_cache()
+    async with cache.open("models", model["file_path"]) as path:
+        loaded = await asyncio.get_running_loop().run_in_executor(
+            get_executor(), load_model_file, path, model.get("framework"), model.get("file_name") or model["file_path"]
+        )
+    metrics["model_loads"] += 1
+    loaded_models[key] = MicroBatcher(loaded)
+    while len(loaded_models) > MODEL_CACHE_SIZE:
+        loaded_models.popitem(last=False)
+        metrics["model_evictions"] += 1
+    logger.info(f"Modèle {key[0]} chargé pour la prédiction")
+
+async def get_batcher(model):
+    """
+    Retourne le lot de prédiction d'un modèle, chargé depuis le cache disque si besoin.
+
+    La clé inclut le SHA-256 du fichier : un modèle dont le fichier change est rechargé.
+    """
+    key = (str(model["_id"]), model.get("file_sha256") or model["file_path"])
+    batcher = loaded_models.get(key)
+    if batcher is not None:
+        loaded_models.move_to_end(key)
+        metrics["model_hits"] += 1
+        return batcher
+
+    while key not in loaded_models:
+        task = loading_models.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_load_model(key, model))
+            loading_models[key] = task
+            task.add_done_callback(lambda _: loading_models.pop(key, None))
+        await asyncio.shield(task)
+    return loaded_models[key]
+
+async def predict(model, rows, probabilities=False):
+    """Calcule les prédictions d'un modèle pour une liste de lignes."""
+    metrics["requests"] += 1
+    metrics["rows"] += len(rows)
+    start = time.perf_counter()
+    try:
+        batcher = await get_batcher(model)
+        method = "predict_proba" if probabilities else "predict"
+        return await asyncio.wait_for(batcher.submit(method, rows), timeout=PREDICT_TIMEOUT)
+    except Exception:
+        metrics["errors"] += 1
+        raise
+    finally:
+        metrics["seconds"] += time.perf_counter() - start
+
+def get_model_server_metrics():
+    """Retourne les métriques du service de prédiction."""
+    return dict(
+        metrics,
+        loaded_models=len(loaded_models),
+        workers=PREDICT_WORKERS,
+        avg_batch_rows=metrics["rows"] / metrics["batches"] if metrics["batches"] else 0.0,
+    )
@@ -0,0 +1,85 @@
+from fastapi import HTTPException
+from pymongo import DESCENDING
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import base64
+import json
+
+# Tri stable utilisé par la pagination par curseur (couvert par les index *_created_at_id)
+KEYSET_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# En-tête de réponse contenant le curseur de la page suivante
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(document):
+    """
+    Encode la position (created_at, _id) d'un document en curseur opaque.
+
+    Un document sans `created_at` est trié après tous les autres : son curseur
+    ne porte alors que l'_id.
+    """
+    created_at = document.get("created_at")
+    payload = {
+        "c": created_at.isoformat() if created_at is not None else None,
+        "i": str(document["_id"]),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """Décode un curseur opaque en couple (created_at, _id)."""
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        created_at = payload["c"]
+        if created_at is not None:
+            created_at = datetime.fromisoformat(created_at)
+        return created_at, ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+def apply_keyset(filter_query, cursor):
+    """Ajoute au filtre la condition de reprise après la position du curseur."""
+    if not cursor:
+        return filter_query
+    created_at, object_id = decode_cursor(cursor)
+    if created_at is None:
+        # Curseur sans date : seuls les documents sans created_at restent à lire
+        keyset_query = {"created_at": None, "_id": {"$lt": object_id}}
+    else:
+        keyset_query = {
+            "$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": object_id}},
+                # Les documents sans created_at sont triés en dernier
+                {"created_at": None},
+            ]
+        }
+    if not filter_query:
+        return keyset_query
+    return {"$and": [filter_query, keyset_query]}
+
+async def paginate(collection, filter_query, limit, cursor=None, skip=0, projection=None):
+    """
+    Exécute une requête paginée triée par (created_at, _id) décroissants.
+
+    Si un curseur est fourni, la page est lue par keyset (coût constant quelle que
+    soit la profondeur) ; sinon `skip` est utilisé pour compatibilité.
+    Retourne les documents et le curseur de la page suivante (ou None).
+    """
+    query = apply_keyset(filter_query, cursor)
+    find_cursor = collection.find(query, projection).sort(KEYSET_SORT)
+    if skip and not cursor:
+        find_cursor = find_cursor.skip(skip)
+    documents = await find_cursor.limit(limit).to_list(length=limit)
+
+    next_cursor = None
+    if limit and len(documents) == limit:
+        next_cursor = encode_cursor(documents[-1])
+    return documents, next_cursor
+
+def set_next_cursor(response, next_cursor):
+    """Expose le curseur de la page suivante dans les en-têtes de la réponse."""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+import asyncio
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "200"))
+
+# Les hachages de coût inférieur à BCRYPT_ROUNDS sont signalés comme à mettre à jour
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+# Pool de processus dédié à bcrypt et limitation de la concurrence
+executor = None
+semaphore = None
+
+# Métriques de la file d'attente
+metrics = {
+    "in_flight": 0,
+    "waiting": 0,
+    "max_waiting": 0,
+    "completed": 0,
+    "rejected": 0,
+    "upgraded": 0,
+}
+
+class HashingOverloaded(Exception):
+    """Levée lorsque la file d'attente de hachage est pleine."""
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+def _verify_and_update(password, hashed_password):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+def get_executor():
+    """Retourne le pool de processus de hachage, créé à la première utilisation."""
+    global executor
+    if executor is None:
+        # forkserver : un fork du processus de l'API, qui a déjà des threads
+        # (MinIO, pymongo), pourrait hériter d'un verrou déjà pris
+        executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return executor
+
+def shutdown_hashing_pool():
+    """Arrête le pool de processus de hachage."""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False)
+        executor = None
+
+async def _run(func, *args):
+    """Exécute une opération bcrypt dans le pool, en respectant la limite de concurrence."""
+    global semaphore
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+
+    if PASSWORD_HASH_MAX_QUEUE and metrics["waiting"] >= PASSWORD_HASH_MAX_QUEUE:
+        metrics["rejected"] += 1
+        raise HashingOverloaded("File d'attente de hachage des mots de passe saturée")
+
+    metrics["waiting"] += 1
+    metrics["max_waiting"] = max(metrics["max_waiting"], metrics["waiting"])
+    try:
+        await semaphore.acquire()
+    finally:
+        metrics["waiting"] -= 1
+
+    metrics["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        metrics["in_flight"] -= 1
+        metrics["completed"] += 1
+        semaphore.release()
+
+async def hash_password(password):
+    """Génère un hash du mot de passe hors de la boucle d'événements."""
+    return await _run(_hash, password)
+
+async def verify_password(password, hashed_password):
+    """
+    Vérifie un mot de passe hors de la boucle d'événements.
+
+    Retourne un couple (valide, nouveau_hash) : `nouveau_hash` est renseigné
+    lorsque le hash stocké doit être remplacé pour atteindre le coût configuré.
+    """
+    valid, new_hash = await _run(_verify_and_update, password, hashed_password)
+    if new_hash:
+        metrics["upgraded"] += 1
+    return valid, new_hash
+
+def get_hashing_metrics():
+    """Retourne les métriques du pool de hachage."""
+    return dict(metrics, workers=PASSWORD_HASH_WORKERS, concurrency=PASSWORD_HASH_CONCURRENCY)
@@ -0,0 +1,364 @@
+from bisect import bisect_right
+from datetime import datetime
+from minio.error import S3Error
+import csv
+import io
+import logging
+import os
+import re
+
+from app.services import minio_client
+from app.services.cache import TTLCache
+from app.services.minio_async import run_in_pool
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+# Une entrée d'index toutes les RESULT_INDEX_STRIDE lignes des résultats CSV
+RESULT_INDEX_STRIDE = int(os.getenv("RESULT_INDEX_STRIDE", "1000"))
+PREVIEW_MAX_LIMIT = int(os.getenv("PREVIEW_MAX_LIMIT", "1000"))
+# Lignes examinées au plus par aperçu filtré ; au-delà, next_offset permet de poursuivre
+PREVIEW_MAX_SCAN_ROWS = int(os.getenv("PREVIEW_MAX_SCAN_ROWS", "100000"))
+PREVIEW_READ_SIZE = int(os.getenv("PREVIEW_READ_SIZE", str(256 * 1024)))
+# Position maximale d'un aperçu de CSV non indexé, lu depuis le début : borne la
+# lecture à la durée d'un appel MinIO (MINIO_TIMEOUT)
+PREVIEW_MAX_SEQUENTIAL_OFFSET = int(os.getenv("PREVIEW_MAX_SEQUENTIAL_OFFSET", "100000"))
+
+RESULTS_BUCKET = "results"
+
+# Index des résultats CSV : un document par exécution (_id = identifiant de
+# l'exécution) avec l'en-tête et les positions en octets de lignes régulièrement espacées
+RESULT_INDEXES_COLLECTION = "result_indexes"
+
+# Métadonnées Parquet (pied de fichier) déjà lues, par (objet, ETag)
+parquet_metadata_cache = TTLCache(max_size=256, ttl=3600)
+
+metrics = {
+    "indexed": 0,
+    "sequential": 0,
+    "parquet": 0,
+    "stale_indexes": 0,
+    "rejected_offsets": 0,
+    "range_requests": 0,
+    "bytes_read": 0,
+}
+
+FILTER_PATTERN = re.compile(r"^\s*([^=!<>]+?)\s*(==|!=|>=|<=|>|<)\s*(.*?)\s*$")
+FILTER_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+class PreviewInputError(ValueError):
+    """Levée lorsque les colonnes ou les filtres demandés sont invalides."""
+
+class StaleIndexError(Exception):
+    """Levée lorsque l'objet des résultats a changé depuis la construction de son index."""
+
+class CsvIndexBuilder:
+    """
+    Construit l'index d'un CSV à mesure qu'il est écrit, bloc par bloc.
+
+    Chaque bloc fournit les positions (relatives au bloc) de ses lignes
+    0, stride, 2 x stride... ; l'index conserve la ligne et l'octet absolus.
+    """
+
+    def __init__(self, stride=RESULT_INDEX_STRIDE):
+        self.stride = stride
+        self.header = None
+        self.rows = 0
+        self.size = 0
+        self.offsets = []
+
+    def add(self, data, rows, line_offsets):
+        for position, offset in enumerate(line_offsets):
+            self.offsets.append([self.rows + position * self.stride, self.size + offset])
+        if self.header is None and data:
+            self.header = data[:data.find(b"\n") + 1].decode().rstrip("\r\n")
+        self.rows += rows
+        self.size += len(data)
+
+def block_line_offsets(data, rows, skip_header=False, stride=RESULT_INDEX_STRIDE):
+    """Positions dans `data` des lignes 0, stride, 2 x stride... d'un bloc CSV."""
+    offsets = []
+    position = data.find(b"\n") + 1 if skip_header else 0
+    for row in range(rows):
+        if row % stride == 0:
+            offsets.append(position)
+        position = data.find(b"\n", position) + 1
+    return offsets
+
+async def save_csv_index(db, execution_id, result_path, etag, builder):
+    """Enregistre l'index d'un résultat CSV qui vient d'être écrit."""
+    await db[RESULT_INDEXES_COLLECTION].replace_one(
+        {"_id": str(execution_id)},
+        {
+            "_id": str(execution_id),
+            "result_path": result_path,
+            "etag": etag,
+            "header": builder.header,
+            "rows": builder.rows,
+            "size": builder.size,
+            "stride": builder.stride,
+            "offsets": builder.offsets,
+            "created_at": datetime.now(),
+        },
+        upsert=True,
+    )
+
+def parse_filters(expressions):
+    """Analyse des filtres de la forme `colonne<op>valeur` (op parmi ==, !=, >, >=, <, <=)."""
+    filters = []
+    for expression in expressions or []:
+        match = FILTER_PATTERN.match(expression)
+        if match is None:
+            raise PreviewInputError(f"Filtre invalide: {expression}")
+        column, operator, value = match.groups()
+        filters.append((column, FILTER_OPERATORS[operator], value))
+    return filters
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _matches(row, filters):
+    for position, operator, expected in filters:
+        # Champ absent d'une ligne courte : None, comme dans la projection
+        value = row[position] if position < len(row) else None
+        left, right = _number(value), _number(expected)
+        if left is None or right is None:
+            left, right = "" if value is None else str(value), expected
+        if not operator(left, right):
+            return False
+    return True
+
+def _plan(columns, selected, filters):
+    """Positions des colonnes retournées et des colonnes filtrées dans une ligne."""
+    positions = {name: position for position, name in enumerate(columns)}
+    unknown = [name for name in list(selected or []) + [f[0] for f in filters] if name not in positions]
+    if unknown:
+        raise PreviewInputError(f"Colonnes inconnues: {', '.join(unknown)}")
+    output = [positions[name] for name in selected] if selected else list(range(len(columns)))
+    return output, [(positions[column], operator, value) for column, operator, value in filters]
+
+def _read_range(object_name, offset, length, etag=None):
+    """Lecture d'une plage d'octets ; retourne b"" au-delà de la fin de l'objet."""
+    headers = {"If-Match": f'"{etag}"'} if etag else None
+    metrics["range_requests"] += 1
+    try:
+        response = minio_client.get_minio_client().get_object(
+            RESULTS_BUCKET, object_name, offset=offset, length=length, request_headers=headers,
+        )
+    except S3Error as e:
+        if e.code == "InvalidRange":
+            return b""
+        if e.code == "PreconditionFailed":
+            raise StaleIndexError(object_name)
+        raise
+    try:
+        data = response.read()
+    finally:
+        response.close()
+        response.release_conn()
+    metrics["bytes_read"] += len(data)
+    return data
+
+def _iter_lines(object_name, offset, etag=None, first_read=PREVIEW_READ_SIZE):
+    """
+    Lignes d'un objet à partir d'une position, lues par plages successives.
+
+    `first_read` dimensionne la première plage (estimée d'après l'index) ; les
+    suivantes font PREVIEW_READ_SIZE octets.
+    """
+    pending = b""
+    read_size = first_read
+    while True:
+        data = _read_range(object_name, offset, read_size, etag)
+        offset += len(data)
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+        if len(data) < read_size:
+            if pending:
+                yield pending
+            return
+        read_size = PREVIEW_READ_SIZE
+
+def _decode(line):
+    return next(csv.reader([line.decode().rstrip("\r")]), [])
+
+def _collect(rows, first_row, offset, limit, output, filters):
+    """Parcourt les lignes numérotées à partir de `first_row` et retient la page demandée."""
+    result = []
+    scanned = 0
+    row_number = first_row
+    for row in rows:
+        if row_number >= offset:
+            if scanned >= PREVIEW_MAX_SCAN_ROWS or len(result) >= limit:
+                return result, row_number
+            scanned += 1
+            if not filters or _matches(row, filters):
+                result.append([row[position] if position < len(row) else None for position in output])
+        row_number += 1
+    return result, None
+
+def _preview_csv(object_name, index, offset, limit, selected, filters):
+    if index is not None:
+        columns = _decode(index["header"].encode())
+        output, filters = _plan(columns, selected, filters)
+        entries = index["offsets"]
+        position = bisect_right([entry[0] for entry in entries], offset) - 1
+        first_row, start = entries[position] if position >= 0 else (0, len(index["header"].encode()) + 1)
+        # Lignes à sauter depuis l'entrée d'index plus la page, avec une marge
+        row_size = index["size"] / max(index["rows"], 1)
+        first_read = int(row_size * (offset - first_row + limit) * 1.25) + 1024
+        lines = _iter_lines(object_name, start, index["etag"], min(first_read, PREVIEW_READ_SIZE))
+        total = index["rows"]
+    else:
+        lines = _iter_lines(object_name, 0)
+        header = next(lines, None)
+        columns = _decode(header) if header is not None else []
+        output, filters = _plan(columns, selected, filters)
+        first_row = 0
+        total = None
+
+    rows = (_decode(line) for line in lines if line.strip())
+    result, next_offset = _collect(rows, first_row, offset, limit, output, filters)
+    return {
+        "columns": [columns[position] for position in output],
+        "rows": result,
+        "next_offset": next_offset,
+        "total_rows": total,
+    }
+
+class RangeFile(io.RawIOBase):
+    """Fichier en lecture seule adossé à des requêtes de plage MinIO (pour pyarrow)."""
+
+    def __init__(self, object_name, size, etag):
+        self.object_name = object_name
+        self.size = size
+        self.etag = etag
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = base + offset
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        size = min(size, self.size - self.position)
+        if size <= 0:
+            return b""
+        data = _read_range(self.object_name, self.position, size, self.etag)
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _preview_parquet(object_name, offset, limit, selected, filters):
+    import pyarrow.parquet
+
+    stat = minio_client.get_minio_client().stat_object(RESULTS_BUCKET, object_name)
+    source = RangeFile(object_name, stat.size, stat.etag)
+    key = (object_name, stat.etag)
+    metadata = parquet_metadata_cache.get(key)
+    parquet_file = pyarrow.parquet.ParquetFile(source, metadata=metadata)
+    if metadata is None:
+        parquet_metadata_cache.set(key, parquet_file.metadata)
+    metadata = parquet_file.metadata
+
+    columns = parquet_file.schema_arrow.names
+    output, filters = _plan(columns, selected, filters)
+    needed = sorted(set(output) | {position for position, _, _ in filters})
+    remap = {position: index for index, position in enumerate(needed)}
+    output = [remap[position] for position in output]
+    filters = [(remap[position], operator, value) for position, operator, value in filters]
+
+    # Index des groupes de lignes : ligne de départ de chacun
+    starts = []
+    total = 0
+    for row_group in range(metadata.num_row_groups):
+        starts.append(total)
+        total += metadata.row_group(row_group).num_rows
+    first = max(bisect_right(starts, offset) - 1, 0)
+
+    def rows():
+        for row_group in range(first, metadata.num_row_groups):
+            table = parquet_file.read_row_group(row_group, columns=[columns[p] for p in needed])
+            yield from zip(*[column.to_pylist() for column in table.columns])
+
+    result, next_offset = _collect(rows(), starts[first] if starts else 0, offset, limit, output, filters)
+    return {
+        "columns": [columns[needed[position]] for position in output],
+        "rows": result,
+        "next_offset": next_offset,
+        "total_rows": total,
+    }
+
+async def preview(db, execution_id, result_path, offset=0, limit=50, columns=None, filters=None):
+    """
+    Retourne une page de lignes des résultats d'une exécution, sans les télécharger en entier.
+
+    `offset` est un numéro de ligne du fichier : avec des filtres, `next_offset`
+    indique où reprendre le parcours. Les CSV indexés à l'écriture sont lus à
+    partir de l'entrée d'index la plus proche ; les autres CSV depuis le début,
+    en s'arrêtant dès que la page est complète, jusqu'à la ligne
+    PREVIEW_MAX_SEQUENTIAL_OFFSET au plus (PreviewInputError au-delà). Pour Parquet, le pied de
+    fichier sert d'index des groupes de lignes et seules les colonnes utiles
+    des groupes concernés sont lues.
+    """
+    filters = parse_filters(filters)
+    if result_path.lower().endswith(".parquet"):
+        metrics["parquet"] += 1
+        page = await run_in_pool(RESULTS_BUCKET, _preview_parquet, result_path, offset, limit, columns, filters)
+        page["format"] = "parquet"
+        return page
+
+    index = await db[RESULT_INDEXES_COLLECTION].find_one({"_id": str(execution_id)})
+    if index is not None and index.get("result_path") != result_path:
+        index = None
+    try:
+        if index is not None:
+            metrics["indexed"] += 1
+            page = await run_in_pool(RESULTS_BUCKET, _preview_csv, result_path, index, offset, limit, columns, filters)
+            page["format"] = "csv"
+            return page
+    except StaleIndexError:
+        # Résultat réécrit depuis l'indexation : l'index n'est plus utilisable
+        metrics["stale_indexes"] += 1
+        await db[RESULT_INDEXES_COLLECTION].delete_one({"_id": str(execution_id)})
+        logger.info(f"Index des résultats de l'exécution {execution_id} périmé, supprimé")
+    if offset > PREVIEW_MAX_SEQUENTIAL_OFFSET:
+        metrics["rejected_offsets"] += 1
+        raise PreviewInputError(
+            f"Résultats non indexés : l'aperçu est limité aux {PREVIEW_MAX_SEQUENTIAL_OFFSET} premières lignes"
+        )
+    metrics["sequential"] += 1
+    page = await run_in_pool(RESULTS_BUCKET, _preview_csv, result_path, None, offset, limit, columns, filters)
+    page["format"] = "csv"
+    return page
+
+def get_result_preview_metrics():
+    """Retourne les métriques des aperçus de résultats."""
+    return dict(metrics)
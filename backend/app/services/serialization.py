@@ -0,0 +1,61 @@
+from bson import ObjectId
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+import orjson
+
+def _default(value):
+    """Types rencontrés dans les documents MongoDB et non gérés nativement par orjson."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "to_decimal"):
+        # bson.Decimal128
+        return float(value.to_decimal())
+    raise TypeError(f"Type non sérialisable en JSON: {type(value).__name__}")
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON encodée par orjson.
+
+    Les ObjectId, dates et énumérations sont sérialisés directement, sans passer
+    par `jsonable_encoder`.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class OutputSchema:
+    """
+    Forme de sortie d'un schéma pydantic, précalculée pour les documents de la base.
+
+    Les documents lus dans MongoDB sont considérés comme valides : au lieu de
+    valider et convertir chaque document, seuls les champs déclarés (sous leur
+    alias) sont conservés et les valeurs par défaut complètent les champs
+    absents. La sortie est identique à celle de `response_model` pour des
+    données conformes au schéma.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.fields = [
+            (field.alias, None if field.required else field.default)
+            for field in schema.__fields__.values()
+        ]
+        # Projection MongoDB : seuls les champs exposés sont lus
+        self.projection = {alias: 1 for alias, _ in self.fields}
+
+    def dump(self, document):
+        get = document.get
+        return {alias: get(alias, default) for alias, default in self.fields}
+
+    def dump_many(self, documents):
+        return [self.dump(document) for document in documents]
+
+def list_response(documents, output):
+    """Réponse d'une liste de documents mis en forme par un `OutputSchema`."""
+    return FastJSONResponse(output.dump_many(documents))
@@ -0,0 +1,223 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+STATS_REPAIR_INTERVAL = float(os.getenv("STATS_REPAIR_INTERVAL", "3600"))
+STATS_RETENTION_DAYS = int(os.getenv("STATS_RETENTION_DAYS", "90"))
+
+# Collection des compteurs matérialisés : un document par collection suivie
+# (total, répartition par statut et, pour les modèles, par département) et un
+# document par jour pour les exécutions. Le tableau de bord lit cette petite
+# collection au lieu de parcourir les listes complètes.
+STATS_COLLECTION = "stats"
+DAY_KIND = "executions_day"
+
+# Répartitions maintenues pour chaque collection, en plus du statut
+BREAKDOWNS = {
+    "models": ["department"],
+    "deployments": [],
+    "executions": [],
+}
+
+# Tâche de réparation périodique
+repair_task = None
+last_repair = None
+
+def _key(value):
+    """Encode une valeur utilisée comme nom de champ MongoDB."""
+    value = str(getattr(value, "value", value) if value is not None else "unknown")
+    return value.replace("$", "_").replace(".", "_") or "unknown"
+
+def _day(value):
+    return (value or datetime.now()).strftime("%Y-%m-%d")
+
+def _document_changes(changes, collection, document, delta, status=None):
+    """Ajoute les incréments correspondant à l'ajout (delta=1) ou au retrait (delta=-1) d'un document."""
+    status = _key(document.get("status") if status is None else status)
+    fields = changes.setdefault(collection, {})
+    fields["total"] = fields.get("total", 0) + delta
+    fields[f"by_status.{status}"] = fields.get(f"by_status.{status}", 0) + delta
+    for breakdown in BREAKDOWNS[collection]:
+        field = f"by_{breakdown}.{_key(document.get(breakdown))}"
+        fields[field] = fields.get(field, 0) + delta
+
+    if collection == "executions":
+        day = _day(document.get("created_at"))
+        fields = changes.setdefault(f"{DAY_KIND}:{day}", {})
+        fields["total"] = fields.get("total", 0) + delta
+        fields[f"by_status.{status}"] = fields.get(f"by_status.{status}", 0) + delta
+
+async def _apply(db, changes):
+    """Applique les incréments en une seule écriture."""
+    operations = []
+    for stats_id, fields in changes.items():
+        fields = {field: delta for field, delta in fields.items() if delta}
+        if not fields:
+            continue
+        on_insert = {}
+        if stats_id.startswith(f"{DAY_KIND}:"):
+            on_insert = {"kind": DAY_KIND, "day": stats_id.split(":", 1)[1]}
+        update = {"$inc": fields, "$set": {"updated_at": datetime.now()}}
+        if on_insert:
+            update["$setOnInsert"] = on_insert
+        operations.append(UpdateOne({"_id": stats_id}, update, upsert=True))
+    if not operations:
+        return
+    try:
+        await db[STATS_COLLECTION].bulk_write(operations, ordered=False)
+    except Exception as e:
+        # Les compteurs sont recalculés par la réparation périodique
+        logger.error(f"Erreur lors de la mise à jour des statistiques: {e}")
+
+async def record_created(db, collection, documents):
+    """Comptabilise un ou plusieurs documents créés."""
+    if isinstance(documents, dict):
+        documents = [documents]
+    changes = {}
+    for document in documents:
+        _document_changes(changes, collection, document, 1)
+    await _apply(db, changes)
+
+async def record_deleted(db, collection, document):
+    """Comptabilise un document supprimé."""
+    changes = {}
+    _document_changes(changes, collection, document, -1)
+    await _apply(db, changes)
+
+async def record_transitions(db, collection, transitions):
+    """
+    Comptabilise des changements de statut.
+
+    `transitions` est une liste de (document, ancien statut, nouveau statut) ; le
+    document fournit les répartitions (département, date de création).
+    """
+    changes = {}
+    for document, old_status, new_status in transitions:
+        if _key(old_status) == _key(new_status):
+            continue
+        _document_changes(changes, collection, document, -1, status=old_status)
+        _document_changes(changes, collection, document, 1, status=new_status)
+    await _apply(db, changes)
+
+async def record_transition(db, collection, document, old_status, new_status):
+    """Comptabilise le changement de statut d'un document."""
+    await record_transitions(db, collection, [(document, old_status, new_status)])
+
+def _counts(groups):
+    return {_key(group["_id"]): group["count"] for group in groups if group["count"]}
+
+async def repair_stats(db):
+    """
+    Recalcule les compteurs à partir des collections par des pipelines d'agrégation.
+
+    Les incréments appliqués pendant le recalcul peuvent être écrasés ; ils sont
+    corrigés au passage suivant.
+    """
+    global last_repair
+
+    now = datetime.now()
+    documents = {}
+    for collection, breakdowns in BREAKDOWNS.items():
+        facets = {"by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}]}
+        for breakdown in breakdowns:
+            facets[f"by_{breakdown}"] = [{"$group": {"_id": f"${breakdown}", "count": {"$sum": 1}}}]
+        result = await db[collection].aggregate([{"$facet": facets}]).to_list(length=1)
+        facet = result[0] if result else {}
+        document = {name: _counts(facet.get(name, [])) for name in facets}
+        document["total"] = sum(document["by_status"].values())
+        document["updated_at"] = now
+        documents[collection] = document
+
+    # Exécutions par jour et par statut sur la période conservée
+    cutoff = (now - timedelta(days=STATS_RETENTION_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = {}
+    async for group in db.executions.aggregate([
+        {"$match": {"created_at": {"$gte": cutoff}}},
+        {"$group": {
+            "_id": {
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "status": "$status",
+            },
+            "count": {"$sum": 1},
+        }},
+    ]):
+        day = days.setdefault(group["_id"]["day"], {"kind": DAY_KIND, "day": group["_id"]["day"], "by_status": {}})
+        day["by_status"][_key(group["_id"]["status"])] = group["count"]
+    for day in days.values():
+        day["total"] = sum(day["by_status"].values())
+        day["updated_at"] = now
+        documents[f"{DAY_KIND}:{day['day']}"] = day
+
+    stats = db[STATS_COLLECTION]
+    for stats_id, document in documents.items():
+        await stats.replace_one({"_id": stats_id}, document, upsert=True)
+    # Supprimer les jours sans exécution et ceux sortis de la période conservée
+    await stats.delete_many({"kind": DAY_KIND, "_id": {"$nin": list(documents)}})
+
+    last_repair = now
+    return {"collections": len(BREAKDOWNS), "days": len(days)}
+
+async def get_stats(db, days=30):
+    """Retourne les statistiques du tableau de bord en une lecture de la collection de compteurs."""
+    cutoff = _day(datetime.now() - timedelta(days=days - 1))
+    summary = {}
+    by_day = []
+    query = {"$or": [{"kind": {"$ne": DAY_KIND}}, {"day": {"$gte": cutoff}}]}
+    async for document in db[STATS_COLLECTION].find(query):
+        if document.get("kind") == DAY_KIND:
+            if document.get("total"):
+                by_day.append({
+                    "day": document["day"],
+                    "total": document.get("total", 0),
+                    "by_status": {k: v for k, v in document.get("by_status", {}).items() if v},
+                })
+            continue
+        if document["_id"] not in BREAKDOWNS:
+            continue
+        entry = {"total": document.get("total", 0)}
+        for name in ["status"] + BREAKDOWNS[document["_id"]]:
+            values = document.get(f"by_{name}", {})
+            entry[f"by_{name}"] = {k: v for k, v in values.items() if v}
+        summary[document["_id"]] = entry
+
+    for collection, breakdowns in BREAKDOWNS.items():
+        summary.setdefault(collection, dict(
+            {"total": 0, "by_status": {}},
+            **{f"by_{name}": {} for name in breakdowns}
+        ))
+    summary["executions"]["by_day"] = sorted(by_day, key=lambda entry: entry["day"])
+    summary["last_repair"] = last_repair
+    return summary
+
+async def _run_repair(db, interval):
+    while True:
+        try:
+            result = await repair_stats(db)
+            logger.info(f"Statistiques recalculées ({result['days']} jour(s) d'exécutions)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors du recalcul des statistiques: {e}")
+        await asyncio.sleep(interval)
+
+def start_stats_repair(db, interval=STATS_REPAIR_INTERVAL):
+    """Démarre le recalcul périodique des statistiques (un premier passage est fait immédiatement)."""
+    global repair_task
+
+    if repair_task is None or repair_task.done():
+        repair_task = asyncio.create_task(_run_repair(db, interval))
+    return repair_task
+
+async def stop_stats_repair():
+    """Arrête le recalcul périodique des statistiques."""
+    global repair_task
+
+    if repair_task is not None:
+        repair_task.cancel()
+        await asyncio.gather(repair_task, return_exceptions=True)
+        repair_task = None
@@ -0,0 +1,204 @@
+from pymongo import UpdateOne
+from datetime import datetime, timedelta, timezone
+import asyncio
+import logging
+import os
+
+from app.models.schemas import ExecutionStatus, DeploymentStatus
+from app.services.airflow_client import list_dag_runs_batch
+from app.services.batch_scoring import fail_stale_jobs
+from app.services.collection_versions import bump_version
+from app.services.event_bus import publish_status
+from app.services.stats import record_transitions
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+RECONCILE_INTERVAL = float(os.getenv("AIRFLOW_RECONCILE_INTERVAL", "15"))
+RECONCILE_BATCH_SIZE = int(os.getenv("AIRFLOW_RECONCILE_BATCH_SIZE", "100"))
+
+# États terminaux d'Airflow et statuts correspondants
+EXECUTION_STATES = {
+    "success": ExecutionStatus.SUCCESS,
+    "failed": ExecutionStatus.FAILED,
+}
+DEPLOYMENT_STATES = {
+    "success": DeploymentStatus.COMPLETED,
+    "failed": DeploymentStatus.FAILED,
+}
+
+# Tâche de réconciliation en arrière-plan
+reconciler_task = None
+
+def _parse_airflow_date(value):
+    """Convertit une date Airflow ISO 8601 en datetime naïf (heure locale)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+async def _fetch_finished_runs(documents, date_field):
+    """Récupère en lot les exécutions Airflow terminées des documents donnés."""
+    dag_ids = sorted({doc["dag_id"] for doc in documents})
+    dates = [doc[date_field] for doc in documents if date_field and doc.get(date_field)]
+    start_date_gte = None
+    if dates:
+        # Marge d'un jour pour absorber les écarts de fuseau horaire
+        start_date_gte = (min(dates) - timedelta(days=1)).replace(tzinfo=timezone.utc)
+
+    runs = {}
+    for i in range(0, len(dag_ids), RECONCILE_BATCH_SIZE):
+        dag_runs = await list_dag_runs_batch(
+            dag_ids[i:i + RECONCILE_BATCH_SIZE],
+            states=list(EXECUTION_STATES),
+            start_date_gte=start_date_gte,
+        )
+        for run in dag_runs:
+            runs[(run["dag_id"], run["dag_run_id"])] = run
+    return runs
+
+async def _apply_transitions(db, kind, collection_name, result, old_status, transitions):
+    """
+    Comptabilise et publie les transitions (document, nouveau statut) écrites par
+    un bulk_write depuis `old_status`.
+
+    Si certaines mises à jour n'ont pas été appliquées (objet modifié entre-temps),
+    seules celles dont le statut réel correspond sont retenues.
+    """
+    if result.matched_count != len(transitions):
+        current = {
+            doc["_id"]: doc.get("status")
+            async for doc in db[collection_name].find(
+                {"_id": {"$in": [document["_id"] for document, _ in transitions]}},
+                {"status": 1},
+            )
+        }
+        transitions = [(document, status) for document, status in transitions if current.get(document["_id"]) == status]
+    await record_transitions(db, collection_name, [(document, old_status, status) for document, status in transitions])
+    for document, status in transitions:
+        publish_status(kind, document["_id"], status)
+
+async def reconcile_executions(db):
+    """Met à jour en lot le statut des exécutions en cours à partir d'Airflow."""
+    running = await db.executions.find(
+        {"status": ExecutionStatus.RUNNING, "dag_run_id": {"$ne": None}},
+        {"dag_id": 1, "dag_run_id": 1, "start_time": 1, "created_at": 1},
+    ).to_list(length=None)
+    running = [doc for doc in running if doc.get("dag_id")]
+    if not running:
+        return 0
+
+    runs = await _fetch_finished_runs(running, "start_time")
+
+    operations = []
+    transitions = []
+    for execution in running:
+        run = runs.get((execution["dag_id"], execution["dag_run_id"]))
+        if run is None or run.get("state") not in EXECUTION_STATES:
+            continue
+        transitions.append((execution, EXECUTION_STATES[run["state"]]))
+        operations.append(UpdateOne(
+            # Ne pas écraser une exécution annulée entre-temps
+            {"_id": execution["_id"], "status": ExecutionStatus.RUNNING},
+            {"$set": {
+                "status": EXECUTION_STATES[run["state"]],
+                "end_time": _parse_airflow_date(run.get("end_date")) or datetime.now(),
+            }},
+        ))
+
+    if operations:
+        result = await db.executions.bulk_write(operations, ordered=False)
+        await _apply_transitions(db, "execution", "executions", result, ExecutionStatus.RUNNING, transitions)
+    return len(operations)
+
+async def reconcile_deployments(db):
+    """Met à jour en lot le statut des déploiements en cours à partir d'Airflow."""
+    running = await db.deployments.find(
+        {"status": DeploymentStatus.RUNNING, "dag_run_id": {"$ne": None}},
+        {"dag_id": 1, "dag_run_id": 1, "run_started_at": 1, "created_at": 1},
+    ).to_list(length=None)
+    running = [doc for doc in running if doc.get("dag_id")]
+    if not running:
+        return 0
+
+    # Borne de date : run_started_at est fixé au déclenchement du DAG, contrairement à
+    # updated_at qui change lors des modifications manuelles ; created_at le précède
+    # toujours et sert de borne pour les déploiements démarrés avant son ajout
+    for deployment in running:
+        deployment["run_started_at"] = deployment.get("run_started_at") or deployment.get("created_at")
+    runs = await _fetch_finished_runs(running, "run_started_at")
+
+    operations = []
+    transitions = []
+    for deployment in running:
+        run = runs.get((deployment["dag_id"], deployment["dag_run_id"]))
+        if run is None or run.get("state") not in DEPLOYMENT_STATES:
+            continue
+        transitions.append((deployment, DEPLOYMENT_STATES[run["state"]]))
+        operations.append(UpdateOne(
+            {"_id": deployment["_id"], "status": DeploymentStatus.RUNNING},
+            {"$set": {
+                "status": DEPLOYMENT_STATES[run["state"]],
+                "updated_at": datetime.now(),
+            }},
+        ))
+
+    if operations:
+        result = await db.deployments.bulk_write(operations, ordered=False)
+        await bump_version(db, "deployments")
+        await _apply_transitions(db, "deployment", "deployments", result, DeploymentStatus.RUNNING, transitions)
+    return len(operations)
+
+async def reconcile_once(db):
+    """
+    Effectue un passage de réconciliation des exécutions et des déploiements,
+    et marque en échec les exécutions locales abandonnées par leur processus.
+    """
+    # Indépendant d'Airflow : effectué même si Airflow ne répond pas
+    abandoned = await fail_stale_jobs(db)
+    if abandoned:
+        logger.info(f"Réconciliation: {abandoned} exécution(s) locale(s) abandonnée(s) marquée(s) en échec")
+    executions = await reconcile_executions(db)
+    deployments = await reconcile_deployments(db)
+    if executions or deployments:
+        logger.info(
+            f"Réconciliation Airflow: {executions} exécution(s) et "
+            f"{deployments} déploiement(s) mis à jour"
+        )
+    return {"executions": executions, "deployments": deployments, "local_executions": abandoned}
+
+async def _run_reconciler(db, interval):
+    while True:
+        try:
+            await reconcile_once(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la réconciliation des statuts Airflow: {e}")
+        await asyncio.sleep(interval)
+
+def start_reconciler(db, interval=RECONCILE_INTERVAL):
+    """Démarre la tâche de réconciliation périodique des statuts Airflow."""
+    global reconciler_task
+
+    if reconciler_task is None or reconciler_task.done():
+        reconciler_task = asyncio.create_task(_run_reconciler(db, interval))
+        logger.info("Réconciliateur des statuts Airflow démarré")
+    return reconciler_task
+
+async def stop_reconciler():
+    """Arrête la tâche de réconciliation."""
+    global reconciler_task
+
+    if reconciler_task is not None:
+        reconciler_task.cancel()
+        try:
+            await reconciler_task
+        except asyncio.CancelledError:
+            pass
+        reconciler_task = None
@@ -0,0 +1,88 @@
+import logging
+import os
+import time
+
+from app.services.cache import TTLCache
+from app.services.collection_versions import get_version, bump_version
+
+logger = logging.getLogger(__name__)
+
+# Variables d'environnement
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_VERSION_CHECK = float(os.getenv("USER_CACHE_VERSION_CHECK", "1"))
+
+# Version partagée de la collection users : elle est incrémentée à chaque
+# modification d'utilisateur et, lorsqu'un worker observe un changement, il vide
+# son cache local.
+USERS_VERSION_ID = "users"
+
+# Caches locaux au processus : tokens décodés et utilisateurs actifs
+token_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Version correspondant au contenu du cache local
+known_version = None
+
+async def _check_version(db):
+    """Vide le cache si la version partagée a changé (au plus une lecture par intervalle)."""
+    global known_version
+
+    version = await get_version(db, USERS_VERSION_ID, max_age=USER_CACHE_VERSION_CHECK)
+    if known_version is not None and version != known_version:
+        user_cache.clear()
+    known_version = version
+
+def get_cached_token(token):
+    """Retourne le contenu d'un token déjà décodé s'il est encore valide."""
+    payload = token_cache.get(token)
+    if payload is None:
+        return None
+    if payload.get("exp") is not None and payload["exp"] <= time.time():
+        token_cache.pop(token)
+        return None
+    return payload
+
+def cache_token(token, payload):
+    """Conserve le contenu décodé d'un token jusqu'à son expiration."""
+    ttl = USER_CACHE_TTL
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(token, payload, ttl=ttl)
+
+async def get_cached_user(db, username, loader):
+    """
+    Retourne l'utilisateur depuis le cache, ou le charge via `loader`.
+
+    Le mot de passe haché n'est jamais conservé en cache.
+    """
+    await _check_version(db)
+
+    user = user_cache.get(username)
+    if user is None:
+        user = await loader(db, username)
+        if user is None:
+            return None
+        user = {k: v for k, v in user.items() if k != "hashed_password"}
+        user_cache.set(username, user)
+    return dict(user)
+
+async def invalidate_user(db, username=None):
+    """
+    Invalide un utilisateur dans le cache local et incrémente la version
+    partagée pour que les autres workers vident leur cache.
+    """
+    global known_version
+
+    if username is not None:
+        user_cache.pop(username)
+    else:
+        user_cache.clear()
+
+    version = await bump_version(db, USERS_VERSION_ID)
+    # Si un autre worker a aussi incrémenté la version entre-temps, ses
+    # invalidations n'ont pas encore été appliquées localement
+    if known_version is None or version != known_version + 1:
+        user_cache.clear()
+    known_version = version
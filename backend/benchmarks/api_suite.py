@@ -0,0 +1,445 @@
+"""
+Suite de benchmarks de l'API exécutée en processus, sans la stack docker-compose.
+
+`app.main:app` est démarrée (événements startup/shutdown compris) contre des
+substituts locaux : une base MongoDB en mémoire, un client MinIO en mémoire et
+l'API REST d'Airflow simulée derrière un `httpx.MockTransport`. Chaque routeur
+est sollicité par des scénarios représentatifs ; pour chacun sont mesurés les
+latences p50/p95/p99, le débit et la mémoire allouée par requête
+(tracemalloc, dans une passe séparée pour ne pas fausser les latences).
+
+Les résultats sont enregistrés en JSON pour servir de référence et comparés à
+une référence précédente avec --compare.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/api_suite.py --requests 300 --concurrency 10 --output benchmarks/baselines/base.json
+    python benchmarks/api_suite.py --compare benchmarks/baselines/base.json --scenarios models
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Coût bcrypt minimal par défaut : le scénario de connexion mesure l'API, pas bcrypt
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from bson import ObjectId
+import httpx
+
+from app import main
+from app.models.schemas import DeploymentStatus, ExecutionStatus, ModelStatus, UserRole
+from app.services import airflow_client, database, minio_client
+from app.services.execution_logs import append_logs
+from app.services.indexes import ensure_required_indexes, start_index_build
+from app.services.password_hashing import pwd_context
+from benchmarks.fakes import FakeAirflow, FakeMinio, InMemoryDatabase
+
+ADMIN_USERNAME = "bench-admin"
+ADMIN_PASSWORD = "bench-password"
+
+
+# ---------------------------------------------------------------------------
+# Démarrage de l'application contre les substituts
+# ---------------------------------------------------------------------------
+
+class Environment:
+    """Substituts et données de départ partagés par les scénarios."""
+
+    def __init__(self, mongo_latency, minio_latency, airflow_latency):
+        self.db = InMemoryDatabase()
+        self.minio = FakeMinio(latency=minio_latency)
+        self.airflow = FakeAirflow(latency=airflow_latency)
+        self.mongo_latency = mongo_latency
+        self.models = []
+        self.deployments = []
+        self.executions = []
+        self.startable_deployments = []
+        self.cancellable_executions = []
+        self.headers = {}
+        self.etags = {}
+
+
+def install_stand_ins(env):
+    """Remplace les initialisations de services de app.main par les substituts."""
+
+    async def init_db():
+        database.db = env.db
+        await database.create_collections()
+        await ensure_required_indexes(env.db)
+        start_index_build(env.db)
+        return True
+
+    def init_minio(check_buckets=True):
+        minio_client.minio_client = env.minio
+        return True
+
+    def init_airflow():
+        airflow_client.airflow_client = httpx.AsyncClient(
+            base_url=airflow_client.AIRFLOW_ENDPOINT,
+            transport=env.airflow.transport(),
+        )
+        return True
+
+    main.init_db = init_db
+    main.init_minio = init_minio
+    main.init_airflow = init_airflow
+
+    if env.mongo_latency:
+        # Latence réseau MongoDB simulée sur chaque opération comptée
+        count_operation = env.db.count_operation
+
+        def delayed(collection, operation):
+            count_operation(collection, operation)
+            time.sleep(env.mongo_latency)
+
+        env.db.count_operation = delayed
+
+
+async def seed(env, size, pool_size):
+    """Insère des modèles, déploiements, exécutions et un administrateur."""
+    db = env.db
+    now = datetime.now()
+    await db.users.insert_one({
+        "username": ADMIN_USERNAME, "email": "admin@bench.local", "full_name": "Bench Admin",
+        "role": UserRole.ADMIN, "is_active": True, "hashed_password": pwd_context.hash(ADMIN_PASSWORD),
+        "created_at": now, "updated_at": now,
+    })
+
+    departments = ["ventes", "marketing", "finance", "rh"]
+    for i in range(size):
+        model_id = ObjectId()
+        object_name = f"{model_id}/model.pkl"
+        env.minio.make_bucket("models")
+        env.minio.put_object("models", object_name, _Bytes(b"m" * 4096), 4096)
+        await db.models.insert_one({
+            "_id": model_id, "name": f"model-{i}", "description": "modèle de benchmark",
+            "type": "classification", "framework": "scikit-learn", "version": "1.0.0",
+            "tags": ["bench"], "parameters": {"alpha": 0.1}, "metadata": {},
+            "owner_id": "bench", "department": departments[i % len(departments)], "region": "eu",
+            "status": ModelStatus.READY, "file_path": object_name,
+            "created_at": now - timedelta(minutes=i), "updated_at": now - timedelta(minutes=i),
+        })
+        env.models.append(str(model_id))
+
+    def deployment(i, status):
+        return {
+            "model_id": env.models[i % len(env.models)], "name": f"deployment-{i}",
+            "description": None, "parameters": {}, "schedule": None, "owner_id": "bench",
+            "status": status, "dag_id": f"model_{env.models[i % len(env.models)]}", "dag_run_id": None,
+            "created_at": now - timedelta(minutes=i), "updated_at": now - timedelta(minutes=i),
+        }
+
+    for i in range(size):
+        result = await db.deployments.insert_one(deployment(i, DeploymentStatus.COMPLETED))
+        env.deployments.append(str(result.inserted_id))
+    for i in range(pool_size):
+        result = await db.deployments.insert_one(deployment(i, DeploymentStatus.COMPLETED))
+        env.startable_deployments.append(str(result.inserted_id))
+
+    def execution(i, status):
+        deployment_id = env.deployments[i % len(env.deployments)]
+        document = {
+            "deployment_id": deployment_id, "model_id": env.models[i % len(env.models)],
+            "owner_id": "bench", "parameters": {}, "status": status,
+            "dag_id": f"model_{env.models[i % len(env.models)]}", "dag_run_id": None,
+            "created_at": now - timedelta(minutes=i), "start_time": now - timedelta(minutes=i),
+            "end_time": None, "result_path": None, "log_lines": 0, "log_bytes": 0,
+        }
+        if status == ExecutionStatus.SUCCESS:
+            document["result_path"] = f"{deployment_id}/{i}/predictions.csv"
+            env.minio.make_bucket("results")
+            env.minio.put_object("results", document["result_path"], _Bytes(b"id,score\n1,0.5\n"), 15)
+        return document
+
+    for i in range(size):
+        result = await db.executions.insert_one(execution(i, ExecutionStatus.SUCCESS))
+        execution_id = str(result.inserted_id)
+        await append_logs(db, execution_id, [f"ligne {n} de l'exécution {i}" for n in range(200)])
+        env.executions.append(execution_id)
+    for i in range(pool_size):
+        result = await db.executions.insert_one(execution(i, ExecutionStatus.QUEUED))
+        env.cancellable_executions.append(str(result.inserted_id))
+
+
+class _Bytes:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self, size=-1):
+        data, self._data = (self._data, b"") if size < 0 else (self._data[:size], self._data[size:])
+        return data
+
+
+# ---------------------------------------------------------------------------
+# Scénarios
+# ---------------------------------------------------------------------------
+
+def _pick(values, i):
+    return values[i % len(values)]
+
+
+def _pop(values):
+    # Les pools sont dimensionnés pour le nombre de requêtes ; au-delà, réutilisation
+    return values.pop() if len(values) > 1 else values[0]
+
+
+def scenarios(env):
+    """Retourne la liste (nom, constructeur de requête) couvrant chaque routeur."""
+    model_form = json.dumps({
+        "name": "bench", "type": "classification", "framework": "scikit-learn",
+        "owner_id": "bench", "department": "ventes", "region": "eu",
+    })
+
+    def conditional(name, url):
+        def build(i):
+            headers = {"If-None-Match": env.etags[name]} if name in env.etags else {}
+            return "GET", url, {"headers": headers}
+        return build
+
+    return [
+        ("health.live", lambda i: ("GET", "/health/live", {})),
+        ("health.ready", lambda i: ("GET", "/health/ready", {})),
+
+        ("models.list", lambda i: ("GET", "/api/models/?limit=50", {})),
+        ("models.list_not_modified", conditional("models.list", "/api/models/?limit=50")),
+        ("models.list_filtered", lambda i: ("GET", "/api/models/?department=finance&limit=50", {})),
+        ("models.get", lambda i: ("GET", f"/api/models/{_pick(env.models, i)}", {})),
+        ("models.create", lambda i: ("POST", "/api/models/", {
+            "data": {"model_data": model_form},
+            "files": {"model_file": ("model.pkl", b"x" * 64 * 1024, "application/octet-stream")},
+        })),
+        ("models.update", lambda i: ("PUT", f"/api/models/{_pick(env.models, i)}", {
+            "json": {"description": f"mise à jour {i}"},
+        })),
+        ("models.download", lambda i: ("GET", f"/api/models/{_pick(env.models, i)}/download", {})),
+
+        ("deployments.list", lambda i: ("GET", "/api/deployments/?limit=50", {})),
+        ("deployments.get", lambda i: ("GET", f"/api/deployments/{_pick(env.deployments, i)}", {})),
+        ("deployments.status", lambda i: ("GET", f"/api/deployments/{_pick(env.deployments, i)}/status", {})),
+        ("deployments.create", lambda i: ("POST", "/api/deployments/", {
+            "json": {"model_id": _pick(env.models, i), "name": f"bench-{i}", "owner_id": "bench"},
+        })),
+        ("deployments.update", lambda i: ("PUT", f"/api/deployments/{_pick(env.deployments, i)}", {
+            "json": {"description": f"mise à jour {i}"},
+        })),
+        ("deployments.start", lambda i: ("POST", f"/api/deployments/{_pop(env.startable_deployments)}/start", {})),
+
+        ("executions.list", lambda i: ("GET", "/api/executions/?limit=50", {})),
+        ("executions.get", lambda i: ("GET", f"/api/executions/{_pick(env.executions, i)}", {})),
+        ("executions.status", lambda i: ("GET", f"/api/executions/{_pick(env.executions, i)}/status", {})),
+        ("executions.create", lambda i: ("POST", "/api/executions/", {
+            "json": {"deployment_id": _pick(env.deployments, i), "owner_id": "bench"},
+        })),
+        ("executions.batch", lambda i: ("POST", "/api/executions/batch", {
+            "json": {"executions": [
+                {"deployment_id": _pick(env.deployments, i + n), "owner_id": "bench"} for n in range(10)
+            ]},
+        })),
+        ("executions.logs", lambda i: ("GET", f"/api/executions/{_pick(env.executions, i)}/logs?start=50&limit=100", {})),
+        ("executions.logs_tail", lambda i: ("GET", f"/api/executions/{_pick(env.executions, i)}/logs/tail?lines=50", {})),
+        ("executions.results", lambda i: ("GET", f"/api/executions/{_pick(env.executions, i)}/results", {})),
+        ("executions.cancel", lambda i: ("POST", f"/api/executions/{_pop(env.cancellable_executions)}/cancel", {})),
+
+        ("users.token", lambda i: ("POST", "/api/users/token", {
+            "data": {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD},
+        })),
+        ("users.me", lambda i: ("GET", "/api/users/me", {"headers": env.headers})),
+        ("users.list", lambda i: ("GET", "/api/users/?limit=50", {"headers": env.headers})),
+
+        ("stats.get", lambda i: ("GET", "/api/stats/", {})),
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Mesure
+# ---------------------------------------------------------------------------
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _send(client, build, i):
+    method, url, kwargs = build(i)
+    return await client.request(method, url, **kwargs)
+
+
+async def measure(client, env, name, build, requests, concurrency, warmup, alloc_requests):
+    for i in range(warmup):
+        response = await _send(client, build, i)
+        if response.headers.get("etag"):
+            env.etags.setdefault(name, response.headers["etag"])
+
+    latencies = []
+    statuses = Counter()
+    next_index = iter(range(warmup, warmup + requests))
+
+    async def worker():
+        for i in next_index:
+            start = time.perf_counter()
+            response = await _send(client, build, i)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    # Passe séparée pour la mémoire : tracemalloc ralentit fortement l'exécution
+    tracemalloc.start()
+    for i in range(alloc_requests):
+        await _send(client, build, warmup + requests + i)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_codes": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "throughput_rps": requests / elapsed,
+        "alloc_peak_kib": peak / 1024,
+        "alloc_retained_kib_per_request": retained / 1024 / max(1, alloc_requests),
+    }
+
+
+async def run(args):
+    env = Environment(args.mongo_latency_ms / 1000, args.minio_latency_ms / 1000, args.airflow_latency_ms / 1000)
+    install_stand_ins(env)
+    pool_size = args.warmup + args.requests + args.alloc_requests + 1
+    await main.app.router.startup()
+    results = {}
+    try:
+        await seed(env, args.seed, pool_size)
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+            response = await client.post(
+                "/api/users/token", data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}
+            )
+            response.raise_for_status()
+            env.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            selected = re.compile(args.scenarios) if args.scenarios else None
+            for name, build in scenarios(env):
+                if selected and not selected.search(name):
+                    continue
+                result = await measure(
+                    client, env, name, build, args.requests, args.concurrency, args.warmup, args.alloc_requests
+                )
+                results[name] = result
+                print(
+                    f"{name:<28} p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+                    f"p99={result['p99_ms']:8.2f}ms {result['throughput_rps']:8.0f} req/s "
+                    f"alloc={result['alloc_retained_kib_per_request']:7.1f}KiB/req"
+                    + (f"  erreurs={result['errors']} {result['status_codes']}" if result["errors"] else "")
+                )
+    finally:
+        await main.app.router.shutdown()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Références JSON
+# ---------------------------------------------------------------------------
+
+def git_revision():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def save(path, args, results):
+    commit, dirty = git_revision()
+    document = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {
+                "requests": args.requests, "concurrency": args.concurrency, "seed": args.seed,
+                "mongo_latency_ms": args.mongo_latency_ms, "minio_latency_ms": args.minio_latency_ms,
+                "airflow_latency_ms": args.airflow_latency_ms,
+            },
+        },
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(f"\nRésultats enregistrés dans {path}")
+
+
+def compare(path, results, threshold):
+    """Compare aux résultats de référence ; retourne le nombre de régressions."""
+    with open(path) as f:
+        baseline = json.load(f)
+    print(f"\nComparaison avec {path} (commit {baseline['meta'].get('commit')}, seuil {threshold:.0f}%)")
+    print(f"{'scénario':<28} {'p95 réf.':>10} {'p95':>10} {'écart':>8} {'débit réf.':>11} {'débit':>9} {'écart':>8}")
+    regressions = 0
+    for name, result in results.items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None:
+            continue
+        p95_delta = (result["p95_ms"] / reference["p95_ms"] - 1) * 100 if reference["p95_ms"] else 0.0
+        rps_delta = (result["throughput_rps"] / reference["throughput_rps"] - 1) * 100 \
+            if reference["throughput_rps"] else 0.0
+        regression = p95_delta > threshold or rps_delta < -threshold
+        regressions += regression
+        print(
+            f"{name:<28} {reference['p95_ms']:9.2f}ms {result['p95_ms']:9.2f}ms {p95_delta:+7.1f}% "
+            f"{reference['throughput_rps']:10.0f} {result['throughput_rps']:9.0f} {rps_delta:+7.1f}%"
+            + ("  <-- régression" if regression else "")
+        )
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requêtes mesurées par scénario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--alloc-requests", type=int, default=20, help="requêtes de la passe tracemalloc")
+    parser.add_argument("--seed", type=int, default=200, help="nombre de modèles, déploiements et exécutions")
+    parser.add_argument("--scenarios", help="expression régulière filtrant les scénarios")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--minio-latency-ms", type=float, default=0.0)
+    parser.add_argument("--airflow-latency-ms", type=float, default=0.0)
+    parser.add_argument("--output", help="fichier JSON où enregistrer les résultats")
+    parser.add_argument("--compare", help="fichier JSON de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=10.0, help="écart toléré en pourcentage")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.output:
+        save(args.output, args, results)
+    if args.compare and compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,96 @@
+"""
+Benchmark du chemin d'authentification : get_current_user avec et sans cache.
+
+Une base factice compte les allers-retours MongoDB et simule leur latence.
+Sans cache, chaque requête authentifiée coûte un `find_one` sur `users` ; avec
+le cache, seule la vérification périodique de la version partagée subsiste.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/auth_user_cache.py --requests 2000 --mongo-latency-ms 1
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.api import users
+from app.services import user_cache
+
+
+class CountingCollection:
+    """Collection factice qui compte les appels et simule la latence réseau."""
+
+    def __init__(self, db, documents):
+        self.db = db
+        self.documents = documents
+
+    async def find_one(self, query, *args, **kwargs):
+        self.db.round_trips += 1
+        await asyncio.sleep(self.db.latency)
+        for document in self.documents:
+            if all(document.get(k) == v for k, v in query.items()):
+                return dict(document)
+        return None
+
+
+class CountingDB:
+    def __init__(self, latency, documents):
+        self.latency = latency
+        self.round_trips = 0
+        self.users = CountingCollection(self, documents)
+        self.versions = CountingCollection(self, [{"_id": "users", "version": 0}])
+
+    def __getitem__(self, name):
+        return self.versions
+
+
+async def uncached_current_user(token, db):
+    """get_current_user tel qu'il était avant le cache."""
+    payload = users.jwt.decode(token, users.SECRET_KEY, algorithms=[users.ALGORITHM])
+    return await users.get_user(db, payload["sub"])
+
+
+async def run(label, func, token, db, requests):
+    db.round_trips = 0
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        await func(token=token, db=db)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:>9}: {requests / elapsed:8.0f} req/s  p50={statistics.median(latencies):8.1f}µs  "
+        f"round trips/requête={db.round_trips / requests:.3f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    document = {
+        "_id": ObjectId(), "username": "alice", "email": "alice@example.com",
+        "role": "admin", "is_active": True, "hashed_password": "x",
+        "created_at": datetime.now(), "updated_at": datetime.now(),
+    }
+    db = CountingDB(args.mongo_latency_ms / 1000, [document])
+    token = users.create_access_token({"sub": "alice", "role": "admin"}, timedelta(minutes=30))
+
+    await run("sans cache", uncached_current_user, token, db, args.requests)
+    await run("avec cache", users.get_current_user, token, db, args.requests)
+    print(f"cache utilisateurs: {user_cache.user_cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
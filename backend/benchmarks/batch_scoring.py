@@ -0,0 +1,158 @@
+"""
+Débit du scoring local en flux selon le nombre de processus.
+
+Un modèle scikit-learn et un jeu de données CSV synthétique sont placés dans
+`FakeMinio`, puis une exécution locale est jouée de bout en bout par
+`app.services.batch_scoring` (lecture en flux, prédiction dans le pool de
+processus, envoi en flux du résultat) contre une base en mémoire. Pour chaque
+nombre de processus sont mesurés le débit en lignes par seconde et le pic de
+mémoire allouée par le processus principal (tracemalloc), qui doit rester
+borné par la taille des blocs et non par celle du jeu de données. Le résultat
+est comparé au fil de l'envoi à une prédiction directe, sans être conservé.
+
+Nécessite scikit-learn, joblib, numpy et pandas.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/batch_scoring.py --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+import joblib
+import numpy
+import pandas
+from sklearn.ensemble import RandomForestClassifier
+
+from app.models.schemas import ExecutionStatus, ModelFramework
+from app.services import artifact_cache, batch_scoring, minio_client
+from benchmarks.fakes import FakeMinio, InMemoryDatabase
+
+MIB = 1024 * 1024
+
+
+class CheckingMinio(FakeMinio):
+    """FakeMinio qui vérifie la colonne prediction des résultats reçus au lieu de les stocker."""
+
+    def __init__(self):
+        super().__init__()
+        self.expected = None
+        self.rows = 0
+        self.mismatches = 0
+
+    def put_object(self, bucket_name, object_name, data, length=-1, part_size=0, **kwargs):
+        if bucket_name != "results":
+            return super().put_object(bucket_name, object_name, data, length, part_size=part_size, **kwargs)
+        self.rows = self.mismatches = 0
+        header = True
+        pending = b""
+        while True:
+            chunk = data.read(part_size or 5 * MIB)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if header:
+                    header = False
+                    continue
+                if line.rsplit(b",", 1)[-1].decode() != str(self.expected[self.rows]):
+                    self.mismatches += 1
+                self.rows += 1
+        return super().put_object(bucket_name, object_name, io.BytesIO(b""), 0)
+
+
+async def run_case(db, model, rows, workers):
+    if batch_scoring.executor is not None:
+        batch_scoring.executor.shutdown()
+        batch_scoring.executor = None
+    batch_scoring.BATCH_SCORING_WORKERS = workers
+    batch_scoring.BATCH_SCORING_MAX_PENDING = 2 * workers
+
+    execution_id = ObjectId()
+    await db.executions.insert_one({
+        "_id": execution_id, "status": ExecutionStatus.RUNNING, "created_at": datetime.now(),
+        "log_lines": 0, "log_bytes": 0,
+    })
+    # Démarrage du pool hors mesure
+    await asyncio.get_running_loop().run_in_executor(batch_scoring.get_executor(), int)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await batch_scoring.start_scoring_job(db, execution_id, model, {"input_path": "bench/input.csv"})
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    execution = await db.executions.find_one({"_id": execution_id})
+    if execution["status"] != ExecutionStatus.SUCCESS:
+        raise SystemExit(f"Exécution en échec avec {workers} processus")
+    return rows / elapsed, peak
+
+
+async def run(args):
+    rng = numpy.random.RandomState(0)
+    train = pandas.DataFrame(rng.normal(size=(5000, args.features)), columns=[f"x{i}" for i in range(args.features)])
+    estimator = RandomForestClassifier(n_estimators=args.trees, random_state=0).fit(train, train["x0"] > 0)
+    buffer = io.BytesIO()
+    joblib.dump(estimator, buffer)
+
+    fake = CheckingMinio()
+    for bucket in minio_client.BUCKETS:
+        fake.make_bucket(bucket)
+    fake.put_object("models", "bench/model.joblib", io.BytesIO(buffer.getvalue()), len(buffer.getvalue()))
+    dataset = pandas.DataFrame(rng.normal(size=(args.rows, args.features)), columns=train.columns)
+    data = dataset.to_csv(index=False).encode()
+    fake.put_object("datasets", "bench/input.csv", io.BytesIO(data), len(data))
+    minio_client.minio_client = fake
+    fake.expected = estimator.predict(dataset)
+    del dataset
+
+    batch_scoring.BATCH_SCORING_CHUNK_BYTES = args.chunk_mib * MIB
+    model = {
+        "_id": ObjectId(),
+        "framework": ModelFramework.SCIKIT_LEARN,
+        "file_path": "bench/model.joblib",
+        "file_name": "model.joblib",
+    }
+    db = InMemoryDatabase()
+
+    with tempfile.TemporaryDirectory() as directory:
+        artifact_cache.artifact_cache = artifact_cache.ArtifactDiskCache(directory)
+        print(f"{args.rows} lignes ({len(data) / MIB:.1f} Mio), blocs de {args.chunk_mib} Mio, "
+              f"{os.cpu_count()} cœur(s)\n")
+        print(f"{'processus':>10} {'lignes/s':>12} {'accélération':>13} {'pic mémoire':>12}")
+        reference = None
+        for workers in args.workers:
+            throughput, peak = await run_case(db, model, args.rows, workers)
+            if fake.rows != args.rows or fake.mismatches:
+                raise SystemExit(f"Prédictions différentes de l'appel direct ({workers} processus)")
+            reference = reference or throughput
+            print(f"{workers:>10} {throughput:>12.0f} {throughput / reference:>12.2f}x {peak / MIB:>8.1f} Mio")
+
+    if batch_scoring.executor is not None:
+        batch_scoring.executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--trees", type=int, default=20)
+    parser.add_argument("--chunk-mib", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,874 @@
+"""
+Substituts locaux des dépendances de l'API pour les benchmarks.
+
+`InMemoryDatabase` imite l'interface Motor utilisée par l'application
+(collections asynchrones, curseurs avec tri/saut/limite, opérateurs de requête
+et de mise à jour courants, agrégations simples) et compte chaque aller-retour
+vers la base. `FakeMinio` reprend les méthodes du SDK MinIO sur un stockage en
+mémoire et `FakeAirflow` simule l'API REST d'Airflow derrière un
+`httpx.MockTransport`.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+import asyncio
+import copy
+import hashlib
+import io
+import json
+import os
+import re
+import time
+
+from bson import ObjectId
+from minio.datatypes import Part
+from minio.error import S3Error
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import httpx
+
+
+# ---------------------------------------------------------------------------
+# Évaluation des requêtes
+# ---------------------------------------------------------------------------
+
+_MISSING = object()
+
+
+def _get_path(document, path):
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _compare(value, op, operand):
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+        if op == "$gt":
+            return value > operand
+        return value >= operand
+    except TypeError:
+        return False
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$eq" and not _match_condition(value, operand):
+                return False
+            elif op == "$ne" and _match_condition(value, operand):
+                return False
+            elif op == "$in" and not any(_match_condition(value, item) for item in operand):
+                return False
+            elif op == "$nin" and any(_match_condition(value, item) for item in operand):
+                return False
+            elif op in ("$lt", "$lte", "$gt", "$gte") and not _compare(value, op, operand):
+                return False
+            elif op == "$exists" and (value is not _MISSING) != bool(operand):
+                return False
+            elif op == "$regex" and not (isinstance(value, str) and re.search(operand, value)):
+                return False
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    if value is _MISSING:
+        return condition is None
+    return value == condition
+
+
+def matches(document, query):
+    """Indique si un document satisfait une requête MongoDB simple."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(document, key), condition):
+            return False
+    return True
+
+
+def project(document, projection):
+    """Applique une projection d'inclusion ou d'exclusion."""
+    if not projection:
+        return copy.deepcopy(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: copy.deepcopy(v) for k, v in document.items() if k in include}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    exclude = {k for k, v in projection.items() if not v}
+    return {k: copy.deepcopy(v) for k, v in document.items() if k not in exclude}
+
+
+def _sort_key(value):
+    # Ordre de tri BSON simplifié : absent/None < nombres < chaînes < autres
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (4, value.binary)
+    return (3, value)
+
+
+# ---------------------------------------------------------------------------
+# Application des mises à jour
+# ---------------------------------------------------------------------------
+
+def _set_path(document, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _unset_path(document, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part, {})
+    document.pop(parts[-1], None)
+
+
+def apply_update(document, update, inserting=False):
+    """Applique un document de mise à jour MongoDB sur place."""
+    for op, fields in update.items():
+        for path, value in fields.items():
+            current = _get_path(document, path)
+            if op == "$set":
+                _set_path(document, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(document, path)
+            elif op == "$inc":
+                _set_path(document, path, (0 if current is _MISSING else current) + value)
+            elif op == "$min":
+                if current is _MISSING or value < current:
+                    _set_path(document, path, value)
+            elif op == "$max":
+                if current is _MISSING or value > current:
+                    _set_path(document, path, value)
+            elif op == "$push":
+                items = list(current) if current is not _MISSING else []
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                    sort = value.get("$sort")
+                    if isinstance(sort, dict):
+                        for field, direction in reversed(list(sort.items())):
+                            items.sort(key=lambda item: _sort_key(item.get(field)), reverse=direction < 0)
+                    if "$slice" in value:
+                        size = value["$slice"]
+                        items = items[size:] if size < 0 else items[:size]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(document, path, items)
+            elif op == "$addToSet":
+                items = list(current) if current is not _MISSING else []
+                values = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                items.extend(v for v in values if v not in items)
+                _set_path(document, path, items)
+            else:
+                raise NotImplementedError(f"Opérateur de mise à jour non supporté: {op}")
+
+
+# ---------------------------------------------------------------------------
+# Pipelines d'agrégation (sous-ensemble utilisé par l'application)
+# ---------------------------------------------------------------------------
+
+def _evaluate_expression(document, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            op, operand = next(iter(expression.items()))
+            if op == "$dateToString":
+                date = _evaluate_expression(document, operand["date"])
+                return date.strftime(operand["format"]) if date is not None else None
+            if op == "$ifNull":
+                value = _evaluate_expression(document, operand[0])
+                return _evaluate_expression(document, operand[1]) if value is None else value
+            if op.startswith("$"):
+                raise NotImplementedError(f"Expression d'agrégation non supportée: {op}")
+        return {key: _evaluate_expression(document, value) for key, value in expression.items()}
+    return expression
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def _group(documents, spec):
+    groups = {}
+    for document in documents:
+        key = _evaluate_expression(document, spec["_id"])
+        groups.setdefault(_hashable(key), (key, []))[1].append(document)
+
+    results = []
+    for key, members in groups.values():
+        result = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            op, expression = next(iter(accumulator.items()))
+            values = [_evaluate_expression(member, expression) for member in members]
+            if op == "$sum":
+                result[field] = sum(v for v in values if isinstance(v, (int, float)))
+            elif op == "$avg":
+                numbers = [v for v in values if isinstance(v, (int, float))]
+                result[field] = sum(numbers) / len(numbers) if numbers else None
+            elif op == "$min":
+                result[field] = min((v for v in values if v is not None), default=None)
+            elif op == "$max":
+                result[field] = max((v for v in values if v is not None), default=None)
+            elif op == "$first":
+                result[field] = values[0] if values else None
+            elif op == "$last":
+                result[field] = values[-1] if values else None
+            elif op == "$push":
+                result[field] = values
+            else:
+                raise NotImplementedError(f"Accumulateur non supporté: {op}")
+        results.append(result)
+    return results
+
+
+def run_pipeline(documents, pipeline):
+    """Exécute un pipeline d'agrégation simple sur une liste de documents."""
+    documents = [copy.deepcopy(d) for d in documents]
+    for stage in pipeline:
+        name, spec = next(iter(stage.items()))
+        if name == "$match":
+            documents = [d for d in documents if matches(d, spec)]
+        elif name == "$group":
+            documents = _group(documents, spec)
+        elif name == "$facet":
+            documents = [{field: run_pipeline(documents, sub) for field, sub in spec.items()}]
+        elif name == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                documents.sort(key=lambda d: _sort_key(_get_path(d, field)), reverse=direction < 0)
+        elif name == "$skip":
+            documents = documents[spec:]
+        elif name == "$limit":
+            documents = documents[:spec]
+        elif name == "$project":
+            documents = [project(d, spec) for d in documents]
+        elif name == "$count":
+            documents = [{spec: len(documents)}] if documents else []
+        else:
+            raise NotImplementedError(f"Étape d'agrégation non supportée: {name}")
+    return documents
+
+
+# ---------------------------------------------------------------------------
+# Résultats d'opérations
+# ---------------------------------------------------------------------------
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class BulkWriteResult:
+    def __init__(self, matched_count, modified_count):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+
+
+# ---------------------------------------------------------------------------
+# Curseurs, collections et base
+# ---------------------------------------------------------------------------
+
+class InMemoryCursor:
+    """Curseur asynchrone évalué paresseusement, à la manière de Motor."""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=None):
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction or 1)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _evaluate(self):
+        self._collection.database.count_operation(self._collection.name, "find")
+        documents = [d for d in self._collection.documents if matches(d, self._query)]
+        for field, direction in reversed(self._sort):
+            documents.sort(key=lambda d: _sort_key(_get_path(d, field)), reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [project(d, self._projection) for d in documents]
+
+    async def to_list(self, length=None):
+        if self._results is None:
+            self._results = self._evaluate()
+        return self._results if length is None else self._results[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in await self.to_list(None):
+            yield document
+
+
+class InMemoryAggregateCursor(InMemoryCursor):
+    """Curseur asynchrone sur le résultat d'un pipeline d'agrégation."""
+
+    def __init__(self, collection, pipeline):
+        super().__init__(collection, {}, None)
+        self._pipeline = pipeline
+
+    def _evaluate(self):
+        self._collection.database.count_operation(self._collection.name, "aggregate")
+        return run_pipeline(self._collection.documents, self._pipeline)
+
+
+class InMemoryCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.documents = []
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    # -- contraintes -------------------------------------------------------
+
+    def _check_unique(self, document, ignore=None):
+        for name, info in self.indexes.items():
+            if not info.get("unique"):
+                continue
+            fields = [field for field, _ in info["key"]]
+            values = [_get_path(document, field) for field in fields]
+            for other in self.documents:
+                if other is ignore:
+                    continue
+                if [_get_path(other, field) for field in fields] == values:
+                    raise DuplicateKeyError(f"E11000 duplicate key error index: {name}")
+
+    def _find_documents(self, query):
+        return [d for d in self.documents if matches(d, query)]
+
+    def _insert(self, document):
+        document.setdefault("_id", ObjectId())
+        stored = copy.deepcopy(document)
+        self._check_unique(stored)
+        self.documents.append(stored)
+        return document["_id"]
+
+    def _update(self, query, update, upsert=False, many=False):
+        targets = self._find_documents(query)
+        if not many:
+            targets = targets[:1]
+        for document in targets:
+            apply_update(document, update)
+            self._check_unique(document, ignore=document)
+        if targets or not upsert:
+            return UpdateResult(len(targets), len(targets))
+        document = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        apply_update(document, update, inserting=True)
+        upserted_id = self._insert(document)
+        return UpdateResult(0, 0, upserted_id)
+
+    # -- lecture -----------------------------------------------------------
+
+    def find(self, query=None, projection=None):
+        return InMemoryCursor(self, query or {}, projection)
+
+    async def find_one(self, query=None, projection=None, *args, **kwargs):
+        self.database.count_operation(self.name, "find_one")
+        for document in self.documents:
+            if matches(document, query or {}):
+                return project(document, projection)
+        return None
+
+    def aggregate(self, pipeline, **kwargs):
+        return InMemoryAggregateCursor(self, pipeline)
+
+    async def count_documents(self, query):
+        self.database.count_operation(self.name, "count_documents")
+        return len(self._find_documents(query))
+
+    # -- écriture ----------------------------------------------------------
+
+    async def insert_one(self, document):
+        self.database.count_operation(self.name, "insert_one")
+        return InsertOneResult(self._insert(document))
+
+    async def insert_many(self, documents, ordered=True):
+        self.database.count_operation(self.name, "insert_many")
+        return InsertManyResult([self._insert(document) for document in documents])
+
+    async def update_one(self, query, update, upsert=False):
+        self.database.count_operation(self.name, "update_one")
+        return self._update(query, update, upsert=upsert)
+
+    async def update_many(self, query, update, upsert=False):
+        self.database.count_operation(self.name, "update_many")
+        return self._update(query, update, upsert=upsert, many=True)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        self.database.count_operation(self.name, "find_one_and_update")
+        targets = self._find_documents(query)
+        if not targets:
+            if not upsert:
+                return None
+            result = self._update(query, update, upsert=True)
+            document = next(d for d in self.documents if d["_id"] == result.upserted_id)
+            return project(document, projection) if return_document == ReturnDocument.AFTER else None
+        document = targets[0]
+        before = project(document, projection)
+        apply_update(document, update)
+        self._check_unique(document, ignore=document)
+        return project(document, projection) if return_document == ReturnDocument.AFTER else before
+
+    async def replace_one(self, query, replacement, upsert=False):
+        self.database.count_operation(self.name, "replace_one")
+        targets = self._find_documents(query)[:1]
+        if targets:
+            document = targets[0]
+            replacement = dict(copy.deepcopy(replacement), _id=document["_id"])
+            document.clear()
+            document.update(replacement)
+            return UpdateResult(1, 1)
+        if not upsert:
+            return UpdateResult(0, 0)
+        document = dict(replacement)
+        if "_id" in query and not isinstance(query["_id"], dict):
+            document.setdefault("_id", query["_id"])
+        return UpdateResult(0, 0, self._insert(document))
+
+    async def delete_one(self, query):
+        self.database.count_operation(self.name, "delete_one")
+        for document in self.documents:
+            if matches(document, query):
+                self.documents.remove(document)
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def find_one_and_delete(self, query, projection=None, **kwargs):
+        self.database.count_operation(self.name, "find_one_and_delete")
+        targets = self._find_documents(query)[:1]
+        if not targets:
+            return None
+        self.documents.remove(targets[0])
+        return project(targets[0], projection)
+
+    async def delete_many(self, query):
+        self.database.count_operation(self.name, "delete_many")
+        targets = self._find_documents(query)
+        for document in targets:
+            self.documents.remove(document)
+        return DeleteResult(len(targets))
+
+    async def bulk_write(self, operations, ordered=True):
+        self.database.count_operation(self.name, "bulk_write")
+        matched = 0
+        for operation in operations:
+            document = operation._doc
+            if isinstance(document, dict) and ("$set" in document or any(k.startswith("$") for k in document)):
+                result = self._update(operation._filter, document, upsert=bool(operation._upsert))
+                matched += result.matched_count
+            else:
+                raise NotImplementedError("Seules les opérations UpdateOne sont supportées")
+        return BulkWriteResult(matched, matched)
+
+    # -- index -------------------------------------------------------------
+
+    async def index_information(self):
+        self.database.count_operation(self.name, "index_information")
+        return copy.deepcopy(self.indexes)
+
+    async def create_index(self, keys, name=None, unique=False, **kwargs):
+        self.database.count_operation(self.name, "create_index")
+        keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        self.indexes[name] = {"key": keys, "unique": unique} if unique else {"key": keys}
+        return name
+
+
+class InMemoryDatabase:
+    """Base MongoDB en mémoire qui compte les allers-retours par collection et par opération."""
+
+    def __init__(self, name="ml-platform"):
+        self.name = name
+        self._collections = {}
+        self.operations = Counter()
+
+    def count_operation(self, collection, operation):
+        self.operations[(collection, operation)] += 1
+
+    @property
+    def round_trips(self):
+        return sum(self.operations.values())
+
+    def reset_counters(self):
+        self.operations.clear()
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self):
+        return list(self._collections)
+
+    async def create_collection(self, name):
+        return self[name]
+
+    async def command(self, command, *args, **kwargs):
+        self.count_operation("admin", command if isinstance(command, str) else next(iter(command)))
+        return {"ok": 1.0}
+
+
+# ---------------------------------------------------------------------------
+# MinIO
+# ---------------------------------------------------------------------------
+
+class FakeObjectStat:
+    def __init__(self, bucket_name, object_name, data, content_type, metadata=None):
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.size = len(data)
+        self.etag = hashlib.md5(data).hexdigest()
+        self.content_type = content_type
+        self.last_modified = datetime.now(timezone.utc)
+        self.metadata = dict(metadata or {})
+        self.version_id = None
+
+
+class FakeWriteResult:
+    def __init__(self, bucket_name, object_name, etag):
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.etag = etag
+        self.version_id = None
+
+
+class FakeListPartsResult:
+    def __init__(self, parts):
+        self.parts = parts
+        self.is_truncated = False
+        self.next_part_number_marker = None
+
+
+class FakeObjectResponse:
+    """Réponse de get_object : lecture en flux d'une tranche de l'objet."""
+
+    def __init__(self, data):
+        self._buffer = io.BytesIO(data)
+        self.data = data
+        self.status = 200
+
+    def read(self, amt=None):
+        return self._buffer.read(-1 if amt is None else amt)
+
+    def stream(self, amt=64 * 1024):
+        while True:
+            chunk = self._buffer.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self._buffer.close()
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """
+    Client MinIO en mémoire reprenant les méthodes du SDK utilisées par l'API.
+
+    `latency` simule le temps réseau de chaque appel et `bandwidth` (octets par
+    seconde et par requête) la durée des transferts ; les attentes sont
+    bloquantes, comme le SDK, et se recouvrent entre threads.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.buckets = {}
+        self.uploads = {}
+        self.calls = Counter()
+        self.bytes_transferred = Counter()
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _transfer(self, direction, size):
+        self.bytes_transferred[direction] += size
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    @staticmethod
+    def _error(code, message, bucket_name, object_name):
+        return S3Error(
+            code, message, f"/{bucket_name}/{object_name}",
+            None, None, None, bucket_name=bucket_name, object_name=object_name,
+        )
+
+    def _get(self, bucket_name, object_name):
+        objects = self.buckets.get(bucket_name)
+        if objects is None or object_name not in objects:
+            raise self._error("NoSuchKey", "Object does not exist", bucket_name, object_name)
+        return objects[object_name]
+
+    def bucket_exists(self, bucket_name):
+        self._call("bucket_exists")
+        return bucket_name in self.buckets
+
+    def make_bucket(self, bucket_name, *args, **kwargs):
+        self._call("make_bucket")
+        self.buckets.setdefault(bucket_name, {})
+
+    def put_object(self, bucket_name, object_name, data, length=-1,
+                   content_type="application/octet-stream", metadata=None, part_size=0, **kwargs):
+        self._call("put_object")
+        chunks = []
+        remaining = length
+        while remaining != 0:
+            size = part_size or 5 * 1024 * 1024
+            if remaining > 0:
+                size = min(size, remaining)
+            chunk = data.read(size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            if remaining > 0:
+                remaining -= len(chunk)
+        payload = b"".join(chunks)
+        self._transfer("upload", len(payload))
+        stat = FakeObjectStat(bucket_name, object_name, payload, content_type, metadata)
+        self.buckets.setdefault(bucket_name, {})[object_name] = (payload, stat)
+        return FakeWriteResult(bucket_name, object_name, stat.etag)
+
+    def fput_object(self, bucket_name, object_name, file_path, content_type="application/octet-stream", **kwargs):
+        with open(file_path, "rb") as f:
+            return self.put_object(bucket_name, object_name, f, os.path.getsize(file_path), content_type, **kwargs)
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0, request_headers=None, **kwargs):
+        self._call("get_object")
+        payload, stat = self._get(bucket_name, object_name)
+        expected = (request_headers or {}).get("If-Match")
+        if expected and expected.strip('"') != stat.etag:
+            raise self._error("PreconditionFailed", "ETag mismatch", bucket_name, object_name)
+        end = offset + length if length else len(payload)
+        self._transfer("download", end - offset)
+        return FakeObjectResponse(payload[offset:end])
+
+    def fget_object(self, bucket_name, object_name, file_path, **kwargs):
+        response = self.get_object(bucket_name, object_name)
+        with open(file_path, "wb") as f:
+            f.write(response.read())
+        return self.stat_object(bucket_name, object_name)
+
+    def stat_object(self, bucket_name, object_name, **kwargs):
+        self._call("stat_object")
+        return self._get(bucket_name, object_name)[1]
+
+    # -- upload multipart (API bas niveau du SDK) -----------------------------
+
+    def _create_multipart_upload(self, bucket_name, object_name, headers):
+        self._call("create_multipart_upload")
+        upload_id = str(ObjectId())
+        self.uploads[upload_id] = {
+            "bucket": bucket_name, "object": object_name, "parts": {},
+            "content_type": (headers or {}).get("Content-Type", "application/octet-stream"),
+        }
+        return upload_id
+
+    def _upload(self, bucket_name, object_name, upload_id):
+        upload = self.uploads.get(upload_id)
+        if upload is None or (upload["bucket"], upload["object"]) != (bucket_name, object_name):
+            raise self._error("NoSuchUpload", "Upload does not exist", bucket_name, object_name)
+        return upload
+
+    def _upload_part(self, bucket_name, object_name, data, headers, upload_id, part_number):
+        self._call("upload_part")
+        upload = self._upload(bucket_name, object_name, upload_id)
+        self._transfer("upload", len(data))
+        upload["parts"][part_number] = bytes(data)
+        return hashlib.md5(data).hexdigest()
+
+    def _list_parts(self, bucket_name, object_name, upload_id, part_number_marker=None, **kwargs):
+        self._call("list_parts")
+        upload = self._upload(bucket_name, object_name, upload_id)
+        parts = [
+            Part(number, hashlib.md5(data).hexdigest(), size=len(data))
+            for number, data in sorted(upload["parts"].items())
+        ]
+        return FakeListPartsResult(parts)
+
+    def _complete_multipart_upload(self, bucket_name, object_name, upload_id, parts):
+        self._call("complete_multipart_upload")
+        upload = self._upload(bucket_name, object_name, upload_id)
+        payload = b"".join(upload["parts"][part.part_number] for part in parts)
+        stat = FakeObjectStat(bucket_name, object_name, payload, upload["content_type"])
+        self.buckets.setdefault(bucket_name, {})[object_name] = (payload, stat)
+        del self.uploads[upload_id]
+        return FakeWriteResult(bucket_name, object_name, stat.etag)
+
+    def _abort_multipart_upload(self, bucket_name, object_name, upload_id):
+        self._call("abort_multipart_upload")
+        self.uploads.pop(upload_id, None)
+
+    def remove_object(self, bucket_name, object_name, **kwargs):
+        self._call("remove_object")
+        self.buckets.get(bucket_name, {}).pop(object_name, None)
+
+    def presigned_get_object(self, bucket_name, object_name, expires=None, **kwargs):
+        self._call("presigned_get_object")
+        seconds = int(expires.total_seconds()) if expires is not None else 604800
+        return f"http://minio.local/{bucket_name}/{object_name}?X-Amz-Expires={seconds}&X-Amz-Signature={ObjectId()}"
+
+
+# ---------------------------------------------------------------------------
+# Airflow
+# ---------------------------------------------------------------------------
+
+class FakeAirflow:
+    """
+    API REST Airflow simulée, à brancher sur httpx via `transport()`.
+
+    Les runs déclenchés sont immédiatement listés comme terminés avec l'état
+    `final_state`, ce qui permet au réconciliateur de faire avancer les statuts.
+    """
+
+    def __init__(self, latency=0.0, final_state="success"):
+        self.latency = latency
+        self.final_state = final_state
+        self.runs = {}
+        self.calls = Counter()
+
+    def transport(self):
+        return httpx.MockTransport(self.handler)
+
+    def _run(self, dag_id, dag_run_id, state):
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "dag_id": dag_id,
+            "dag_run_id": dag_run_id,
+            "state": state,
+            "start_date": now,
+            "end_date": now if state in ("success", "failed") else None,
+        }
+
+    async def handler(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        path = request.url.path
+        parts = path.strip("/").split("/")
+        self.calls[f"{request.method} {path if len(parts) < 4 else '/'.join(parts[:3])}"] += 1
+
+        # GET /api/v1/health
+        if request.method == "GET" and path == "/api/v1/health":
+            return httpx.Response(200, json={
+                "metadatabase": {"status": "healthy"}, "scheduler": {"status": "healthy"},
+            })
+
+        # POST /api/v1/dags/~/dagRuns/list
+        if request.method == "POST" and path.endswith("/dags/~/dagRuns/list"):
+            body = json.loads(request.content or b"{}")
+            dag_ids = set(body.get("dag_ids") or [])
+            states = set(body.get("states") or [])
+            runs = [
+                self._run(dag_id, run_id, self.final_state)
+                for (dag_id, run_id) in self.runs
+                if (not dag_ids or dag_id in dag_ids) and (not states or self.final_state in states)
+            ]
+            offset = body.get("page_offset", 0)
+            limit = body.get("page_limit", 100)
+            return httpx.Response(200, json={"dag_runs": runs[offset:offset + limit], "total_entries": len(runs)})
+
+        # /api/v1/dags/{dag_id}/dagRuns[/{run_id}]
+        if len(parts) >= 5 and parts[:3] == ["api", "v1", "dags"] and parts[4] == "dagRuns":
+            dag_id = parts[3]
+            if request.method == "POST" and len(parts) == 5:
+                body = json.loads(request.content or b"{}")
+                run_id = body.get("dag_run_id") or f"manual__{ObjectId()}"
+                self.runs[(dag_id, run_id)] = body.get("conf", {})
+                return httpx.Response(200, json=self._run(dag_id, run_id, "queued"))
+            if request.method == "GET" and len(parts) == 6:
+                if (dag_id, parts[5]) not in self.runs:
+                    return httpx.Response(404, json={"detail": "DAG run not found"})
+                return httpx.Response(200, json=self._run(dag_id, parts[5], self.final_state))
+            if request.method == "GET":
+                runs = [self._run(d, r, self.final_state) for (d, r) in self.runs if d == dag_id]
+                return httpx.Response(200, json={"dag_runs": runs, "total_entries": len(runs)})
+
+        if request.method == "GET" and len(parts) == 4 and parts[:3] == ["api", "v1", "dags"]:
+            return httpx.Response(200, json={"dag_id": parts[3], "is_paused": False})
+        if request.method == "GET" and path.rstrip("/").endswith("/api/v1/dags"):
+            dag_ids = sorted({dag_id for dag_id, _ in self.runs})
+            return httpx.Response(200, json={"dags": [{"dag_id": d} for d in dag_ids], "total_entries": len(dag_ids)})
+
+        return httpx.Response(404, json={"detail": f"Route simulée inconnue: {request.method} {path}"})
@@ -0,0 +1,93 @@
+"""
+Test de charge « rafale de connexions » : bcrypt dans la boucle vs pool de processus.
+
+Une rafale de vérifications bcrypt est envoyée sur /login pendant que des
+requêtes légères interrogent /ping à intervalle régulier. Avec bcrypt exécuté
+dans la boucle d'événements, /ping attend la fin de chaque hachage ; avec
+`services/password_hashing`, sa latence reste stable.
+
+Usage (depuis le répertoire backend) :
+    BCRYPT_ROUNDS=12 python benchmarks/login_storm.py --logins 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from app.services import password_hashing
+
+PING_INTERVAL = 0.02
+
+
+def build_app(hashed_password):
+    app = FastAPI()
+
+    @app.post("/inline/login")
+    async def inline_login():
+        return {"ok": password_hashing.pwd_context.verify("secret", hashed_password)}
+
+    @app.post("/pool/login")
+    async def pool_login():
+        valid, _ = await password_hashing.verify_password("secret", hashed_password)
+        return {"ok": valid}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_mode(client, mode, logins):
+    latencies = []
+    start = time.perf_counter()
+    storm = asyncio.gather(*[client.post(f"/{mode}/login") for _ in range(logins)])
+
+    # Latence mesurée depuis l'instant prévu d'envoi de chaque ping
+    i = 0
+    while not storm.done():
+        scheduled = start + i * PING_INTERVAL
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await client.get("/ping")
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        i += 1
+    await storm
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{mode:>6}: {logins / elapsed:6.1f} connexions/s  "
+        f"ping p50={statistics.median(latencies):7.1f}ms p99={percentile(latencies, 99):7.1f}ms "
+        f"({len(latencies)} pings)"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    hashed_password = await password_hashing.hash_password("secret")
+    app = build_app(hashed_password)
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        for mode in ("inline", "pool"):
+            await run_mode(client, mode, args.logins)
+    print(f"métriques du pool: {password_hashing.get_hashing_metrics()}")
+    password_hashing.shutdown_hashing_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
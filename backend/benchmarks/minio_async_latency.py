@@ -0,0 +1,120 @@
+"""
+Benchmark de latence : appels MinIO synchrones vs façade asynchrone.
+
+Des transferts « lourds » (simulés par un client MinIO qui bloque le thread
+appelant) sont lancés en parallèle de requêtes légères sur /ping. Avec les
+appels synchrones, la latence de /ping suit la durée des transferts ; avec la
+façade `minio_async`, elle reste plate.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/minio_async_latency.py --transfers 8 --transfer-seconds 0.5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from app.services import minio_async, minio_client
+
+
+class SlowMinio:
+    """Client MinIO factice dont les transferts bloquent le thread appelant."""
+
+    def __init__(self, transfer_seconds):
+        self.transfer_seconds = transfer_seconds
+
+    def fput_object(self, bucket_name, object_name, file_path, **kwargs):
+        time.sleep(self.transfer_seconds)
+
+    def fget_object(self, bucket_name, object_name, file_path, **kwargs):
+        time.sleep(self.transfer_seconds)
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.post("/sync/upload")
+    async def sync_upload():
+        minio_client.upload_file("models", "bench/object", "/dev/null")
+        return {"ok": True}
+
+    @app.post("/async/upload")
+    async def async_upload():
+        await minio_async.upload_file("models", "bench/object", "/dev/null")
+        return {"ok": True}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+PING_INTERVAL = 0.01
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(client, mode, transfers, pings):
+    latencies = []
+
+    start = time.perf_counter()
+
+    async def probe():
+        # Latence mesurée depuis l'instant prévu d'envoi, pour ne pas masquer
+        # le temps passé bloqué par la boucle d'événements.
+        for i in range(pings):
+            scheduled = start + i * PING_INTERVAL
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await client.get("/ping")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+
+    await asyncio.gather(
+        probe(),
+        *[client.post(f"/{mode}/upload") for _ in range(transfers)],
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 3),
+        "ping_p50_ms": round(statistics.median(latencies), 2),
+        "ping_p99_ms": round(percentile(latencies, 99), 2),
+        "ping_max_ms": round(max(latencies), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transfers", type=int, default=8)
+    parser.add_argument("--transfer-seconds", type=float, default=0.5)
+    parser.add_argument("--pings", type=int, default=50)
+    args = parser.parse_args()
+
+    minio_client.minio_client = SlowMinio(args.transfer_seconds)
+    app = build_app()
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for mode in ("sync", "async"):
+            result = await run_mode(client, mode, args.transfers, args.pings)
+            print(
+                f"{result['mode']:>5}: total={result['elapsed_s']}s "
+                f"ping p50={result['ping_p50_ms']}ms p99={result['ping_p99_ms']}ms "
+                f"max={result['ping_max_ms']}ms"
+            )
+    minio_async.shutdown_minio_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Latence et débit de la prédiction synchrone, avec et sans regroupement en lots.
+
+Un modèle scikit-learn est entraîné sur des données synthétiques, enregistré
+avec joblib dans `FakeMinio` puis servi par `app.services.model_server`, comme
+le fait la route `POST /api/deployments/{id}/predict`. Des clients simultanés
+envoient chacun une ligne par requête. Sans regroupement, chaque requête est un
+appel au modèle ; avec regroupement, les requêtes arrivées pendant un appel en
+cours partent ensemble dans le suivant. Les prédictions sont comparées à celles
+d'un appel direct au modèle.
+
+Nécessite scikit-learn, joblib et numpy.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/predictions.py --requests 2000 --concurrency 1 16 64
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+import joblib
+import numpy
+from sklearn.ensemble import RandomForestClassifier
+
+from app.models.schemas import ModelFramework
+from app.services import artifact_cache, minio_client, model_server
+from benchmarks.fakes import FakeMinio
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def train(features, trees):
+    rng = numpy.random.RandomState(0)
+    x = rng.normal(size=(2000, features))
+    y = (x[:, 0] + x[:, 1] > 0).astype(int)
+    return RandomForestClassifier(n_estimators=trees, random_state=0).fit(x, y), rng
+
+
+async def run_case(model, rows, concurrency):
+    latencies = []
+    results = [None] * len(rows)
+    position = iter(range(len(rows)))
+
+    async def worker():
+        for i in position:
+            start = time.perf_counter()
+            results[i] = (await model_server.predict(model, [rows[i]]))[0]
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return results, latencies, elapsed
+
+
+async def run(args):
+    estimator, rng = train(args.features, args.trees)
+    buffer = io.BytesIO()
+    joblib.dump(estimator, buffer)
+    data = buffer.getvalue()
+
+    fake = FakeMinio()
+    fake.make_bucket("models")
+    fake.put_object("models", "bench/model.joblib", io.BytesIO(data), len(data))
+    minio_client.minio_client = fake
+
+    rows = rng.normal(size=(args.requests, args.features))
+    expected = estimator.predict(rows).tolist()
+    rows = rows.tolist()
+    model = {
+        "_id": ObjectId(),
+        "framework": ModelFramework.SCIKIT_LEARN,
+        "file_path": "bench/model.joblib",
+        "file_name": "model.joblib",
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        artifact_cache.artifact_cache = artifact_cache.ArtifactDiskCache(directory)
+        start = time.perf_counter()
+        await model_server.get_batcher(model)
+        print(f"Modèle de {len(data) / 1024:.0f} Kio chargé en {(time.perf_counter() - start) * 1000:.1f} ms, "
+              f"{model_server.PREDICT_WORKERS} thread(s) de prédiction\n")
+
+        print(f"{'mode':>12} {'concurrence':>12} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>9} {'lignes/lot':>11}")
+        for concurrency in args.concurrency:
+            for mode, max_rows in (("sans lots", 0), ("avec lots", args.max_batch_rows)):
+                model_server.PREDICT_MAX_BATCH_ROWS = max_rows
+                model_server.PREDICT_MODEL_CONCURRENCY = (
+                    model_server.PREDICT_WORKERS if max_rows == 0 else args.model_concurrency
+                )
+                before = dict(model_server.metrics)
+                results, latencies, elapsed = await run_case(model, rows, concurrency)
+                if results != expected:
+                    raise SystemExit(f"Prédictions différentes de l'appel direct ({mode}, concurrence {concurrency})")
+                batches = model_server.metrics["batches"] - before["batches"]
+                print(f"{mode:>12} {concurrency:>12} {percentile(latencies, 50) * 1000:>8.2f} "
+                      f"{percentile(latencies, 95) * 1000:>8.2f} {len(rows) / elapsed:>9.0f} "
+                      f"{len(rows) / batches:>11.1f}")
+    model_server.shutdown_model_server()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--trees", type=int, default=50)
+    parser.add_argument("--max-batch-rows", type=int, default=model_server.PREDICT_MAX_BATCH_ROWS)
+    parser.add_argument("--model-concurrency", type=int, default=model_server.PREDICT_MODEL_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
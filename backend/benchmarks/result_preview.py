@@ -0,0 +1,112 @@
+"""
+Coût d'un aperçu des résultats d'une exécution selon sa position dans le fichier.
+
+Un résultat CSV synthétique est écrit dans `FakeMinio` bloc par bloc, avec
+l'index de positions construit comme par le scoring local. Pour plusieurs
+positions sont mesurés les octets lus et la durée d'une page de 50 lignes :
+lecture indexée, lecture séquentielle sans index (résultats d'Airflow,
+refusée au-delà de PREVIEW_MAX_SEQUENTIAL_OFFSET) et, comme référence, le
+téléchargement complet du fichier qu'effectuait le frontend. `FakeMinio` simule une latence par requête et un débit par
+connexion. Chaque page est comparée au contenu attendu.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/result_preview.py --rows 1000000 --offsets 0 500000 999950
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import minio_client, result_preview
+from benchmarks.fakes import FakeMinio, InMemoryDatabase
+
+MIB = 1024 * 1024
+EXECUTION_ID = "bench"
+RESULT_PATH = "bench/predictions.csv"
+
+
+def write_result(fake, rows, block_rows):
+    """Écrit le CSV par blocs et construit son index comme le scoring local."""
+    builder = result_preview.CsvIndexBuilder()
+    blocks = []
+    for start in range(0, rows, block_rows):
+        lines = ["id,feature,prediction\n"] if start == 0 else []
+        count = min(block_rows, rows - start)
+        lines.extend(f"{i},{i * 0.5:.3f},{i % 3}\n" for i in range(start, start + count))
+        data = "".join(lines).encode()
+        builder.add(data, count, result_preview.block_line_offsets(data, count, skip_header=start == 0))
+        blocks.append(data)
+    data = b"".join(blocks)
+    result = fake.put_object("results", RESULT_PATH, io.BytesIO(data), len(data))
+    return data, result.etag, builder
+
+
+def expected_page(offset, limit, rows):
+    return [[str(i), f"{i * 0.5:.3f}", str(i % 3)] for i in range(offset, min(offset + limit, rows))]
+
+
+async def measure(db, fake, offset, limit, rows, indexed):
+    if not indexed:
+        await db[result_preview.RESULT_INDEXES_COLLECTION].delete_one({"_id": EXECUTION_ID})
+    before = fake.bytes_transferred["download"]
+    start = time.perf_counter()
+    page = await result_preview.preview(db, EXECUTION_ID, RESULT_PATH, offset, limit)
+    elapsed = time.perf_counter() - start
+    if page["rows"] != expected_page(offset, limit, rows):
+        raise SystemExit(f"Page différente du contenu attendu (position {offset})")
+    return fake.bytes_transferred["download"] - before, elapsed
+
+
+def full_download(fake):
+    before = fake.bytes_transferred["download"]
+    start = time.perf_counter()
+    response = fake.get_object("results", RESULT_PATH)
+    list(csv.reader(io.StringIO(response.read().decode())))
+    return fake.bytes_transferred["download"] - before, time.perf_counter() - start
+
+
+async def run(args):
+    fake = FakeMinio(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mibps * MIB)
+    fake.make_bucket("results")
+    minio_client.minio_client = fake
+    data, etag, builder = write_result(fake, args.rows, args.block_rows)
+    db = InMemoryDatabase()
+
+    print(f"{args.rows} lignes ({len(data) / MIB:.1f} Mio), index de {len(builder.offsets)} entrées, "
+          f"latence {args.latency_ms} ms, {args.bandwidth_mibps} Mio/s\n")
+    size, elapsed = full_download(fake)
+    print(f"{'téléchargement complet':>24} {size / 1024:>12.0f} Kio {elapsed * 1000:>10.1f} ms")
+    print(f"\n{'position':>10} {'mode':>13} {'lus':>16} {'durée':>13}")
+    for offset in args.offsets:
+        for indexed in (True, False):
+            if indexed:
+                await result_preview.save_csv_index(db, EXECUTION_ID, RESULT_PATH, etag, builder)
+            mode = "indexé" if indexed else "séquentiel"
+            try:
+                size, elapsed = await measure(db, fake, offset, args.limit, args.rows, indexed)
+            except result_preview.PreviewInputError:
+                print(f"{offset:>10} {mode:>13} {'refusé (400)':>33}")
+                continue
+            print(f"{offset:>10} {mode:>13} {size / 1024:>12.0f} Kio {elapsed * 1000:>10.1f} ms")
+    minio_client.minio_client = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--block-rows", type=int, default=50000, help="lignes par bloc écrit")
+    parser.add_argument("--offsets", type=int, nargs="+", default=[0, 250000, 499950])
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--bandwidth-mibps", type=float, default=100.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Mesure le coût de sérialisation des réponses de liste.
+
+Compare, pour des pages de 100 et 1 000 documents, le chemin historique
+(conversion des ObjectId, validation par `response_model` puis `jsonable_encoder`
+et encodage json standard, comme le fait FastAPI) au chemin rapide
+(`OutputSchema` + orjson). Les documents sont générés localement, aucun service
+n'est nécessaire.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/serialization.py --sizes 100 1000 --repeat 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+
+from app.models.schemas import Deployment, Execution, Model, ModelStatus, ExecutionStatus
+from app.services.serialization import FastJSONResponse, OutputSchema
+
+def make_models(count):
+    now = datetime.now()
+    return [{
+        "_id": ObjectId(), "name": f"model-{i}", "description": "modèle de démonstration",
+        "type": "classification", "framework": "scikit-learn", "version": "1.0.0",
+        "tags": ["demo", "ventes"], "parameters": {"alpha": 0.1, "max_depth": 8}, "metadata": {"auc": 0.91},
+        "owner_id": "owner", "department": "ventes", "region": "eu", "status": ModelStatus.READY,
+        "file_path": f"models/{i}/model.pkl", "file_size": 1024 * i, "file_sha256": "0" * 64,
+        "created_at": now - timedelta(minutes=i), "updated_at": now,
+    } for i in range(count)]
+
+def make_deployments(count):
+    now = datetime.now()
+    return [{
+        "_id": ObjectId(), "model_id": str(ObjectId()), "name": f"deployment-{i}", "description": None,
+        "parameters": {"batch_size": 500}, "schedule": "0 * * * *", "owner_id": "owner",
+        "status": "completed", "dag_id": f"model_{i}", "dag_run_id": f"run_{i}",
+        "created_at": now - timedelta(minutes=i), "updated_at": now,
+    } for i in range(count)]
+
+def make_executions(count):
+    now = datetime.now()
+    return [{
+        "_id": ObjectId(), "deployment_id": str(ObjectId()), "model_id": str(ObjectId()),
+        "owner_id": "owner", "parameters": {}, "status": ExecutionStatus.SUCCESS,
+        "dag_id": f"model_{i}", "dag_run_id": f"run_{i}", "start_time": now, "end_time": now,
+        "result_path": f"results/{i}.csv", "log_lines": 200, "log_bytes": 8000,
+        "created_at": now - timedelta(minutes=i),
+    } for i in range(count)]
+
+DATASETS = {
+    "models": (Model, make_models),
+    "deployments": (Deployment, make_deployments),
+    "executions": (Execution, make_executions),
+}
+
+def legacy(documents, schema):
+    """Chemin d'origine : conversion des ObjectId puis traitement de response_model par FastAPI."""
+    documents = [dict(document) for document in documents]
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    validated = parse_obj_as(List[schema], documents)
+    content = jsonable_encoder(validated, by_alias=True)
+    return JSONResponse(content).body
+
+def fast(documents, output):
+    """Chemin rapide : mise en forme par OutputSchema et encodage orjson."""
+    return FastJSONResponse(output.dump_many(documents)).body
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'collection':<12} {'taille':>7} {'historique':>12} {'rapide':>10} {'gain':>7}")
+    for name, (schema, make) in DATASETS.items():
+        output = OutputSchema(schema)
+        for size in args.sizes:
+            documents = make(size)
+            # Les deux chemins doivent produire le même JSON
+            if json.loads(legacy(documents, schema)) != json.loads(fast(documents, output)):
+                raise SystemExit(f"Sorties différentes pour {name} ({size} documents)")
+            legacy_ms = measure(lambda: legacy(documents, schema), args.repeat)
+            fast_ms = measure(lambda: fast(documents, output), args.repeat)
+            print(f"{name:<12} {size:>7} {legacy_ms:>10.2f}ms {fast_ms:>8.2f}ms {legacy_ms / fast_ms:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Débit des transferts de fichiers MinIO selon la taille des parts et la concurrence.
+
+Les fonctions `upload_file` et `download_file` de minio_client sont exécutées
+contre `FakeMinio`, qui simule une latence par requête et un débit par
+connexion : les gains viennent, comme avec un vrai serveur, du recouvrement des
+requêtes. Le transfert en flux unique (une part plus grande que le fichier) sert
+de référence. Un dernier scénario interrompt chaque transfert à mi-parcours
+puis le relance, et mesure le volume renvoyé à la reprise.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/transfers.py --size-mib 128 --part-sizes 8 16 64 --concurrency 1 4 8
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import minio_client
+from benchmarks.fakes import FakeMinio
+
+MIB = 1024 * 1024
+BUCKET = "models"
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(MIB), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_case(fake, source, target, size, part_size, concurrency, expected):
+    object_name = f"bench/{part_size}-{concurrency}"
+    upload = timed(minio_client.upload_file, BUCKET, object_name, source,
+                   part_size=part_size, concurrency=concurrency)
+    download = timed(minio_client.download_file, BUCKET, object_name, target,
+                     part_size=part_size, concurrency=concurrency)
+    if sha256_file(target) != expected:
+        raise SystemExit(f"Contenu téléchargé différent (part {part_size}, concurrence {concurrency})")
+    os.remove(target)
+    fake.remove_object(BUCKET, object_name)
+    return size / MIB / upload, size / MIB / download
+
+
+class Interrupted(Exception):
+    pass
+
+
+def fail_after(fake, method_name, calls):
+    """Fait échouer la méthode du client après `calls` appels réussis."""
+    original = getattr(fake, method_name)
+    state = {"calls": 0}
+
+    def method(*args, **kwargs):
+        state["calls"] += 1
+        if state["calls"] > calls:
+            raise Interrupted("coupure simulée")
+        return original(*args, **kwargs)
+
+    setattr(fake, method_name, method)
+    return lambda: setattr(fake, method_name, original)
+
+
+def run_resume(fake, source, target, size, part_size, concurrency, expected):
+    parts = -(-size // part_size)
+    object_name = "bench/resume"
+
+    # Upload interrompu après la moitié des parts, puis relancé
+    restore = fail_after(fake, "_upload_part", parts // 2)
+    try:
+        minio_client.upload_file(BUCKET, object_name, source, part_size=part_size, concurrency=concurrency)
+    except Interrupted:
+        pass
+    restore()
+    before = fake.bytes_transferred["upload"]
+    minio_client.upload_file(BUCKET, object_name, source, part_size=part_size, concurrency=concurrency)
+    resent_upload = fake.bytes_transferred["upload"] - before
+
+    # Téléchargement interrompu de la même façon
+    restore = fail_after(fake, "get_object", parts // 2)
+    try:
+        minio_client.download_file(BUCKET, object_name, target, part_size=part_size, concurrency=concurrency)
+    except Interrupted:
+        pass
+    restore()
+    before = fake.bytes_transferred["download"]
+    minio_client.download_file(BUCKET, object_name, target, part_size=part_size, concurrency=concurrency)
+    resent_download = fake.bytes_transferred["download"] - before
+
+    if sha256_file(target) != expected:
+        raise SystemExit("Contenu différent après reprise")
+    os.remove(target)
+    return resent_upload / size, resent_download / size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mib", type=int, default=128)
+    parser.add_argument("--part-sizes", type=int, nargs="+", default=[8, 16, 64], help="tailles de part en Mio")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="latence simulée par requête")
+    parser.add_argument("--bandwidth-mibps", type=float, default=100.0, help="débit simulé par connexion")
+    args = parser.parse_args()
+
+    size = args.size_mib * MIB
+    fake = FakeMinio(latency=args.latency_ms / 1000, bandwidth=args.bandwidth_mibps * MIB)
+    fake.make_bucket(BUCKET)
+    minio_client.minio_client = fake
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.bin")
+        target = os.path.join(directory, "target.bin")
+        with open(source, "wb") as f:
+            for _ in range(args.size_mib):
+                f.write(os.urandom(MIB))
+        expected = sha256_file(source)
+
+        print(f"Fichier de {args.size_mib} Mio, latence {args.latency_ms} ms, "
+              f"{args.bandwidth_mibps} Mio/s par connexion\n")
+        print(f"{'part':>8} {'concurrence':>12} {'upload':>12} {'download':>12}")
+        up, down = run_case(fake, source, target, size, size + 1, 1, expected)
+        print(f"{'unique':>8} {1:>12} {up:>8.1f} Mio/s {down:>8.1f} Mio/s")
+        for part_mib in args.part_sizes:
+            for concurrency in args.concurrency:
+                up, down = run_case(fake, source, target, size, part_mib * MIB, concurrency, expected)
+                print(f"{part_mib:>5} Mio {concurrency:>12} {up:>8.1f} Mio/s {down:>8.1f} Mio/s")
+
+        part_size = min(args.part_sizes) * MIB
+        concurrency = max(args.concurrency)
+        resent_upload, resent_download = run_resume(fake, source, target, size, part_size, concurrency, expected)
+        print(f"\nReprise après interruption à mi-transfert (part {min(args.part_sizes)} Mio) : "
+              f"{resent_upload:.0%} du fichier renvoyé à l'upload, {resent_download:.0%} au download")
+
+
+if __name__ == "__main__":
+    main()
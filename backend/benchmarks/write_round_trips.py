@@ -0,0 +1,132 @@
+"""
+Compteur d'allers-retours MongoDB des routes d'écriture.
+
+Chaque route de création et de mise à jour (modèles, déploiements,
+utilisateurs) est appelée contre une base en mémoire qui compte les opérations ;
+le script échoue si l'une d'elles dépasse le budget autorisé. Les écritures
+annexes (numéro de version de la collection pour les caches et les ETags,
+compteurs du tableau de bord, références de l'index des artefacts) sont
+comptées à part.
+
+Usage (depuis le répertoire backend) :
+    python benchmarks/write_round_trips.py --max-operations 2
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import UploadFile
+
+from app.api import deployments, models, users
+from app.services import artifacts
+from app.models.schemas import (
+    DeploymentCreate, DeploymentUpdate, ModelCreate, ModelUpdate, UserCreate, UserUpdate,
+)
+from app.services.collection_versions import VERSIONS_COLLECTION
+from app.services.stats import STATS_COLLECTION
+from benchmarks.fakes import InMemoryDatabase
+
+
+async def fake_stream_upload(bucket_name, object_name, chunks, content_type=None, **kwargs):
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+    return {"size": size, "sha256": "0" * 64, "etag": "etag"}
+
+
+async def fake_trigger_dag(dag_id, conf=None):
+    return {"dag_run_id": f"run_{dag_id}"}
+
+
+async def fake_hash_password(password):
+    return f"hashed:{password}"
+
+
+async def seed(db):
+    now = datetime.now()
+    admin = {
+        "_id": ObjectId(), "username": "admin", "email": "admin@example.com",
+        "role": "admin", "is_active": True, "hashed_password": "x",
+        "created_at": now, "updated_at": now,
+    }
+    await db.users.insert_one(dict(admin))
+    await db.users.create_index("username", name="users_username_unique", unique=True)
+    del admin["hashed_password"]
+    return admin
+
+
+async def run(max_operations):
+    artifacts.stream_upload = fake_stream_upload
+    deployments.trigger_dag = fake_trigger_dag
+    users.hash_password = fake_hash_password
+
+    db = InMemoryDatabase()
+    admin = await seed(db)
+    results = []
+
+    async def measure(name, route, *args, **kwargs):
+        # Les routes sont appelées directement, comme le ferait FastAPI après validation
+        db.reset_counters()
+        response = await route(*args, db=db, **kwargs)
+        results.append((name, db.round_trips, dict(db.operations)))
+        return response
+
+    model = await measure(
+        "create_model", models.create_model,
+        model_data=ModelCreate(
+            name="m", type="classification", framework="scikit-learn",
+            owner_id=str(admin["_id"]), department="ops", region="eu",
+        ),
+        model_file=UploadFile(filename="model.pkl", file=io.BytesIO(b"x" * 1024)),
+    )
+    await measure(
+        "update_model", models.update_model, model["_id"], ModelUpdate(description="v2"),
+    )
+
+    deployment = await measure(
+        "create_deployment", deployments.create_deployment,
+        DeploymentCreate(model_id=model["_id"], name="d", owner_id=str(admin["_id"])),
+    )
+    await measure(
+        "update_deployment", deployments.update_deployment,
+        deployment["_id"], DeploymentUpdate(description="v2"),
+    )
+
+    user = await measure(
+        "create_user", users.create_user,
+        UserCreate(username="alice", email="alice@example.com", password="secret"),
+        current_user=admin,
+    )
+    await measure(
+        "update_user", users.update_user,
+        user["_id"], UserUpdate(full_name="Alice"), current_user=admin,
+    )
+
+    failed = False
+    print(f"{'route':<20} {'opérations':>10} {'annexes':>8}  détail")
+    for name, count, operations in results:
+        annexes = sum(n for (c, _), n in operations.items() if c in (VERSIONS_COLLECTION, STATS_COLLECTION, artifacts.ARTIFACTS_COLLECTION))
+        count -= annexes
+        detail = ", ".join(f"{c}.{op}={n}" for (c, op), n in sorted(operations.items()))
+        marker = "" if count <= max_operations else "  <-- budget dépassé"
+        failed = failed or count > max_operations
+        print(f"{name:<20} {count:>10} {annexes:>8}  {detail}{marker}")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-operations", type=int, default=2)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.max_operations)))
+
+
+if __name__ == "__main__":
+    main()